@@ -1,22 +1,11 @@
 import os
 from fastapi import APIRouter, Depends, HTTPException, Form
 from sqlalchemy import text
-from sqlalchemy.orm import Session
-from passlib.context import CryptContext
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_db
-
-# Security
-pwd_context = CryptContext(
-    schemes=["argon2"],
-    deprecated="auto"
-)
-
-def get_password_hash(password):
-    return pwd_context.hash(password)
-
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+from app.security import issue_token
+from app.services.passwords import get_password_hash, verify_password
 
 router = APIRouter()
 
@@ -25,21 +14,21 @@ async def signup(
     email: str = Form(...),
     password: str = Form(...),
     tel: str = Form(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     
-    user_exists = db.execute(
+    user_exists = (await db.execute(
         text("SELECT id FROM users WHERE email = :email LIMIT 1"),
         {"email": email},
-    ).fetchone()
+    )).fetchone()
 
     if user_exists:
         raise HTTPException(status_code=400, detail="Email already exists.")
     
-    hashed_password = get_password_hash(password)
+    hashed_password = await get_password_hash(password)
 
     try:
-        result = db.execute(
+        result = await db.execute(
             text("""
                 INSERT INTO users (email, telephone, hashed_password)
                 VALUES (:email, :telephone, :hashed_password)
@@ -56,7 +45,7 @@ async def signup(
 
         tel_test_id = os.environ.get("TEL_TEST_ID")
         if tel_test_id:
-            db.execute(
+            await db.execute(
                 text("""
                     INSERT INTO user_phone (phone_id, user_id)
                     VALUES (:phone_id, :user_id)
@@ -64,21 +53,21 @@ async def signup(
                 {"phone_id": tel_test_id, "user_id": user_id}
             )
 
-        db.commit()
+        await db.commit()
 
         return {"message": "User created", "user_id": user_id}
 
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Signup failed: {str(e)}")
 
 @router.post("/login")
 async def login(
     email: str = Form(...),
     password: str = Form(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    row = db.execute(
+    row = (await db.execute(
         text("""
             SELECT id, email, telephone, hashed_password
             FROM users
@@ -86,18 +75,27 @@ async def login(
             LIMIT 1
         """),
         {"email": email}
-    ).mappings().first()
+    )).mappings().first()
 
     if not row:
         raise HTTPException(status_code=401, detail="User not found")
 
-    if not verify_password(password, row["hashed_password"]):
+    valid, new_hash = await verify_password(password, row["hashed_password"])
+    if not valid:
         raise HTTPException(status_code=401, detail="Invalid password")
 
+    if new_hash:
+        await db.execute(
+            text("UPDATE users SET hashed_password = :hashed_password WHERE id = :id"),
+            {"hashed_password": new_hash, "id": row["id"]}
+        )
+        await db.commit()
+
     return {
         "user": {
             "id": row["id"],
             "email": row["email"],
             "telephone": row["telephone"]
-        }
+        },
+        **issue_token(row["id"], tenant=row["id"])
     }
\ No newline at end of file
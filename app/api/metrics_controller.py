@@ -0,0 +1,96 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+
+from app.cache import SWRCache
+from app.database import pool_stats
+from app.metrics import register_collector, render_metrics
+from app.security import require_ops_token
+from app.services.ownership import ownership_cache
+from app.services.passwords import hashing_stats
+from app.services.ticket_dispatch import ticket_dispatcher
+from app.services.vapi import assistant_cache, phone_cache
+from app.services.webhooks import event_buffer
+from app.upstream import upstream_stats
+
+router = APIRouter()
+
+CACHES: list[SWRCache] = [assistant_cache, phone_cache, ownership_cache]
+
+
+def _app_stats():
+    """
+    Converts the stats() dicts kept by the pool, caches, buffers and dispatcher into metrics.
+    """
+    pool = pool_stats()
+    yield "db_pool_connections", "Pooled connections by state", "gauge", [
+        ({"state": "size"}, pool["size"]),
+        ({"state": "checked_out"}, pool["checkedOut"]),
+        ({"state": "overflow"}, pool["overflow"]),
+    ]
+    yield "db_pool_checkouts_total", "Connections checked out of the pool", "counter", [
+        ({}, pool["checkouts"]),
+    ]
+    yield "db_pool_checkout_wait_seconds_total", "Time spent waiting for a pooled connection", "counter", [
+        ({}, pool["checkoutWaitTotalMs"] / 1000),
+    ]
+
+    cache_events, cache_entries = [], []
+    for cache in CACHES:
+        stats = cache.stats()
+        for event in ("hits", "stale_hits", "misses", "refreshes", "refresh_errors", "invalidations", "discarded_loads"):
+            cache_events.append(({"cache": cache.name, "event": event}, stats[event]))
+        if stats["entries"] is not None:
+            cache_entries.append(({"cache": cache.name}, stats["entries"]))
+    yield "cache_events_total", "Cache lookups and maintenance by outcome", "counter", cache_events
+    yield "cache_entries", "Entries held by per-process caches", "gauge", cache_entries
+
+    buffer = event_buffer.stats()
+    yield "write_buffer_items_total", "Items through the webhook write buffer by outcome", "counter", [
+        ({"buffer": event_buffer.name, "event": event}, buffer[event])
+        for event in ("accepted", "rejected", "flushed", "dropped")
+    ]
+    yield "write_buffer_pending", "Items waiting to be flushed", "gauge", [
+        ({"buffer": event_buffer.name}, buffer["pending"]),
+    ]
+
+    tickets = ticket_dispatcher.stats()
+    yield "ticket_dispatch_total", "Tickets by severity and outcome", "counter", [
+        ({"severity": severity, "event": event}, stats[event])
+        for severity, stats in tickets.items()
+        for event in ("submitted", "rejected", "dispatched", "failed")
+    ]
+    yield "ticket_queue_depth", "Tickets waiting per severity", "gauge", [
+        ({"severity": severity}, stats["depth"]) for severity, stats in tickets.items()
+    ]
+    yield "ticket_time_to_dispatch_seconds", "Recent queue wait percentiles per severity", "gauge", [
+        ({"severity": severity, "quantile": quantile}, stats[key] / 1000)
+        for severity, stats in tickets.items()
+        for quantile, key in (("0.5", "timeToDispatchP50Ms"), ("0.99", "timeToDispatchP99Ms"))
+        if stats[key] is not None
+    ]
+
+    upstream = upstream_stats()
+    yield "upstream_retries_total", "GET retries after a network error or retryable status", "counter", [
+        ({}, upstream["retries"]),
+    ]
+    yield "upstream_coalesced_total", "GETs served by an identical request already in flight", "counter", [
+        ({}, upstream["coalesced"]),
+    ]
+    yield "upstream_circuit_open", "1 while a host's circuit is open or half-open", "gauge", [
+        ({"host": host}, int(circuit["state"] != "closed")) for host, circuit in upstream["circuits"].items()
+    ]
+    yield "upstream_circuit_rejected_total", "Requests failed fast by an open circuit", "counter", [
+        ({"host": host}, circuit["rejected"]) for host, circuit in upstream["circuits"].items()
+    ]
+
+    yield "password_hash_in_flight", "Argon2 calls running or queued", "gauge", [
+        ({}, hashing_stats()["inFlight"]),
+    ]
+
+
+register_collector(_app_stats)
+
+
+@router.get("/metrics", include_in_schema=False, dependencies=[Depends(require_ops_token)])
+async def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
@@ -2,358 +2,219 @@
 import datetime
 import json
 import os
-from typing import List, Optional
-from fastapi import APIRouter, Depends, File, Form, HTTPException, Query, UploadFile
-import requests
+from typing import List
+from fastapi import APIRouter, Depends, File, Form, Header, HTTPException, Query, Response, UploadFile
+from fastapi.responses import ORJSONResponse, StreamingResponse
+import httpx
+import orjson
+from pydantic import ValidationError
 from dotenv import load_dotenv
-from app.database import get_db
-from app.prompts.property_manager_prompt import property_manager_system_prompt, property_manager_first_message
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.cache import SWRCache
+from app.concurrency import gather_bounded
+from app.database import SessionLocal, get_db, pool_stats, release_connection
+from app.http_client import timeout_for
+from app.upstream import CircuitOpenError, upstream_request
+from app.schemas.bulk_agent_request import BulkAgentManifest
+from app.services.bulk_provisioning import submit_bulk, validate_manifest
+from app.services.call_stats import call_stats
+from app.security import Principal, current_user, require_ops_token
+from app.services.call_store import get_call_owner, list_stored_calls
+from app.projection import (
+    ASSISTANT_SUMMARY_FIELDS,
+    CALL_SUMMARY_FIELDS,
+    PHONE_SUMMARY_FIELDS,
+    parse_fields,
+    project,
+)
+from app.services.kb_tools import release_agent_tool
+from app.services.ownership import invalidate_ownership, owned_resources, require_agent, require_call_scope
+from app.services.provisioning import get_job, retry_job, submit_job
+from app.services.uploads import spool_uploads
+from app.services.transcripts import (
+    call_messages,
+    etag_matches,
+    filter_call,
+    get_stored_etag,
+    get_stored_transcript,
+    has_stored_messages,
+    make_etag,
+    page_messages,
+    store_messages,
+    store_transcript,
+    weak_etag,
+    without_messages,
+)
+from app.services.vapi import (
+    VAPI_API_TOKEN,
+    VAPI_ASSISTANT_URL,
+    VAPI_CALL_URL,
+    VAPI_PHONE_URL,
+    assistant_cache,
+    headers,
+    phone_cache,
+)
+from app.prompts.registry import render_first_message, render_system_prompt
 from sqlalchemy import text
 
 import logging
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 load_dotenv()
 
 router = APIRouter()
 
-VAPI_BASE_URL = "https://api.vapi.ai"
+VAPI_FANOUT_CONCURRENCY = int(os.environ.get("VAPI_FANOUT_CONCURRENCY", "10"))
 
-OCR_URL = "https://ocr.asprise.com/api/v1/receipt"
-
-UPLOAD_DIR = "uploads"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
-
-VAPI_ASSISTANT_URL = "https://api.vapi.ai/assistant"
-
-VAPI_CALL_URL = "https://api.vapi.ai/call"
-
-VAPI_PHONE_URL = "https://api.vapi.ai/phone-number"
-
-VAPI_FILE_URL = "https://api.vapi.ai/file"
-
-VAPI_API_TOKEN = os.environ.get("VAPI_API_TOKEN")
-TOOL_ID = os.environ.get("TOOL_ID")
-
-headers = {"Authorization": f"Bearer {VAPI_API_TOKEN}"}
-
-def create_vapi_query_tool(
-    tool_description: str,
-    kb_name: str,
-    kb_description: str,
-    file_ids: List[str],
-    provider: str = "google",
-    model: str = "gemini-2.0-flash",
-    blocking: bool = False,
-    timeout_s: int = 30,
-) -> str:
-    """
-    Creates a Vapi Query Tool using one Knowledge Base with multiple fileIds.
-    Returns: tool_id
-    """
-
-    if not file_ids:
-        raise HTTPException(status_code=400, detail="file_ids must not be empty")
-    
-    logger.info("Creating query tool...")
-
-    payload = {
-        "type": "query",
-        "function": {
-            "name": "query_tool",
-            "description": tool_description,
-            "parameters": {
-                "type": "object",
-                "properties": {},
-                "required": []
-            }
-        },
-        "server": {
-            "url": None,
-            "credentialId": None,
-            "timeoutSeconds": 20
-        },
-        "messages": [
-            {
-                "type": "request-start",
-                "blocking": False
-            }
-        ],
-        "knowledgeBases": [
-            {
-                "name": kb_name,
-                "description": kb_description,
-                "provider": provider,
-                "model": model,
-                "fileIds": file_ids
-            }
-        ]
-    }
-
-    headers = {
-        "Authorization": f"Bearer {VAPI_API_TOKEN}"
-    }
-
-    url = f"{VAPI_BASE_URL}/tool"
-
-    try:
-        resp = requests.post(
-            url,
-            headers=headers,
-            json=payload,
-            timeout=timeout_s
-        )
-        logger.info("Tool created...")
-        resp.raise_for_status()
-        data = resp.json()
-    except requests.HTTPError as e:
-        detail: Optional[str]
-        try:
-            detail = resp.text
-        except Exception:
-            detail = str(e)
-        raise HTTPException(
-            status_code=resp.status_code,
-            detail=f"Vapi error creating tool: {detail}"
-        )
-    except requests.RequestException as e:
-        raise HTTPException(
-            status_code=502,
-            detail=f"Network error calling Vapi: {str(e)}"
-        )
-    except ValueError:
-        raise HTTPException(
-            status_code=502,
-            detail="Vapi response was not valid JSON"
-        )
-
-    return data.get("id")
-
-def extract_text_from_asprise(ocr_json: dict) -> str:
-    if not isinstance(ocr_json, dict):
-        return ""
-
-    if ocr_json.get("success") is not True:
-        return ""
-
-    receipts = ocr_json.get("receipts")
-    if not isinstance(receipts, list) or not receipts:
-        return ""
-
-    pages_text: list[str] = []
-
-    for receipt in receipts:
-        if not isinstance(receipt, dict):
-            continue
-
-        for key in ("ocr_text", "text", "raw_text"):
-            val = receipt.get(key)
-            if isinstance(val, str) and val.strip():
-                pages_text.append(val.strip())
-                break
-
-    return "\n\n".join(pages_text)
-
-
-def run_ocr(file_bytes: bytes, filename: str, content_type: str) -> str:
-    try:
-        ocr_resp = requests.post(
-            OCR_URL,
-            data={
-                "api_key": "TEST",
-                "recognizer": "auto",
-                "ref_no": f"ocr_{filename}_{int(datetime.datetime.utcnow().timestamp())}"
-            },
-            files={
-                "file": (filename, file_bytes, content_type or "application/octet-stream")
-            },
-            timeout=60
-        )
-        ocr_resp.raise_for_status()
-        ocr_json = ocr_resp.json()
-    except requests.RequestException as e:
-        raise HTTPException(status_code=502, detail=f"OCR request failed: {str(e)}")
-    except ValueError:
-        raise HTTPException(status_code=502, detail="OCR response was not valid JSON")
-
-    text = extract_text_from_asprise(ocr_json)
-    if not text.strip():
-        raise HTTPException(
-            status_code=422,
-            detail="OCR returned empty text (file may be unreadable or unsupported)."
-        )
-    return text
-
-
-def upload_text_to_vapi(text: str, base_filename: str, headers: dict) -> str:
-    txt_name = f"{base_filename.rsplit('.', 1)[0]}.txt" if base_filename else "kb.txt"
-    files = {
-        "file": (txt_name, text.encode("utf-8"), "text/plain; charset=utf-8")
-    }
-    try:
-        up = requests.post(VAPI_FILE_URL, headers=headers, files=files, timeout=60)
-        up.raise_for_status()
-        return up.json()["id"]
-    except requests.RequestException as e:
-        raise HTTPException(status_code=502, detail=f"Vapi file upload failed: {str(e)}")
-    except KeyError:
-        raise HTTPException(status_code=502, detail="Vapi file upload response missing 'id'")
-
-@router.post("/create-agent")
+@router.post("/create-agent", status_code=202)
 async def create_agent(
     agent_name: str = Form(...),
     first_message: str = Form(...),
     system_prompt: str = Form(...),
-    user_id: str = Form(...),
     files: List[UploadFile] = File(...),
-    db: requests.Session = Depends(get_db)
+    user: Principal = Depends(current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     
     if not files or len(files) == 0:
         raise HTTPException(status_code=400, detail="You must upload at least one file.")
 
-    vapi_file_ids: List[str] = []
+    logger.info(f"Queueing agent provisioning with {len(files)} files")
 
-    logger.info(f"Processing {len(files)} - {files}")
+    documents = await spool_uploads(files)
 
-    for f in files:
+    return await submit_job(
+        db,
+        user_id=user.user_id,
+        agent_name=agent_name,
+        first_message=first_message,
+        system_prompt=system_prompt,
+        documents=documents
+    )
 
-        file_bytes = await f.read()
+@router.post("/create-agents")
+async def create_agents_bulk(
+    manifest: str = Form(...),
+    files: List[UploadFile] = File(...),
+    user: Principal = Depends(current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Provisions a batch of agents from a JSON manifest ({"agents": [{name, first_message,
+    use_case, system_prompt?, documents: [filename, ...]}]}) plus the uploaded files.
+    Streams NDJSON: the accepted job ids, then each agent's result as it finishes.
+    """
+    try:
+        parsed = BulkAgentManifest.model_validate_json(manifest)
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False, include_context=False))
 
-        ocr_text = run_ocr(
-            file_bytes=file_bytes,
-            filename=f.filename or "upload",
-            content_type=f.content_type or "application/pdf"
-        )
+    filenames = [f.filename or "upload.pdf" for f in files]
+    if len(set(filenames)) != len(filenames):
+        raise HTTPException(status_code=400, detail="Uploaded filenames must be unique.")
+    validate_manifest(parsed.agents, set(filenames))
 
-        vapi_file_id = upload_text_to_vapi(
-            text=ocr_text,
-            base_filename=f.filename or "upload.pdf",
-            headers=headers
-        )
-        
-        vapi_file_ids.append(vapi_file_id)
+    logger.info(f"Queueing bulk provisioning of {len(parsed.agents)} agents with {len(files)} files")
 
-    logger.info(f"Before creating tool with files {vapi_file_ids}")
+    documents = await spool_uploads(files)
+    results = await submit_bulk(db, user.user_id, parsed.agents, {doc.filename: doc for doc in documents})
 
-    description = """Use this tool to retrieve factual information from official business documents HOAs uploaded by the user.
-Only use this tool when the caller asks specific questions about written rules, policies, restrictions, procedures, or requirements (For example: size of leaving units in a leasing, pool usage, etc). If the information is not explicitly stated in the documents, say that you do not have that information and do not guess."""
+    return StreamingResponse(
+        (orjson.dumps(result) + b"\n" async for result in results),
+        media_type="application/x-ndjson"
+    )
 
-    kb_description = """Contains comprehensive information about HOAs rules, regulations, prohibitions and other concerns about the property and leasing."""
+@router.get("/jobs/{job_id}")
+async def get_provisioning_job(job_id: str, user: Principal = Depends(current_user), db: AsyncSession = Depends(get_db)):
+    job = await get_job(db, job_id, user_id=user.user_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
 
-    tool_id = create_vapi_query_tool(tool_description=description, kb_name="business_documents", kb_description=kb_description, file_ids=vapi_file_ids)
+    return job
 
-    logger.info(f"Tool created {tool_id}")
+@router.post("/jobs/{job_id}/retry", status_code=202)
+async def retry_provisioning_job(job_id: str, user: Principal = Depends(current_user), db: AsyncSession = Depends(get_db)):
+    job = await retry_job(db, job_id, user_id=user.user_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
 
-    if not vapi_file_ids:
-        raise HTTPException(status_code=400, detail="All uploaded files were empty.")
-    
-    logger.info(f"VAPI Files added {vapi_file_ids}")
+    return job
     
-    payload = {
-        "name": agent_name,
-        "firstMessage": first_message,
-        "model": {
-            "provider": "openai",
-            "model": "gpt-4o-mini",
-            "knowledgeBase": {
-                "provider": "google",
-                "fileIds": vapi_file_ids
-            },
-            "messages": [
-                {
-                    "role": "system",
-                    "content": system_prompt
-                }
-            ],
-            "toolIds": [
-                tool_id
-            ]
-        },
-        "voice": {
-            "provider": "11labs",
-            "voiceId": "cgSgspJ2msm6clMCkdW9",
-            "model": "eleven_turbo_v2_5",
-            "stability": 0.5,
-            "similarityBoost": 0.75
-        }
-    }
-
-    try:
-        response = requests.post(
-            VAPI_ASSISTANT_URL,
-            headers=headers,
-            json=payload,
-            timeout=60
-        )
-        response.raise_for_status()
+async def fetch_vapi_resources(base_url: str, ids: List[str], endpoint: str, cache: SWRCache) -> List[dict]:
+    """
+    Fetches base_url/{id} for every id through the metadata cache, running cache misses
+    concurrently, capped at VAPI_FANOUT_CONCURRENCY.
+    Failed fetches come back in place as {"id", "error", "status"} entries.
+    """
 
-        result = db.execute(
-            text("""
-                INSERT INTO user_agent (user_id, agent_id)
-                VALUES (:user_id, :agent_id)
-                RETURNING id, user_id, agent_id
-            """),
-            {"user_id": user_id, "agent_id": response.json()["id"]}
-        )
+    async def load(resource_id: str) -> dict:
+        resp = await upstream_request("GET", f"{base_url}/{resource_id}", headers=headers, timeout=timeout_for(endpoint))
+        resp.raise_for_status()
+        return resp.json()
 
-        row = result.mappings().one()
-        db.commit()
-    except Exception as e:
-        logger.info(f"Exception: {e}")
+    async def fetch(resource_id: str) -> dict:
+        return await cache.get_or_load(resource_id, lambda: load(resource_id))
 
-    return response.json()
-    
-@router.get("/agents")
-async def get_agents(
-    user_id: str = Query(...),
-    db: requests.Session = Depends(get_db)
-):
-    rows = db.execute(
-        text("SELECT agent_id FROM user_agent WHERE user_id = :user_id"),
-        {"user_id": user_id},
-    ).fetchall()
+    responses = await gather_bounded(ids, fetch, VAPI_FANOUT_CONCURRENCY)
 
     results = []
+    for resource_id, resp in zip(ids, responses):
+        if isinstance(resp, BaseException):
+            logger.info(f"Exception fetching {endpoint} {resource_id}: {resp}")
+            if isinstance(resp, httpx.HTTPStatusError):
+                status = resp.response.status_code
+            else:
+                status = 503 if isinstance(resp, CircuitOpenError) else 502
+            results.append({"id": resource_id, "error": str(resp), "status": status})
+        else:
+            results.append(resp)
 
-    for (agent_id,) in rows:
-        try:
-            resp = requests.get(f"{VAPI_ASSISTANT_URL}/{agent_id}", headers=headers, timeout=15)
-            resp.raise_for_status()
-            results.append(resp.json())
+    return results
 
-        except Exception as e:
-            logger.info(f"Exception: {e}")
+# List routes return ORJSONResponse themselves: their payloads are plain JSON already, so
+# FastAPI's jsonable_encoder pass over every nested value is skipped.
+def project_resources(resources: List[dict], fields: tuple[str, ...]) -> List[dict]:
+    # Failed fetches keep their {"id", "error", "status"} shape whatever was asked for.
+    return [resource if "error" in resource else project(resource, fields) for resource in resources]
 
-    return results
+@router.get("/agents")
+async def get_agents(
+    fields: str | None = Query(default=None),
+    user: Principal = Depends(current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    projection = parse_fields(fields, ASSISTANT_SUMMARY_FIELDS)
+    agent_ids = (await owned_resources(db, user.user_id))["agents"]
+    await release_connection(db)
+
+    agents = await fetch_vapi_resources(VAPI_ASSISTANT_URL, agent_ids, "assistant", assistant_cache)
+    return ORJSONResponse(project_resources(agents, projection))
 
 @router.get("/phones")
 async def get_phones(
-    user_id: int = Query(...),
-    db: requests.Session = Depends(get_db),
+    fields: str | None = Query(default=None),
+    user: Principal = Depends(current_user),
+    db: AsyncSession = Depends(get_db),
 ):
-    rows = db.execute(
-        text("SELECT phone_id FROM user_phone WHERE user_id = :user_id"),
-        {"user_id": user_id},
-    ).fetchall()
+    projection = parse_fields(fields, PHONE_SUMMARY_FIELDS)
+    phone_ids = (await owned_resources(db, user.user_id))["phones"]
+    await release_connection(db)
 
-    results = []
-    for (phone_id,) in rows:
-        try:
-            resp = requests.get(f"{VAPI_PHONE_URL}/{phone_id}", headers=headers, timeout=15)
-            resp.raise_for_status()
-            results.append(resp.json())
-        except Exception as e:
-            logger.info(f"Exception fetching phone {phone_id}: {e}")
-
-    return results
+    phones = await fetch_vapi_resources(VAPI_PHONE_URL, phone_ids, "phone", phone_cache)
+    return ORJSONResponse(project_resources(phones, projection))
 
 @router.get("/calls")
 async def list_calls(
     assistant_id: str | None = Query(default=None),
-    phone_id: str | None = Query(default=None)
+    phone_id: str | None = Query(default=None),
+    started_after: datetime.datetime | None = Query(default=None),
+    started_before: datetime.datetime | None = Query(default=None),
+    limit: int = Query(default=50, ge=1, le=500),
+    cursor: str | None = Query(default=None),
+    fields: str | None = Query(default=None),
+    user: Principal = Depends(current_user),
+    db: AsyncSession = Depends(get_db)
 ):
 
     if not assistant_id and not phone_id:
@@ -361,81 +222,233 @@ async def list_calls(
             status_code=400,
             detail="You must provide assistant_id or phone_id"
         )
+    projection = parse_fields(fields, CALL_SUMMARY_FIELDS)
 
-    params = {}
-    if assistant_id:
-        params["assistantId"] = assistant_id
-    if phone_id:
-        params["phoneNumberId"] = phone_id
+    await require_call_scope(db, user.user_id, assistant_id, phone_id)
 
     try:
-        calls = requests.get(
-            VAPI_CALL_URL,
-            headers=headers,
-            params=params
+        page = await list_stored_calls(
+            db,
+            assistant_id=assistant_id,
+            phone_id=phone_id,
+            started_after=started_after,
+            started_before=started_before,
+            limit=limit,
+            cursor=cursor,
+            fields=projection
         )
-        calls.raise_for_status()
-        logger.info(calls.json())
-        return calls.json()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return ORJSONResponse(page)
 
+@router.get("/calls/stats")
+async def get_call_stats(
+    assistant_id: str | None = Query(default=None),
+    phone_id: str | None = Query(default=None),
+    granularity: str = Query(default="day", pattern="^(day|hour)$"),
+    start: datetime.datetime | None = Query(default=None),
+    end: datetime.datetime | None = Query(default=None),
+    user: Principal = Depends(current_user),
+    db: AsyncSession = Depends(get_db)
+):
+
+    if not assistant_id and not phone_id:
+        raise HTTPException(
+            status_code=400,
+            detail="You must provide assistant_id or phone_id"
+        )
+
+    await require_call_scope(db, user.user_id, assistant_id, phone_id)
+
+    return await call_stats(
+        db,
+        assistant_id=assistant_id,
+        phone_id=phone_id,
+        granularity=granularity,
+        start=start,
+        end=end
+    )
+
+TRANSCRIPT_CACHE_CONTROL = "private, no-cache"
+
+CALL_MESSAGES_STREAM_BATCH = int(os.environ.get("CALL_MESSAGES_STREAM_BATCH", "200"))
+
+async def fetch_call(db: AsyncSession, id: str) -> tuple[dict, bytes, str | None]:
+    """
+    Fetches a call from Vapi with filtered messages. Ended calls are stored permanently,
+    together with their message rows for paging.
+    Returns (data, body, etag); etag is None for calls still in progress.
+    """
+    await release_connection(db)
+    r = await upstream_request("GET", f"{VAPI_CALL_URL}/{id}", headers=headers, timeout=timeout_for("call"))
+    if not r.is_success:
+        raise HTTPException(status_code=r.status_code, detail=r.text)
+
+    data = filter_call(r.json())
+    body = orjson.dumps(data)
+
+    if data.get("status") != "ended":
+        return data, body, None
+
+    etag = make_etag(body)
+    try:
+        await store_transcript(db, id, body, etag)
+        await store_messages(db, id, call_messages(data))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        await db.rollback()
+        logger.info(f"Exception storing transcript {id}: {e}")
 
-def filter_messages(msgs: list[dict]) -> list[dict]:
-    if not msgs:
-        return msgs
-    
-    if msgs and (msgs[0].get("role") == "system"):
-        msgs = msgs[1:]
-    
-    blocked = {"tool_calls", "tool_call_result"}
-    msgs = [m for m in msgs if (m.get("role") not in blocked)]
+    return data, body, etag
 
-    return msgs
+def summary_etag(etag: str) -> str:
+    return f'{etag[:-1]}-summary"'
 
+async def require_call_access(db: AsyncSession, user: Principal, owner: tuple | None, data: dict) -> None:
+    """
+    Checks the call against the user's agents and phones, using the mirrored call row when
+    there is one and the call payload otherwise.
+    """
+    if owner is None:
+        owner = (data.get("assistantId"), data.get("phoneNumberId"))
+    await require_call_scope(db, user.user_id, *owner)
 
 @router.get("/call")
-async def get_call(id: str = Query(...)):
-    r = requests.get(f"{VAPI_CALL_URL}/{id}", headers=headers)
-    if not r.ok:
-        raise HTTPException(status_code=r.status_code, detail=r.text)
+async def get_call(
+    id: str = Query(...),
+    messages: bool = Query(default=True),
+    if_none_match: str | None = Header(default=None),
+    user: Principal = Depends(current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    owner = await get_call_owner(db, id)
+    if owner:
+        await require_call_scope(db, user.user_id, *owner)
+
+    if if_none_match and owner:
+        etag = await get_stored_etag(db, id)
+        if etag and not messages:
+            etag = summary_etag(etag)
+        if etag and etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers={"ETag": weak_etag(etag), "Cache-Control": TRANSCRIPT_CACHE_CONTROL})
+
+    stored = await get_stored_transcript(db, id)
+    if stored:
+        body, etag = stored["body"], stored["etag"]
+        if not messages or not owner:
+            data = orjson.loads(body)
+            await require_call_access(db, user, owner, data)
+            if not messages:
+                body = orjson.dumps(without_messages(data))
+    else:
+        data, body, etag = await fetch_call(db, id)
+        await require_call_access(db, user, owner, data)
+        if not messages:
+            body = orjson.dumps(without_messages(data))
+
+    if etag is None:
+        return Response(content=body, media_type="application/json", headers={"Cache-Control": "no-store"})
+
+    return Response(
+        content=body,
+        media_type="application/json",
+        headers={"ETag": weak_etag(etag if messages else summary_etag(etag)), "Cache-Control": TRANSCRIPT_CACHE_CONTROL}
+    )
+
+async def stream_stored_messages(id: str, after_seq: int):
+    """
+    Yields stored messages as NDJSON lines, reading CALL_MESSAGES_STREAM_BATCH rows at a time
+    so memory stays bounded however long the call is.
+    """
+    async with SessionLocal() as db:
+        while True:
+            rows = await page_messages(db, id, after_seq, CALL_MESSAGES_STREAM_BATCH)
+            for row in rows:
+                yield orjson.dumps(row["message"]) + b"\n"
+            if len(rows) < CALL_MESSAGES_STREAM_BATCH:
+                return
+            after_seq = rows[-1]["seq"]
+
+@router.get("/call/messages")
+async def get_call_messages(
+    id: str = Query(...),
+    cursor: int = Query(default=-1, ge=-1),
+    limit: int = Query(default=100, ge=1, le=500),
+    format: str = Query(default="json", pattern="^(json|ndjson)$"),
+    user: Principal = Depends(current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Filtered call messages in pages ({messages, nextCursor}) or as an NDJSON stream.
+    The cursor is the seq of the last message already received.
+    """
+    owner = await get_call_owner(db, id)
+    if owner:
+        await require_call_scope(db, user.user_id, *owner)
+
+    stored = await get_stored_etag(db, id) is not None
+    if stored and not owner:
+        await require_call_access(db, user, owner, orjson.loads((await get_stored_transcript(db, id))["body"]))
+
+    if not stored:
+        data, _, etag = await fetch_call(db, id)
+        await require_call_access(db, user, owner, data)
+        if etag is None:
+            msgs = call_messages(data)[cursor + 1:]
+            if format == "ndjson":
+                return StreamingResponse((orjson.dumps(m) + b"\n" for m in msgs), media_type="application/x-ndjson")
+            return {
+                "messages": msgs[:limit],
+                "nextCursor": cursor + limit if len(msgs) > limit else None
+            }
+    elif not await has_stored_messages(db, id):
+        await store_messages(db, id, call_messages(orjson.loads((await get_stored_transcript(db, id))["body"])))
+
+    if format == "ndjson":
+        return StreamingResponse(stream_stored_messages(id, cursor), media_type="application/x-ndjson")
 
-    data = r.json()
+    rows = await page_messages(db, id, cursor, limit + 1)
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = rows[-1]["seq"]
 
-    if isinstance(data.get("messages"), list):
-        data["messages"] = filter_messages(data["messages"])
+    return {"messages": [row["message"] for row in rows], "nextCursor": next_cursor}
 
-    if isinstance(data.get("artifact", {}).get("messages"), list):
-        data["artifact"]["messages"] = filter_messages(data["artifact"]["messages"])
+@router.get("/cache/stats", dependencies=[Depends(require_ops_token)])
+async def get_cache_stats():
+    return {
+        "assistant": assistant_cache.stats(),
+        "phone": phone_cache.stats(),
+    }
 
-    return data
+@router.get("/db/stats", dependencies=[Depends(require_ops_token)])
+async def get_db_stats():
+    return pool_stats()
 
 @router.get("/system_prompt")
-async def create_agent(
+async def get_system_prompt(
     use_case: str = Query(...),
     agent_name: str = Query(...),
 ):
-    try:
-        # TODO
-        # Implement mapping logic for different default system prompts. In this case, for demo purposes, we return propery manager prompt
-        return property_manager_system_prompt.format(name=agent_name)
-    except Exception as e:
-        logger.info(f"Exception: {e}")
+    # Use cases without their own prompts in app.prompts.registry get the default ones.
+    return render_system_prompt(use_case, agent_name)
 
 @router.get("/first_message")
-async def create_agent(
+async def get_first_message(
     use_case: str = Query(...),
     agent_name: str = Query(...),
 ):
-    try:
-        # TODO
-        # Implement mapping logic for different default system prompts. In this case, for demo purposes, we return propery manager prompt
-        return property_manager_first_message.format(name=agent_name)
-    except Exception as e:
-        logger.info(f"Exception: {e}")
+    return render_first_message(use_case, agent_name)
 
 @router.post("/test-call")
-async def test_call(customer_number: str, assistant_id: str):
+async def test_call(
+    customer_number: str,
+    assistant_id: str,
+    user: Principal = Depends(current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    await require_agent(db, user.user_id, assistant_id)
+    await release_connection(db)
 
     headers = {
         "Authorization": f"Bearer {VAPI_API_TOKEN}",
@@ -451,7 +464,7 @@ async def test_call(customer_number: str, assistant_id: str):
     }
 
     try:
-        response = requests.post(VAPI_CALL_URL, headers=headers, json=payload)
+        response = await upstream_request("POST", VAPI_CALL_URL, headers=headers, json=payload, timeout=timeout_for("call"))
         response.raise_for_status()
         return response.json()
     except Exception as e:
@@ -460,13 +473,18 @@ async def test_call(customer_number: str, assistant_id: str):
 @router.delete("/delete-assistant")
 async def delete_assistant(
     id: str,
-    db: requests.Session = Depends(get_db)
+    user: Principal = Depends(current_user),
+    db: AsyncSession = Depends(get_db)
 ):
+    await require_agent(db, user.user_id, id)
+    await release_connection(db)
+
     headers = {"Authorization": f"Bearer {VAPI_API_TOKEN}"}
 
     try:
-        response = requests.delete(f"{VAPI_ASSISTANT_URL}/{id}", headers=headers, timeout=15)
+        response = await upstream_request("DELETE", f"{VAPI_ASSISTANT_URL}/{id}", headers=headers, timeout=timeout_for("assistant"))
         response.raise_for_status()
+        await assistant_cache.invalidate(id)
     except Exception as e:
         return {
             "error": str(e),
@@ -474,17 +492,24 @@ async def delete_assistant(
         }
     
     try:
-        result = db.execute(
+        result = await db.execute(
             text("DELETE FROM user_agent WHERE agent_id = :agent_id"),
             {"agent_id": id}
         )
-        db.commit()
-
-        return {"ok": True, "deleted_rows": result.rowcount}
-
+        await db.commit()
+        await invalidate_ownership(user.user_id)
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=500,
             detail=f"Error deleting assistant from DB: {str(e)}"
         )
+
+    try:
+        deleted_tool = await release_agent_tool(db, id)
+    except Exception as e:
+        await db.rollback()
+        logger.info(f"Exception releasing tool of assistant {id}: {e}")
+        deleted_tool = None
+
+    return {"ok": True, "deleted_rows": result.rowcount, "deleted_tool": deleted_tool}
@@ -0,0 +1,88 @@
+import hmac
+import logging
+import os
+
+import orjson
+from fastapi import APIRouter, Depends, Header, HTTPException, Request
+from pydantic import ValidationError
+
+from app.security import require_ops_token
+from app.services.ticket_dispatch import ticket_dispatcher
+from app.services.webhooks import TICKET_TOOL_NAME, end_of_call_event, enqueue_event, event_buffer, ticket_event
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+VAPI_WEBHOOK_SECRET = os.environ.get("VAPI_WEBHOOK_SECRET")
+
+if not VAPI_WEBHOOK_SECRET:
+    logger.warning("VAPI_WEBHOOK_SECRET is not set, Vapi webhooks will be refused")
+
+@router.post("/vapi/webhook")
+async def vapi_webhook(
+    request: Request,
+    x_vapi_secret: str | None = Header(default=None),
+    x_idempotency_key: str | None = Header(default=None),
+):
+    """
+    Receives Vapi server messages. Events are validated and buffered here and written to the
+    database in batches, so the response never waits on a write.
+    """
+    if not VAPI_WEBHOOK_SECRET:
+        raise HTTPException(status_code=503, detail="Webhook secret is not configured")
+    if not hmac.compare_digest(x_vapi_secret or "", VAPI_WEBHOOK_SECRET):
+        raise HTTPException(status_code=401, detail="Invalid webhook secret")
+
+    try:
+        body = orjson.loads(await request.body())
+    except orjson.JSONDecodeError:
+        raise HTTPException(status_code=400, detail="Body must be JSON")
+
+    message = body.get("message") if isinstance(body, dict) else None
+    if not isinstance(message, dict):
+        raise HTTPException(status_code=400, detail="Missing 'message'")
+
+    message_type = message.get("type")
+
+    if message_type == "end-of-call-report":
+        try:
+            event = end_of_call_event(message, x_idempotency_key)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if event is None:
+            raise HTTPException(status_code=400, detail="End-of-call report without call id or createdAt")
+
+        enqueue_event(event)
+        return {"ok": True}
+
+    if message_type == "tool-calls":
+        results = []
+        tool_calls = message.get("toolCallList") or []
+        if not isinstance(tool_calls, list):
+            raise HTTPException(status_code=400, detail="'toolCallList' must be a list")
+
+        for tool_call in tool_calls:
+            function = tool_call.get("function") if isinstance(tool_call, dict) else None
+            if not isinstance(function, dict) or function.get("name") != TICKET_TOOL_NAME:
+                continue
+
+            try:
+                event = ticket_event(message, tool_call)
+            except (ValidationError, ValueError) as e:
+                results.append({"toolCallId": tool_call.get("id"), "result": f"Could not log the ticket: {e}"})
+                continue
+
+            if not ticket_dispatcher.has_capacity(event["ticket"]["severity"]):
+                raise HTTPException(status_code=503, detail="Ticket dispatch queue is full, retry later")
+
+            enqueue_event(event)
+            results.append({"toolCallId": tool_call["id"], "result": "Ticket logged. Management has been notified."})
+
+        return {"results": results}
+
+    return {"ok": True}
+
+@router.get("/vapi/webhook/stats", dependencies=[Depends(require_ops_token)])
+async def webhook_stats():
+    return {**event_buffer.stats(), "tickets": ticket_dispatcher.stats()}
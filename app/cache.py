@@ -0,0 +1,176 @@
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Protocol
+
+import orjson
+
+logger = logging.getLogger(__name__)
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0")
+
+
+class CacheBackend(Protocol):
+    """
+    Storage for cache entries. Entries are (value, stored_at) with stored_at in epoch seconds,
+    so freshness is judged the same way no matter which process wrote the entry.
+    """
+
+    async def get(self, key: str) -> tuple[Any, float] | None: ...
+
+    async def set(self, key: str, value: Any, stored_at: float, expire_s: float) -> None: ...
+
+    async def delete(self, key: str) -> None: ...
+
+    def size(self) -> int | None: ...
+
+
+class MemoryBackend:
+    """Per-process LRU store capped at max_entries."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[Any, float]] = OrderedDict()
+
+    async def get(self, key: str) -> tuple[Any, float] | None:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    async def set(self, key: str, value: Any, stored_at: float, expire_s: float) -> None:
+        self._entries[key] = (value, stored_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def delete(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+    def size(self) -> int | None:
+        return len(self._entries)
+
+
+class RedisBackend:
+    """
+    Shared store for all uvicorn workers. Needs the optional `redis` package; the LRU cap
+    is left to the server's maxmemory-policy.
+    """
+
+    def __init__(self, url: str, namespace: str):
+        try:
+            import redis.asyncio as redis
+        except ImportError as e:
+            raise RuntimeError("CACHE_BACKEND=redis requires the 'redis' package") from e
+
+        self.namespace = namespace
+        self._redis = redis.from_url(url)
+
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    async def get(self, key: str) -> tuple[Any, float] | None:
+        raw = await self._redis.get(self._key(key))
+        if raw is None:
+            return None
+        entry = orjson.loads(raw)
+        return entry["v"], entry["t"]
+
+    async def set(self, key: str, value: Any, stored_at: float, expire_s: float) -> None:
+        await self._redis.set(self._key(key), orjson.dumps({"v": value, "t": stored_at}), ex=max(1, int(expire_s)))
+
+    async def delete(self, key: str) -> None:
+        await self._redis.delete(self._key(key))
+
+    def size(self) -> int | None:
+        return None
+
+
+def make_backend(namespace: str, max_entries: int) -> CacheBackend:
+    if CACHE_BACKEND == "redis":
+        return RedisBackend(CACHE_REDIS_URL, namespace)
+    return MemoryBackend(max_entries)
+
+
+class SWRCache:
+    """
+    TTL cache with stale-while-revalidate: entries younger than ttl_s are served as is,
+    entries up to ttl_s + stale_s are served immediately while one background refresh
+    reloads them, and anything older is loaded inline.
+    """
+
+    def __init__(self, name: str, ttl_s: float, stale_s: float, max_entries: int, backend: CacheBackend | None = None):
+        self.name = name
+        self.ttl_s = ttl_s
+        self.stale_s = stale_s
+        self.backend = backend or make_backend(name, max_entries)
+        self._refreshing: dict[str, asyncio.Task] = {}
+        # Per-key generation and number of loads in flight, kept only while a load runs.
+        # invalidate() bumps the generation so loads that started before it aren't stored.
+        self._loads: dict[str, list[int]] = {}
+        self.counters = {
+            "hits": 0, "stale_hits": 0, "misses": 0, "refreshes": 0, "refresh_errors": 0,
+            "invalidations": 0, "discarded_loads": 0,
+        }
+
+    async def get_or_load(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        entry = await self.backend.get(key)
+
+        if entry is not None:
+            value, stored_at = entry
+            age = time.time() - stored_at
+
+            if age < self.ttl_s:
+                self.counters["hits"] += 1
+                return value
+
+            if age < self.ttl_s + self.stale_s:
+                self.counters["stale_hits"] += 1
+                if key not in self._refreshing:
+                    self._refreshing[key] = asyncio.create_task(self._refresh(key, loader))
+                return value
+
+        self.counters["misses"] += 1
+        return await self._load(key, loader)
+
+    async def _load(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """Runs the loader and stores its value, unless the key was invalidated meanwhile."""
+        load = self._loads.setdefault(key, [0, 0])
+        generation = load[0]
+        load[1] += 1
+        try:
+            value = await loader()
+            if load[0] == generation:
+                await self.set(key, value)
+            else:
+                self.counters["discarded_loads"] += 1
+            return value
+        finally:
+            load[1] -= 1
+            if not load[1]:
+                del self._loads[key]
+
+    async def set(self, key: str, value: Any) -> None:
+        await self.backend.set(key, value, time.time(), self.ttl_s + self.stale_s)
+
+    async def invalidate(self, key: str) -> None:
+        self.counters["invalidations"] += 1
+        if key in self._loads:
+            self._loads[key][0] += 1
+        await self.backend.delete(key)
+
+    async def _refresh(self, key: str, loader: Callable[[], Awaitable[Any]]) -> None:
+        try:
+            await self._load(key, loader)
+            self.counters["refreshes"] += 1
+        except Exception as e:
+            self.counters["refresh_errors"] += 1
+            logger.info(f"Exception refreshing {self.name} cache entry {key}: {e}")
+        finally:
+            self._refreshing.pop(key, None)
+
+    def stats(self) -> dict:
+        return {**self.counters, "entries": self.backend.size(), "refreshing": len(self._refreshing)}
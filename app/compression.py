@@ -0,0 +1,153 @@
+import os
+import zlib
+
+from starlette.datastructures import Headers, MutableHeaders
+
+COMPRESSION_MIN_BYTES = int(os.environ.get("COMPRESSION_MIN_BYTES", "1024"))
+COMPRESSION_GZIP_LEVEL = int(os.environ.get("COMPRESSION_GZIP_LEVEL", "5"))
+COMPRESSION_ZSTD_LEVEL = int(os.environ.get("COMPRESSION_ZSTD_LEVEL", "3"))
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+
+# Preferred first when the client accepts both equally.
+ENCODINGS = ("zstd", "gzip")
+
+
+def negotiate_encoding(accept_encoding: str) -> str | None:
+    """Picks the encoding from Accept-Encoding with the highest q-value, zstd on ties."""
+    weights: dict[str, float] = {}
+    for item in accept_encoding.lower().split(","):
+        name, _, params = item.strip().partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[name.strip()] = q
+
+    wildcard = weights.get("*", 0.0)
+    best, best_q = None, 0.0
+    for encoding in ENCODINGS:
+        q = weights.get(encoding, wildcard)
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+class _Compressor:
+    """Streaming compressor; every chunk is flushed so streamed lines reach the client as they're sent."""
+
+    def __init__(self, encoding: str):
+        if encoding == "zstd":
+            import zstandard
+
+            self._zstd = zstandard.ZstdCompressor(level=COMPRESSION_ZSTD_LEVEL).compressobj()
+            self._zstd_flush = zstandard.COMPRESSOBJ_FLUSH_BLOCK
+            self._zlib = None
+        else:
+            self._zstd = None
+            # wbits 31 writes a gzip header and trailer.
+            self._zlib = zlib.compressobj(COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, chunk: bytes) -> bytes:
+        if self._zstd is not None:
+            return self._zstd.compress(chunk) + self._zstd.flush(self._zstd_flush)
+        return self._zlib.compress(chunk) + self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self._zstd is not None:
+            return self._zstd.flush()
+        return self._zlib.flush()
+
+
+def compress_body(body: bytes, encoding: str) -> bytes:
+    if encoding == "zstd":
+        import zstandard
+
+        return zstandard.ZstdCompressor(level=COMPRESSION_ZSTD_LEVEL).compress(body)
+    compressor = zlib.compressobj(COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+    return compressor.compress(body) + compressor.flush()
+
+
+class CompressionMiddleware:
+    """
+    Plain ASGI middleware compressing JSON, NDJSON and text responses with zstd or gzip,
+    whichever the client prefers. Bodies under COMPRESSION_MIN_BYTES go out as they are;
+    streamed responses are compressed chunk by chunk.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        compressor: _Compressor | None = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, compressor, passthrough
+
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message.get("headers", []))
+                content_type = headers.get("content-type", "")
+                passthrough = (
+                    message["status"] in (204, 304)
+                    or "content-encoding" in headers
+                    or not content_type.startswith(COMPRESSIBLE_TYPES)
+                )
+                if passthrough:
+                    await send(message)
+                else:
+                    start_message = message
+                return
+
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if start_message is not None:
+                headers = MutableHeaders(raw=start_message.setdefault("headers", []))
+                headers.add_vary_header("Accept-Encoding")
+
+                if not more_body:
+                    if len(body) >= COMPRESSION_MIN_BYTES:
+                        body = compress_body(body, encoding)
+                        headers["Content-Encoding"] = encoding
+                        headers["Content-Length"] = str(len(body))
+                    await send(start_message)
+                    start_message = None
+                    await send({"type": "http.response.body", "body": body})
+                    return
+
+                headers["Content-Encoding"] = encoding
+                del headers["Content-Length"]
+                await send(start_message)
+                start_message = None
+                compressor = _Compressor(encoding)
+
+            if compressor is None:
+                await send(message)
+                return
+
+            chunk = compressor.compress(body) if body else b""
+            if not more_body:
+                chunk += compressor.finish()
+            if chunk or not more_body:
+                await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+        await self.app(scope, receive, send_wrapper)
@@ -1,8 +1,16 @@
 import os
-from sqlalchemy import Column, Integer, String, create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+import time
+from collections import deque
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from dotenv import load_dotenv
 
+from app.metrics import db_statement_seconds
+
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
@@ -10,19 +18,105 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 if not DATABASE_URL:
     raise ValueError("DATABASE_URL is not set")
 
-engine = create_engine(
-    DATABASE_URL,
-    pool_pre_ping=True,
-    pool_size=5,
-    max_overflow=10,
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT_S = float(os.getenv("DB_POOL_TIMEOUT_S", "10"))
+DB_POOL_RECYCLE_S = int(os.getenv("DB_POOL_RECYCLE_S", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "15000"))
+
+
+def _async_url(url: str):
+    """
+    Plain postgresql:// URLs are pointed at psycopg 3, which serves both sync and async.
+    """
+    url = make_url(url)
+    if url.drivername in ("postgres", "postgresql"):
+        url = url.set(drivername="postgresql+psycopg")
+    return url
+
+
+# Time spent waiting for a pooled connection (opening a new one included).
+_checkout_waits: deque[float] = deque(maxlen=1000)
+_checkout_counters = {"checkouts": 0, "wait_s_total": 0.0, "wait_s_max": 0.0}
+
+
+def _record_checkout(wait_s: float) -> None:
+    _checkout_waits.append(wait_s)
+    _checkout_counters["checkouts"] += 1
+    _checkout_counters["wait_s_total"] += wait_s
+    _checkout_counters["wait_s_max"] = max(_checkout_counters["wait_s_max"], wait_s)
+
+
+class _TimedPool(AsyncAdaptedQueuePool):
+    """
+    Times each checkout where it happens, at the first statement of a session, so sessions
+    stay lazy. There is no pool event for the start of the wait, hence the subclass.
+    """
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            _record_checkout(time.perf_counter() - start)
+
+
+engine = create_async_engine(
+    _async_url(DATABASE_URL),
+    poolclass=_TimedPool,
+    pool_pre_ping=DB_POOL_PRE_PING,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT_S,
+    pool_recycle=DB_POOL_RECYCLE_S,
+    connect_args={"options": f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"},
 )
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+@event.listens_for(engine.sync_engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._statement_started = time.perf_counter()
+
+
+@event.listens_for(engine.sync_engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_statement_started", None)
+    if started is not None:
+        verb = statement.lstrip().split(None, 1)[0].lower() if statement.strip() else "other"
+        db_statement_seconds.observe((verb,), time.perf_counter() - started)
+
+
+SessionLocal = async_sessionmaker(engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
 
-def get_db():
-    db = SessionLocal()
-    try:
+def pool_stats() -> dict:
+    pool = engine.sync_engine.pool
+    waits = sorted(_checkout_waits)
+    p99 = waits[min(len(waits) - 1, int(0.99 * len(waits)))] if waits else None
+    return {
+        "size": pool.size(),
+        "checkedOut": pool.checkedout(),
+        "overflow": pool.overflow(),
+        "checkouts": _checkout_counters["checkouts"],
+        "checkoutWaitTotalMs": round(_checkout_counters["wait_s_total"] * 1000, 2),
+        "checkoutWaitMaxMs": round(_checkout_counters["wait_s_max"] * 1000, 2),
+        "checkoutWaitP99Ms": round(p99 * 1000, 2) if p99 is not None else None,
+    }
+
+
+async def release_connection(db: AsyncSession) -> None:
+    """
+    Ends the session's read transaction so its connection goes back to the pool before a
+    slow upstream call, instead of sitting idle in transaction. The next statement checks
+    one out again. Only for sessions without pending writes.
+    """
+    if db.in_transaction():
+        await db.commit()
+
+
+async def get_db():
+    # Lazy: a connection is only checked out by the first statement, so requests answered
+    # from the ownership and metadata caches never take one.
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
\ No newline at end of file
@@ -0,0 +1,65 @@
+import importlib.util
+import os
+
+import httpx
+
+from app.metrics import HTTPX_EVENT_HOOKS
+
+# Per-endpoint timeouts in seconds. Override any of them with HTTP_TIMEOUT_<NAME>,
+# e.g. HTTP_TIMEOUT_OCR=90.
+DEFAULT_TIMEOUTS = {
+    "assistant": 15,
+    "assistant_create": 60,
+    "phone": 15,
+    "call": 30,
+    "file": 60,
+    "tool": 30,
+    "ocr": 60,
+}
+
+CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+
+# HTTP/2 needs the optional `h2` package; fall back to HTTP/1.1 without it.
+HTTP2_ENABLED = (
+    os.getenv("HTTP2_ENABLED", "true").lower() == "true"
+    and importlib.util.find_spec("h2") is not None
+)
+
+_client: httpx.AsyncClient | None = None
+
+
+def timeout_for(endpoint: str) -> httpx.Timeout:
+    seconds = float(os.getenv(f"HTTP_TIMEOUT_{endpoint.upper()}", DEFAULT_TIMEOUTS[endpoint]))
+    return httpx.Timeout(seconds, connect=min(seconds, CONNECT_TIMEOUT))
+
+
+async def open_http_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            http2=HTTP2_ENABLED,
+            limits=httpx.Limits(
+                max_connections=MAX_CONNECTIONS,
+                max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(DEFAULT_TIMEOUTS["call"], connect=CONNECT_TIMEOUT),
+            event_hooks=HTTPX_EVENT_HOOKS,
+        )
+    return _client
+
+
+async def close_http_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    if _client is None:
+        raise RuntimeError("HTTP client is not open; it is created in the app lifespan")
+    return _client
@@ -0,0 +1,199 @@
+import atexit
+import contextvars
+import copy
+import datetime
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import time
+import uuid
+import zlib
+
+import orjson
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# Share of requests whose INFO/DEBUG records are kept; warnings and errors are always kept.
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "1.0"))
+LOG_MAX_FIELD_CHARS = int(os.getenv("LOG_MAX_FIELD_CHARS", "2000"))
+LOG_MAX_RECORD_BYTES = int(os.getenv("LOG_MAX_RECORD_BYTES", "16384"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_ACCESS = os.getenv("LOG_ACCESS", "true").lower() == "true"
+LOG_HTTPX_LEVEL = os.getenv("LOG_HTTPX_LEVEL", "WARNING").upper()
+
+request_id_var: contextvars.ContextVar[str | None] = contextvars.ContextVar("request_id", default=None)
+
+# Attributes every LogRecord has; anything else was passed through `extra=`.
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "request_id"}
+
+access_logger = logging.getLogger("app.access")
+_listener: logging.handlers.QueueListener | None = None
+
+
+def _truncate(value: str) -> str:
+    if len(value) <= LOG_MAX_FIELD_CHARS:
+        return value
+    return f"{value[:LOG_MAX_FIELD_CHARS]}...[{len(value) - LOG_MAX_FIELD_CHARS} chars truncated]"
+
+
+def _sampled(request_id: str) -> bool:
+    # Hashing the id keeps or drops all records of one request together.
+    return zlib.crc32(request_id.encode()) / 0xFFFFFFFF < LOG_SAMPLE_RATE
+
+
+class ContextFilter(logging.Filter):
+    """
+    Runs in the caller's context: stamps the request id and applies sampling before
+    the record is queued, so dropped records cost almost nothing.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        request_id = request_id_var.get()
+        record.request_id = request_id
+        if record.levelno >= logging.WARNING or request_id is None or LOG_SAMPLE_RATE >= 1:
+            return True
+        return _sampled(request_id)
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; long fields are truncated and records capped at LOG_MAX_RECORD_BYTES."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": _truncate(record.getMessage()),
+        }
+        if getattr(record, "request_id", None):
+            entry["request_id"] = record.request_id
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = _truncate(value) if isinstance(value, str) else value
+        if record.exc_info:
+            entry["exc"] = _truncate(self.formatException(record.exc_info))
+        elif record.exc_text:
+            entry["exc"] = _truncate(record.exc_text)
+
+        line = orjson.dumps(entry, default=str)
+        if len(line) > LOG_MAX_RECORD_BYTES:
+            entry = {key: entry[key] for key in ("ts", "level", "logger", "request_id") if key in entry}
+            entry["msg"] = record.getMessage()[:LOG_MAX_RECORD_BYTES // 2]
+            entry["truncated"] = True
+            line = orjson.dumps(entry)
+        return line.decode()
+
+
+_formatter = logging.Formatter()
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """Drops records when the queue is full instead of blocking the caller."""
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Only render args and the traceback here; JSON encoding happens on the listener thread.
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def configure_logging() -> None:
+    """
+    Routes all logging through a bounded queue to a listener thread that writes JSON lines
+    to stdout, so request handlers never wait on log I/O.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(JsonFormatter())
+
+    handler = _QueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+    handler.addFilter(ContextFilter())
+
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(LOG_LEVEL)
+
+    # uvicorn installs its own stream handlers; send its records through the queue too.
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        uvicorn_logger = logging.getLogger(name)
+        uvicorn_logger.handlers[:] = []
+        uvicorn_logger.propagate = True
+    # httpx logs every request at INFO; upstream timings are already in /metrics.
+    logging.getLogger("httpx").setLevel(LOG_HTTPX_LEVEL)
+    if LOG_ACCESS:
+        # Our access log has the route, duration and request id; uvicorn's would duplicate it.
+        logging.getLogger("uvicorn.access").disabled = True
+
+    _listener = logging.handlers.QueueListener(handler.queue, output, respect_handler_level=False)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging() -> None:
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+class RequestContextMiddleware:
+    """
+    Assigns each request an id (X-Request-ID if the client sent one), returns it in the
+    response headers and writes one structured access record per request.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == b"x-request-id":
+                request_id = value.decode("latin-1")[:64]
+                break
+        request_id = request_id or uuid.uuid4().hex
+        token = request_id_var.set(request_id)
+
+        start = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = [*message.get("headers", []), (b"x-request-id", request_id.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if LOG_ACCESS:
+                route = scope.get("route")
+                access_logger.info(
+                    f"{scope['method']} {getattr(route, 'path_format', scope['path'])} {status}",
+                    extra={
+                        "method": scope["method"],
+                        "path": scope["path"],
+                        "status": status,
+                        "duration_ms": round((time.perf_counter() - start) * 1000, 2),
+                    },
+                )
+            request_id_var.reset(token)
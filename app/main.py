@@ -1,13 +1,65 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, ORJSONResponse
 from app.api.phone_system_controller import router as phone_router
 from app.api.login_controller import router as login_router
+from app.api.metrics_controller import router as metrics_router
+from app.api.webhook_controller import router as webhook_router
+from app.compression import CompressionMiddleware
+from app.database import engine
+from app.http_client import close_http_client, open_http_client
+from app.logging_config import RequestContextMiddleware, configure_logging
+from app.metrics import MetricsMiddleware
+from app.migrations import run_migrations
+from app.services.bulk_provisioning import stop_bulk_runs
+from app.services.call_store import start_call_sync, stop_call_sync
+from app.services.provisioning import start_workers, stop_workers
+from app.services.ticket_dispatch import start_ticket_dispatch, stop_ticket_dispatch
+from app.services.webhooks import event_buffer
+from app.upstream import CircuitOpenError
 
 from fastapi.middleware.cors import CORSMiddleware
 
-app = FastAPI(title="Opsmind")
+configure_logging()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await run_migrations(engine)
+    await open_http_client()
+    await start_workers()
+    await start_call_sync()
+    await start_ticket_dispatch()
+    await event_buffer.start()
+    try:
+        yield
+    finally:
+        await event_buffer.stop()
+        await stop_ticket_dispatch()
+        await stop_call_sync()
+        await stop_bulk_runs()
+        await stop_workers()
+        await close_http_client()
+        await engine.dispose()
+
+
+app = FastAPI(title="Opsmind", lifespan=lifespan, default_response_class=ORJSONResponse)
+
+
+@app.exception_handler(CircuitOpenError)
+async def circuit_open_handler(request: Request, exc: CircuitOpenError):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": f"{exc.host} is unavailable, try again later"},
+        headers={"Retry-After": str(int(exc.retry_after_s))},
+    )
+
 
 app.include_router(prefix="/api", router=phone_router)
 app.include_router(prefix="/auth", router=login_router)
+app.include_router(prefix="/api", router=webhook_router)
+app.include_router(router=metrics_router)
 
 app.add_middleware(
     CORSMiddleware,
@@ -15,4 +67,10 @@ app.add_middleware(
     allow_credentials=False,
     allow_methods=["*"],
     allow_headers=["*"],
-)
\ No newline at end of file
+)
+app.add_middleware(CompressionMiddleware)
+
+# Added last so they are the outermost layers: metrics time the whole request and
+# every record logged while handling it carries the request id.
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(RequestContextMiddleware)
@@ -0,0 +1,202 @@
+import os
+import time
+from bisect import bisect_left
+from typing import Callable, Iterable
+
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Seconds; spans fast cache hits up to slow OCR calls.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+Labels = tuple[str, ...]
+Sample = tuple[dict, float]
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Labels = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values: dict[Labels, float] = {}
+
+    def inc(self, labels: Labels = (), amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labels, value in self._values.items():
+            lines.append(f"{self.name}{_format_labels(self.labels, labels)} {value}")
+        return lines
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram. observe() is a bisect plus two additions, cheap enough
+    to run on every request.
+    """
+
+    def __init__(self, name: str, help: str, labels: Labels = (), buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self._series: dict[Labels, list] = {}
+
+    def observe(self, labels: Labels, value: float) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total) in self._series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, labels, le)} {cumulative}")
+            cumulative += counts[-1]
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.labels, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, labels)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, labels)} {cumulative}")
+        return lines
+
+
+http_request_seconds = Histogram(
+    "http_request_duration_seconds", "Request latency by route template", ("method", "route", "status"),
+)
+upstream_request_seconds = Histogram(
+    "upstream_request_duration_seconds", "Outbound request latency, including the response body",
+    ("upstream", "endpoint", "method", "status"),
+)
+upstream_response_bytes = Counter(
+    "upstream_response_bytes_total", "Outbound response body bytes", ("upstream", "endpoint"),
+)
+upstream_request_bytes = Counter(
+    "upstream_request_bytes_total", "Outbound request body bytes", ("upstream", "endpoint"),
+)
+db_statement_seconds = Histogram(
+    "db_statement_duration_seconds", "Database statement latency", ("statement",),
+)
+password_hash_seconds = Histogram(
+    "password_hash_duration_seconds", "Argon2 time including the wait for a pool thread", ("operation",),
+)
+
+METRICS = [
+    http_request_seconds,
+    upstream_request_seconds,
+    upstream_request_bytes,
+    upstream_response_bytes,
+    db_statement_seconds,
+    password_hash_seconds,
+]
+
+# Callbacks returning (name, help, type, samples) for stats kept elsewhere (pool, caches, buffers).
+_collectors: list[Callable[[], Iterable[tuple[str, str, str, list[Sample]]]]] = []
+
+
+def register_collector(collector: Callable[[], Iterable[tuple[str, str, str, list[Sample]]]]) -> None:
+    _collectors.append(collector)
+
+
+def render_metrics() -> str:
+    lines: list[str] = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    for collector in _collectors:
+        for name, help, kind, samples in collector():
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{name}{_format_labels(labels.keys(), labels.values())} {value}")
+    return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """
+    Plain ASGI middleware timing every HTTP request. Routes are labelled by their path
+    template (/api/jobs/{job_id}), so ids don't blow up the series count.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = "500"
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            http_request_seconds.observe(
+                (scope["method"], getattr(route, "path_format", "unmatched"), status),
+                time.perf_counter() - start,
+            )
+
+
+# Hosts are labelled by role; anything else falls back to its hostname. Keyed by host[:port]
+# so local stand-ins on different ports keep their labels.
+UPSTREAM_NAMES = {
+    httpx.URL(os.getenv("VAPI_BASE_URL", "https://api.vapi.ai")).netloc.decode(): "vapi",
+    httpx.URL(os.getenv("OCR_URL", "https://ocr.asprise.com/api/v1/receipt")).netloc.decode(): "ocr",
+}
+
+
+def _upstream_labels(request: httpx.Request) -> tuple[str, str]:
+    host = request.url.netloc.decode()
+    upstream = UPSTREAM_NAMES.get(host, request.url.host)
+    # First path segment only (/assistant/{id} -> assistant) to keep cardinality bounded.
+    endpoint = request.url.path.strip("/").split("/", 1)[0] or "/"
+    return upstream, endpoint
+
+
+async def _on_request(request: httpx.Request) -> None:
+    request.extensions["metrics_start"] = time.perf_counter()
+
+
+async def _on_response(response: httpx.Response) -> None:
+    request = response.request
+    start = request.extensions.get("metrics_start")
+    if start is None:
+        return
+
+    # Callers read the whole body anyway; reading it here makes latency and bytes complete.
+    await response.aread()
+    upstream, endpoint = _upstream_labels(request)
+    upstream_request_seconds.observe(
+        (upstream, endpoint, request.method, str(response.status_code)),
+        time.perf_counter() - start,
+    )
+    upstream_response_bytes.inc((upstream, endpoint), len(response.content))
+    upstream_request_bytes.inc((upstream, endpoint), int(request.headers.get("content-length", 0)))
+
+
+HTTPX_EVENT_HOOKS = {"request": [_on_request], "response": [_on_response]}
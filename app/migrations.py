@@ -0,0 +1,162 @@
+import logging
+from typing import Callable
+
+from sqlalchemy import JSON, bindparam, inspect, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.database import Base
+from app import models
+from app.projection import CALL_SUMMARY_FIELDS, project
+
+logger = logging.getLogger(__name__)
+
+# Arbitrary key for pg_advisory_xact_lock, so only one worker migrates at a time.
+MIGRATION_LOCK_KEY = 4_201_916
+
+BACKFILL_BATCH_SIZE = 500
+
+
+def _create_tables(conn: Connection, *tables) -> None:
+    """
+    Creates the tables and any of their indexes that are missing. Tables that already
+    exist are left as they are.
+    """
+    for table in tables:
+        table.create(conn, checkfirst=True)
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+
+
+def _0001_baseline(conn: Connection) -> None:
+    """Tables that used to be created by metadata.create_all at startup."""
+    _create_tables(
+        conn,
+        models.OcrCacheEntry.__table__,
+        models.ProvisioningJob.__table__,
+        models.Call.__table__,
+        models.SyncCursor.__table__,
+        models.CallRollup.__table__,
+        models.CallTranscript.__table__,
+        models.CallMessage.__table__,
+        models.WebhookEvent.__table__,
+        models.Ticket.__table__,
+    )
+
+
+def _0002_user_tables(conn: Connection) -> None:
+    """
+    users, user_agent and user_phone predate the repo's models; dedupe links before the unique
+    indexes. Duplicate emails can't be merged safely, so they stop the migration instead.
+    """
+    if inspect(conn).has_table("users"):
+        duplicates = conn.execute(text("""
+            SELECT email FROM users GROUP BY email HAVING COUNT(*) > 1 ORDER BY email
+        """)).scalars().all()
+        if duplicates:
+            raise RuntimeError(
+                f"Can't create ix_users_email, these emails belong to several users; "
+                f"merge or delete the duplicates and restart: {', '.join(duplicates)}"
+            )
+    _create_tables(conn, models.User.__table__)
+    for table, column in (("user_agent", "agent_id"), ("user_phone", "phone_id")):
+        if inspect(conn).has_table(table):
+            conn.execute(text(f"""
+                DELETE FROM {table}
+                WHERE id NOT IN (SELECT MIN(id) FROM {table} GROUP BY user_id, {column})
+            """))
+    _create_tables(conn, models.UserAgent.__table__, models.UserPhone.__table__)
+
+
+def _0003_kb_tools(conn: Connection) -> None:
+    """Registry of shared knowledge-base query tools and the agents using them."""
+    _create_tables(conn, models.KnowledgeBaseTool.__table__, models.AgentTool.__table__)
+
+
+def _0004_call_summary(conn: Connection) -> None:
+    """Adds calls.summary and fills it for calls synced before the column existed."""
+    if "summary" not in {column["name"] for column in inspect(conn).get_columns("calls")}:
+        conn.execute(text("ALTER TABLE calls ADD COLUMN summary JSON"))
+
+    while True:
+        rows = conn.execute(
+            text("SELECT id, data FROM calls WHERE summary IS NULL LIMIT :limit").columns(data=JSON),
+            {"limit": BACKFILL_BATCH_SIZE},
+        ).all()
+        if not rows:
+            break
+        conn.execute(
+            text("UPDATE calls SET summary = :summary WHERE id = :id").bindparams(bindparam("summary", type_=JSON)),
+            [{"id": row.id, "summary": project(row.data, CALL_SUMMARY_FIELDS)} for row in rows],
+        )
+
+
+def _0005_ticket_claims(conn: Connection) -> None:
+    """Claim columns so each ticket is notified by one worker, and retried when that fails."""
+    columns = {column["name"] for column in inspect(conn).get_columns("tickets")}
+    if "claimed_at" not in columns:
+        conn.execute(text("ALTER TABLE tickets ADD COLUMN claimed_at TIMESTAMP WITH TIME ZONE"))
+    if "attempts" not in columns:
+        conn.execute(text("ALTER TABLE tickets ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0"))
+    _create_tables(conn, models.Ticket.__table__)
+
+
+# Append only: each entry runs once, in order, and is recorded in schema_migrations.
+MIGRATIONS: list[tuple[str, Callable[[Connection], None]]] = [
+    ("0001_baseline", _0001_baseline),
+    ("0002_user_tables", _0002_user_tables),
+    ("0003_kb_tools", _0003_kb_tools),
+    ("0004_call_summary", _0004_call_summary),
+    ("0005_ticket_claims", _0005_ticket_claims),
+]
+
+
+def _migrate(conn: Connection) -> list[str]:
+    if conn.dialect.name == "postgresql":
+        conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version VARCHAR PRIMARY KEY,
+            applied_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    """))
+    applied = set(conn.execute(text("SELECT version FROM schema_migrations")).scalars())
+
+    ran = []
+    for version, migration in MIGRATIONS:
+        if version in applied:
+            continue
+        migration(conn)
+        conn.execute(text("INSERT INTO schema_migrations (version) VALUES (:version)"), {"version": version})
+        ran.append(version)
+    return ran
+
+
+def _missing_indexes(conn: Connection) -> list[str]:
+    inspector = inspect(conn)
+    missing = []
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            missing.append(f"{table.name} (table)")
+            continue
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        existing |= {constraint["name"] for constraint in inspector.get_unique_constraints(table.name)}
+        missing.extend(f"{table.name}.{index.name}" for index in table.indexes if index.name not in existing)
+    return missing
+
+
+async def run_migrations(engine: AsyncEngine) -> None:
+    """
+    Applies pending migrations in one transaction, then warns about any index the models
+    declare that the database doesn't have.
+    """
+    async with engine.begin() as conn:
+        ran = await conn.run_sync(_migrate)
+    if ran:
+        logger.info(f"Applied migrations: {', '.join(ran)}")
+
+    async with engine.connect() as conn:
+        missing = await conn.run_sync(_missing_indexes)
+    if missing:
+        logger.warning(f"Missing database indexes: {', '.join(missing)}")
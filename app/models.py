@@ -0,0 +1,194 @@
+from sqlalchemy import JSON, Column, DateTime, Float, ForeignKey, Index, Integer, LargeBinary, String, Text, func
+
+from app.database import Base
+
+
+class User(Base):
+    __tablename__ = "users"
+    __table_args__ = (
+        # Covers the login lookup, so it is answered by an index-only scan on Postgres.
+        Index(
+            "ix_users_email",
+            "email",
+            unique=True,
+            postgresql_include=["id", "telephone", "hashed_password"],
+        ),
+    )
+
+    id = Column(Integer, primary_key=True)
+    email = Column(String, nullable=False)
+    telephone = Column(String)
+    hashed_password = Column(String, nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+
+class UserAgent(Base):
+    __tablename__ = "user_agent"
+    __table_args__ = (
+        Index("ix_user_agent_user_agent", "user_id", "agent_id", unique=True),
+        Index("ix_user_agent_agent", "agent_id"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    agent_id = Column(String, nullable=False)
+
+
+class UserPhone(Base):
+    __tablename__ = "user_phone"
+    __table_args__ = (
+        Index("ix_user_phone_user_phone", "user_id", "phone_id", unique=True),
+    )
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    phone_id = Column(String, nullable=False)
+
+
+class OcrCacheEntry(Base):
+    __tablename__ = "ocr_cache"
+
+    content_hash = Column(String(64), primary_key=True)
+    text = Column(Text, nullable=False)
+    vapi_file_id = Column(String, nullable=False)
+    text_bytes = Column(Integer, nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    last_used_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), index=True)
+
+
+class KnowledgeBaseTool(Base):
+    __tablename__ = "kb_tools"
+
+    # sha256 of provider, model and the sorted, de-duplicated Vapi file ids.
+    key = Column(String(64), primary_key=True)
+    tool_id = Column(String, nullable=False, unique=True)
+    provider = Column(String, nullable=False)
+    model = Column(String, nullable=False)
+    file_ids = Column(JSON, nullable=False)
+    ref_count = Column(Integer, nullable=False, server_default="0")
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    last_used_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+
+class AgentTool(Base):
+    __tablename__ = "agent_tools"
+
+    agent_id = Column(String, primary_key=True)
+    tool_key = Column(String(64), ForeignKey("kb_tools.key"), nullable=False, index=True)
+
+
+class ProvisioningJob(Base):
+    __tablename__ = "provisioning_jobs"
+
+    id = Column(String(36), primary_key=True)
+    user_id = Column(String, nullable=False)
+    status = Column(String(16), nullable=False)
+    request = Column(JSON, nullable=False)
+    stages = Column(JSON, nullable=False)
+    checkpoint = Column(JSON, nullable=False)
+    result = Column(JSON)
+    error = Column(Text)
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+
+class Call(Base):
+    __tablename__ = "calls"
+    __table_args__ = (
+        Index("ix_calls_assistant_started", "assistant_id", "started_at", "id"),
+        Index("ix_calls_phone_started", "phone_number_id", "started_at", "id"),
+        Index("ix_calls_started", "started_at", "id"),
+    )
+
+    id = Column(String, primary_key=True)
+    assistant_id = Column(String)
+    phone_number_id = Column(String)
+    status = Column(String(32))
+    # startedAt, or createdAt for calls that never started, so every row has a sort key.
+    started_at = Column(DateTime(timezone=True), nullable=False)
+    ended_at = Column(DateTime(timezone=True))
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    updated_at = Column(DateTime(timezone=True), nullable=False)
+    cost = Column(Float)
+    data = Column(JSON, nullable=False)
+    # data projected to CALL_SUMMARY_FIELDS, so list pages don't read whole transcripts.
+    summary = Column(JSON)
+
+
+class SyncCursor(Base):
+    __tablename__ = "sync_cursors"
+
+    name = Column(String(64), primary_key=True)
+    cursor = Column(DateTime(timezone=True), nullable=False)
+
+
+class CallRollup(Base):
+    __tablename__ = "call_rollups"
+    __table_args__ = (
+        Index("ix_call_rollups_assistant", "assistant_id", "granularity", "bucket_start"),
+        Index("ix_call_rollups_phone", "phone_number_id", "granularity", "bucket_start"),
+    )
+
+    granularity = Column(String(8), primary_key=True)
+    bucket_start = Column(DateTime(timezone=True), primary_key=True)
+    # Empty string stands for "no assistant" / "no phone" so both can be part of the key.
+    assistant_id = Column(String, primary_key=True)
+    phone_number_id = Column(String, primary_key=True)
+    calls = Column(Integer, nullable=False)
+    minutes = Column(Float, nullable=False)
+    cost = Column(Float, nullable=False)
+
+
+class CallTranscript(Base):
+    __tablename__ = "call_transcripts"
+
+    call_id = Column(String, primary_key=True)
+    etag = Column(String(66), nullable=False)
+    # zstd-compressed JSON of the ended call with filtered messages.
+    body = Column(LargeBinary, nullable=False)
+    raw_bytes = Column(Integer, nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+
+class CallMessage(Base):
+    __tablename__ = "call_messages"
+
+    call_id = Column(String, primary_key=True)
+    seq = Column(Integer, primary_key=True)
+    message = Column(JSON, nullable=False)
+
+
+class WebhookEvent(Base):
+    __tablename__ = "webhook_events"
+
+    idempotency_key = Column(String, primary_key=True)
+    type = Column(String(64), nullable=False)
+    call_id = Column(String, index=True)
+    payload = Column(JSON, nullable=False)
+    received_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+
+class Ticket(Base):
+    __tablename__ = "tickets"
+    __table_args__ = (
+        Index("ix_tickets_assistant_created", "assistant_id", "created_at"),
+        # The dispatch sweep looks for open tickets and expired claims.
+        Index("ix_tickets_status_claimed", "status", "claimed_at"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    idempotency_key = Column(String, nullable=False, unique=True)
+    assistant_id = Column(String, nullable=False)
+    user_id = Column(String)
+    call_id = Column(String)
+    caller_name = Column(String)
+    unit_number = Column(String)
+    issue_summary = Column(Text, nullable=False)
+    severity = Column(String(8), nullable=False)
+    timestamp = Column(DateTime(timezone=True))
+    # open -> dispatching (claimed by a worker) -> dispatched, or failed after TICKET_MAX_ATTEMPTS.
+    status = Column(String(16), nullable=False, server_default="open")
+    # Time of the current or last dispatch attempt.
+    claimed_at = Column(DateTime(timezone=True))
+    attempts = Column(Integer, nullable=False, server_default="0")
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
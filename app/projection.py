@@ -0,0 +1,94 @@
+import re
+
+from fastapi import HTTPException
+
+# What the list views read (agent_dashboard.js, home.js); anything else needs fields=.
+CALL_SUMMARY_FIELDS = (
+    "id",
+    "assistantId",
+    "phoneNumberId",
+    "phoneNumber.number",
+    "variables.phoneNumber.number",
+    "variableValues.phoneNumber.number",
+    "customer.number",
+    "type",
+    "status",
+    "endedReason",
+    "analysis.successEvaluation",
+    "analysis.success",
+    "analysis.score",
+    "successEvaluation",
+    "score",
+    "scorecards",
+    "startedAt",
+    "endedAt",
+    "duration",
+    "cost",
+    "costBreakdown.total",
+    "costBreakdown.cost",
+)
+ASSISTANT_SUMMARY_FIELDS = ("id", "name", "firstMessage", "createdAt", "updatedAt")
+PHONE_SUMMARY_FIELDS = ("id", "name", "number", "provider", "assistantId", "createdAt")
+
+# fields=* returns the stored objects untouched.
+ALL_FIELDS = ("*",)
+
+MAX_FIELDS = 50
+_FIELD_PATTERN = re.compile(r"^[A-Za-z0-9_]+(\.[A-Za-z0-9_]+)*$")
+
+
+def parse_fields(fields: str | None, default: tuple[str, ...]) -> tuple[str, ...]:
+    """
+    Parses a comma-separated fields= value of dotted paths (customer.number). Paths under
+    another requested path are dropped, since the parent already includes them.
+    """
+    if fields is None:
+        return default
+    if fields.strip() == "*":
+        return ALL_FIELDS
+
+    paths = sorted({path.strip() for path in fields.split(",") if path.strip()})
+    if not paths or len(paths) > MAX_FIELDS:
+        raise HTTPException(status_code=400, detail=f"fields must list between 1 and {MAX_FIELDS} paths")
+    invalid = [path for path in paths if not _FIELD_PATTERN.match(path)]
+    if invalid:
+        raise HTTPException(status_code=400, detail=f"Invalid fields: {', '.join(invalid)}")
+
+    kept: list[str] = []
+    for path in paths:
+        if not any(path.startswith(f"{parent}.") for parent in kept):
+            kept.append(path)
+    return tuple(kept)
+
+
+def covered_by(fields: tuple[str, ...], available: tuple[str, ...]) -> bool:
+    """True when every path in fields is one of `available` or inside one of them."""
+    if fields == ALL_FIELDS:
+        return False
+    return all(
+        any(path == have or path.startswith(f"{have}.") for have in available)
+        for path in fields
+    )
+
+
+def project(obj: dict, fields: tuple[str, ...]) -> dict:
+    """
+    Copies only the given dotted paths, keeping their nesting. Missing paths are left out.
+    """
+    if fields == ALL_FIELDS:
+        return obj
+
+    out: dict = {}
+    for path in fields:
+        keys = path.split(".")
+        value = obj
+        for key in keys:
+            if not isinstance(value, dict) or key not in value:
+                break
+            value = value[key]
+        else:
+            target = out
+            for key in keys[:-1]:
+                target = target.setdefault(key, {})
+            target[keys[-1]] = value
+    return out
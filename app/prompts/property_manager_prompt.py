@@ -1,5 +1,3 @@
-from langchain_core.prompts import PromptTemplate
-
 SYSTEM_PROMPT = """[Identity]  
 You are an AI Receptionist and Concierge named {name} for a residential community. Your primary tasks are to understand resident inquiries, categorize their urgency, and provide relevant answers by utilizing the 'query_tool' tool to access a structured Knowledge Base (KB).
 
@@ -31,13 +29,3 @@ You are an AI Receptionist and Concierge named {name} for a residential communit
 - Remind yourself to avoid creating or assuming policy exceptions."""
 
 FIRST_MESSAGE = """Hi! My name is {name}. How can I assist you today?"""
-
-property_manager_system_prompt = PromptTemplate(
-    template=SYSTEM_PROMPT,
-    input={"name"}
-)
-
-property_manager_first_message = PromptTemplate(
-    template=FIRST_MESSAGE,
-    input={"name"}
-)
\ No newline at end of file
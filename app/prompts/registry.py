@@ -0,0 +1,62 @@
+import functools
+import string
+from dataclasses import dataclass
+from typing import Dict, Tuple
+
+from app.prompts.property_manager_prompt import FIRST_MESSAGE, SYSTEM_PROMPT
+
+# Rendered prompts kept per (use_case, name); names are user input, so the cache is bounded.
+PROMPT_CACHE_SIZE = 1024
+
+# Use cases without prompts of their own get these, as they did before the registry.
+DEFAULT_USE_CASE = "property_manager"
+
+
+class Template:
+    """
+    A str.format-style template split into literal text and {field} slots once, when it is
+    registered, so rendering is a join. Only plain field names are supported.
+    """
+
+    def __init__(self, source: str, fields: frozenset[str] = frozenset({"name"})):
+        parts: list[Tuple[str, str | None]] = []
+        for literal, field, format_spec, conversion in string.Formatter().parse(source):
+            if field is not None and (field not in fields or format_spec or conversion):
+                raise ValueError(f"Unsupported placeholder {{{field}}} in prompt template")
+            parts.append((literal, field))
+        self.parts = tuple(parts)
+        self.fields = fields
+
+    def render(self, **values: str) -> str:
+        return "".join(literal + (values[field] if field is not None else "") for literal, field in self.parts)
+
+
+@dataclass(frozen=True)
+class PromptSet:
+    system_prompt: Template
+    first_message: Template
+
+
+PROMPTS: Dict[str, PromptSet] = {
+    "property_manager": PromptSet(Template(SYSTEM_PROMPT), Template(FIRST_MESSAGE)),
+}
+# home.html's radio button value for the same use case.
+PROMPTS["property_management"] = PROMPTS["property_manager"]
+
+
+def has_prompts(use_case: str) -> bool:
+    return use_case in PROMPTS
+
+
+@functools.lru_cache(maxsize=PROMPT_CACHE_SIZE)
+def _render(use_case: str, name: str) -> Tuple[str, str]:
+    prompts = PROMPTS.get(use_case) or PROMPTS[DEFAULT_USE_CASE]
+    return prompts.system_prompt.render(name=name), prompts.first_message.render(name=name)
+
+
+def render_system_prompt(use_case: str, name: str) -> str:
+    return _render(use_case, name)[0]
+
+
+def render_first_message(use_case: str, name: str) -> str:
+    return _render(use_case, name)[1]
@@ -0,0 +1,13 @@
+from pydantic import BaseModel, Field
+
+class BulkAgent(BaseModel):
+    name: str
+    first_message: str
+    use_case: str
+    # Overrides the use case's default system prompt.
+    system_prompt: str | None = None
+    # Filenames of files uploaded with the manifest; shared ones are ingested once.
+    documents: list[str] = Field(min_length=1)
+
+class BulkAgentManifest(BaseModel):
+    agents: list[BulkAgent] = Field(min_length=1)
@@ -1,3 +1,5 @@
+from typing import Literal
+
 from pydantic import BaseModel
 
 class TicketPayload(BaseModel):
@@ -6,5 +8,5 @@ class TicketPayload(BaseModel):
     caller_name: str | None = None
     unit_number: str | None = None
     issue_summary: str
-    severity: str  # "P1" | "P2" | "LOW"
-    timestamp: str | None = None
\ No newline at end of file
+    severity: Literal["P1", "P2", "LOW"]
+    timestamp: str | None = None
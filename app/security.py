@@ -0,0 +1,85 @@
+import hmac
+import logging
+import os
+import secrets
+import time
+from dataclasses import dataclass
+
+from fastapi import Header, HTTPException
+
+logger = logging.getLogger(__name__)
+
+AUTH_TOKEN_SECRET = os.environ.get("AUTH_TOKEN_SECRET")
+AUTH_TOKEN_TTL_S = int(os.environ.get("AUTH_TOKEN_TTL_S", "3600"))
+AUTH_TOKEN_ISSUER = os.environ.get("AUTH_TOKEN_ISSUER", "opsmind")
+# Bearer token for /metrics and the */stats endpoints; they are refused while it is unset.
+OPS_TOKEN = os.environ.get("OPS_TOKEN")
+
+if not AUTH_TOKEN_SECRET:
+    # Tokens signed with a per-process key stop working on restart and across workers.
+    logger.warning("AUTH_TOKEN_SECRET is not set, using a random signing key")
+    AUTH_TOKEN_SECRET = secrets.token_urlsafe(32)
+
+_header = {"alg": "HS256"}
+_claims_options = {
+    "iss": {"essential": True, "value": AUTH_TOKEN_ISSUER},
+    "sub": {"essential": True},
+    "exp": {"essential": True},
+}
+
+
+@dataclass(frozen=True)
+class Principal:
+    user_id: str
+    tenant: str
+
+
+def issue_token(user_id: str, tenant: str) -> dict:
+    from authlib.jose import jwt
+
+    now = int(time.time())
+    claims = {
+        "iss": AUTH_TOKEN_ISSUER,
+        "sub": str(user_id),
+        "tenant": str(tenant),
+        "iat": now,
+        "exp": now + AUTH_TOKEN_TTL_S,
+    }
+    token = jwt.encode(_header, claims, AUTH_TOKEN_SECRET).decode()
+    return {"access_token": token, "token_type": "bearer", "expires_in": AUTH_TOKEN_TTL_S}
+
+
+def verify_token(token: str) -> Principal:
+    """
+    Checks signature, issuer and expiry locally; no database round-trip.
+    """
+    # Imported here, with cryptography behind it, to keep it out of the app's cold start.
+    from authlib.jose import JoseError, jwt
+
+    try:
+        claims = jwt.decode(token, AUTH_TOKEN_SECRET, claims_options=_claims_options)
+        claims.validate(leeway=5)
+    except (JoseError, ValueError):
+        raise HTTPException(status_code=401, detail="Invalid or expired token", headers={"WWW-Authenticate": "Bearer"})
+
+    return Principal(user_id=claims["sub"], tenant=claims.get("tenant") or claims["sub"])
+
+
+async def current_user(authorization: str | None = Header(default=None)) -> Principal:
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        raise HTTPException(status_code=401, detail="Missing bearer token", headers={"WWW-Authenticate": "Bearer"})
+
+    return verify_token(token)
+
+
+async def require_ops_token(authorization: str | None = Header(default=None)) -> None:
+    """
+    Guards operational endpoints (metrics, pool and cache stats) that are not scoped to a user.
+    """
+    if not OPS_TOKEN:
+        raise HTTPException(status_code=503, detail="OPS_TOKEN is not configured")
+
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(token, OPS_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid ops token", headers={"WWW-Authenticate": "Bearer"})
@@ -0,0 +1,179 @@
+import asyncio
+import logging
+import os
+import time
+from typing import AsyncIterator, Dict, List
+
+import httpx
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.concurrency import RateLimiter, gather_bounded
+from app.database import SessionLocal
+from app.prompts.registry import has_prompts, render_system_prompt
+from app.schemas.bulk_agent_request import BulkAgent
+from app.services.provisioning import (
+    get_job,
+    hold_job,
+    ingest_document,
+    insert_job,
+    new_job,
+    release_job,
+    run_job,
+    save_job,
+)
+from app.services.uploads import UploadedDocument, discard_uploads
+from app.services.vapi import VAPI_BASE_URL
+from app.upstream import upstream_rate_limits
+
+logger = logging.getLogger(__name__)
+
+BULK_MAX_AGENTS = int(os.environ.get("BULK_MAX_AGENTS", "200"))
+BULK_PROVISIONING_CONCURRENCY = int(os.environ.get("BULK_PROVISIONING_CONCURRENCY", "8"))
+# Vapi requests per second across one batch, retries included.
+BULK_VAPI_RATE_LIMIT_RPS = float(os.environ.get("BULK_VAPI_RATE_LIMIT_RPS", "10"))
+BULK_VAPI_RATE_LIMIT_BURST = int(os.environ.get("BULK_VAPI_RATE_LIMIT_BURST", "10"))
+
+# Batches keep running if the client disconnects; their jobs stay visible under /api/jobs.
+_runs: set[asyncio.Task] = set()
+
+
+def validate_manifest(agents: List[BulkAgent], filenames: set[str]) -> None:
+    if len(agents) > BULK_MAX_AGENTS:
+        raise HTTPException(status_code=400, detail=f"At most {BULK_MAX_AGENTS} agents per batch.")
+    for index, agent in enumerate(agents):
+        if agent.system_prompt is None and not has_prompts(agent.use_case):
+            raise HTTPException(status_code=400, detail=f"agents[{index}]: unknown use_case {agent.use_case!r}")
+        missing = sorted(set(agent.documents) - filenames)
+        if missing:
+            raise HTTPException(status_code=400, detail=f"agents[{index}]: documents not uploaded: {', '.join(missing)}")
+
+
+def _system_prompt(agent: BulkAgent) -> str:
+    if agent.system_prompt is not None:
+        return agent.system_prompt
+    return render_system_prompt(agent.use_case, agent.name)
+
+
+async def _ingest_unique(documents: List[UploadedDocument]) -> Dict[str, dict | None]:
+    """Ingests each distinct document once; returns sha256 -> ingest entry, None on failure."""
+    unique = list({doc.sha256: doc for doc in documents}.values())
+    outcomes = await gather_bounded(unique, ingest_document, BULK_PROVISIONING_CONCURRENCY)
+
+    ingested = {}
+    for doc, outcome in zip(unique, outcomes):
+        if isinstance(outcome, BaseException):
+            # The agents' own files stage tries again, with the usual retries.
+            logger.info(f"Exception ingesting {doc.filename} in bulk: {outcome}")
+            outcome = None
+        ingested[doc.sha256] = outcome
+    return ingested
+
+
+async def _run_batch(jobs: List[dict], documents: List[UploadedDocument], results: asyncio.Queue) -> None:
+    started = time.perf_counter()
+    upstream_rate_limits.set({
+        httpx.URL(VAPI_BASE_URL).netloc.decode(): RateLimiter(BULK_VAPI_RATE_LIMIT_RPS, BULK_VAPI_RATE_LIMIT_BURST),
+    })
+    ingested: Dict[str, dict | None] = {}
+    try:
+        ingested = await _ingest_unique([doc for job in jobs for doc in job["documents"]])
+        semaphore = asyncio.Semaphore(BULK_PROVISIONING_CONCURRENCY)
+
+        async def provision(index: int, job: dict) -> str:
+            record = job["record"]
+            try:
+                async with semaphore:
+                    entries = [ingested[doc.sha256] for doc in job["documents"]]
+                    record["checkpoint"]["files"] = entries
+                    if all(entries):
+                        record["stages"]["files"]["status"] = "succeeded"
+                    async with SessionLocal() as db:
+                        await save_job(db, record)
+
+                    await run_job(record["id"])
+
+                    async with SessionLocal() as db:
+                        view = await get_job(db, record["id"])
+                result = {"status": view["status"], "agentId": (view["result"] or {}).get("id"), "error": view["error"]}
+            except Exception as e:
+                logger.info(f"Exception provisioning bulk agent {job['name']}: {e}")
+                result = {"status": "failed", "agentId": None, "error": str(e)}
+            finally:
+                release_job(record["id"])
+
+            await results.put({"type": "agent", "index": index, "name": job["name"], "jobId": record["id"], **result})
+            return result["status"]
+
+        statuses = await asyncio.gather(*(provision(i, job) for i, job in enumerate(jobs)))
+
+        await results.put({
+            "type": "summary",
+            "agents": len(jobs),
+            "succeeded": statuses.count("succeeded"),
+            "failed": len(jobs) - statuses.count("succeeded"),
+            "uniqueDocuments": len(ingested),
+            "referencedDocuments": sum(len(job["documents"]) for job in jobs),
+            "elapsedMs": round((time.perf_counter() - started) * 1000, 1),
+        })
+    finally:
+        # Once every document is in the checkpoints no job needs the files again; otherwise
+        # they stay for retries until the upload sweep.
+        if ingested and all(ingested.values()):
+            await discard_uploads(documents)
+        await results.put(None)
+
+
+async def _stream(accepted: dict, results: asyncio.Queue) -> AsyncIterator[dict]:
+    yield accepted
+    while (result := await results.get()) is not None:
+        yield result
+
+
+async def submit_bulk(
+    db: AsyncSession,
+    user_id: str,
+    agents: List[BulkAgent],
+    documents: Dict[str, UploadedDocument],
+) -> AsyncIterator[dict]:
+    """
+    Creates one provisioning job per agent and runs the batch in the background: shared
+    documents are ingested once, then agents go through the usual stages at most
+    BULK_PROVISIONING_CONCURRENCY at a time, with Vapi calls rate limited.
+    Returns a stream of the accepted job ids, one result per agent as it finishes and
+    a summary.
+    """
+    jobs = []
+    for agent in agents:
+        agent_documents = [documents[name] for name in agent.documents]
+        record = new_job(user_id, agent.name, agent.first_message, _system_prompt(agent), agent_documents)
+        record["request"]["useCase"] = agent.use_case
+        record["request"]["sharedUploads"] = True
+        jobs.append({"name": agent.name, "documents": agent_documents, "record": record})
+
+    # Held from the start: agents can wait a while for a slot, and recovery must not take them.
+    for job in jobs:
+        hold_job(job["record"]["id"])
+    try:
+        for job in jobs:
+            await insert_job(db, job["record"])
+    except Exception:
+        for job in jobs:
+            release_job(job["record"]["id"])
+        await db.rollback()
+        await discard_uploads(list(documents.values()))
+        raise
+
+    results: asyncio.Queue = asyncio.Queue()
+    task = asyncio.create_task(_run_batch(jobs, list(documents.values()), results))
+    _runs.add(task)
+    task.add_done_callback(_runs.discard)
+
+    accepted = {"type": "accepted", "jobs": [{"name": job["name"], "jobId": job["record"]["id"]} for job in jobs]}
+    return _stream(accepted, results)
+
+
+async def stop_bulk_runs() -> None:
+    for task in _runs:
+        task.cancel()
+    await asyncio.gather(*_runs, return_exceptions=True)
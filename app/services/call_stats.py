@@ -0,0 +1,151 @@
+import datetime
+from typing import Iterable
+
+from sqlalchemy import DateTime, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+GRANULARITIES = {
+    "day": datetime.timedelta(days=1),
+    "hour": datetime.timedelta(hours=1),
+}
+
+RollupKey = tuple[str, datetime.datetime, str, str]
+
+
+def bucket_start(ts: datetime.datetime, granularity: str) -> datetime.datetime:
+    ts = ts.astimezone(datetime.timezone.utc)
+    if granularity == "day":
+        return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+    return ts.replace(minute=0, second=0, microsecond=0)
+
+
+def rollup_keys(rows: Iterable[dict]) -> set[RollupKey]:
+    """
+    Returns the (granularity, bucket, assistant, phone) rollups a set of call rows contributes to.
+    """
+    keys = set()
+    for row in rows:
+        for granularity in GRANULARITIES:
+            keys.add((
+                granularity,
+                bucket_start(row["started_at"], granularity),
+                row["assistant_id"] or "",
+                row["phone_number_id"] or "",
+            ))
+    return keys
+
+
+async def refresh_rollups(db: AsyncSession, keys: Iterable[RollupKey]) -> None:
+    """
+    Recomputes the given rollup rows from the calls table. Each refresh only scans the
+    calls inside one bucket, so the cost depends on the batch, not on the call history.
+    """
+    for granularity, start, assistant_key, phone_key in keys:
+        assistant_clause = "assistant_id = :assistant_key" if assistant_key else "assistant_id IS NULL"
+        phone_clause = "phone_number_id = :phone_key" if phone_key else "phone_number_id IS NULL"
+
+        await db.execute(
+            text(f"""
+                INSERT INTO call_rollups (granularity, bucket_start, assistant_id, phone_number_id, calls, minutes, cost)
+                SELECT :granularity, :bucket_start, :assistant_key, :phone_key,
+                       COUNT(*),
+                       COALESCE(SUM(EXTRACT(EPOCH FROM (ended_at - started_at))) FILTER (WHERE ended_at >= started_at), 0) / 60,
+                       COALESCE(SUM(cost), 0)
+                FROM calls
+                WHERE {assistant_clause}
+                  AND {phone_clause}
+                  AND started_at >= :bucket_start
+                  AND started_at < :bucket_end
+                ON CONFLICT (granularity, bucket_start, assistant_id, phone_number_id) DO UPDATE
+                SET calls = EXCLUDED.calls,
+                    minutes = EXCLUDED.minutes,
+                    cost = EXCLUDED.cost
+            """),
+            {
+                "granularity": granularity,
+                "bucket_start": start,
+                "bucket_end": start + GRANULARITIES[granularity],
+                "assistant_key": assistant_key,
+                "phone_key": phone_key,
+            },
+        )
+
+
+async def rebuild_rollups(db: AsyncSession) -> None:
+    """
+    Recomputes every rollup from scratch; used to backfill calls stored before rollups existed.
+    """
+    await db.execute(text("DELETE FROM call_rollups"))
+    for granularity in GRANULARITIES:
+        await db.execute(
+            text("""
+                INSERT INTO call_rollups (granularity, bucket_start, assistant_id, phone_number_id, calls, minutes, cost)
+                SELECT :granularity,
+                       date_trunc(:granularity, started_at AT TIME ZONE 'UTC') AT TIME ZONE 'UTC',
+                       COALESCE(assistant_id, ''),
+                       COALESCE(phone_number_id, ''),
+                       COUNT(*),
+                       COALESCE(SUM(EXTRACT(EPOCH FROM (ended_at - started_at))) FILTER (WHERE ended_at >= started_at), 0) / 60,
+                       COALESCE(SUM(cost), 0)
+                FROM calls
+                GROUP BY 2, 3, 4
+            """),
+            {"granularity": granularity},
+        )
+
+
+async def rollups_missing(db: AsyncSession) -> bool:
+    return (await db.execute(
+        text("SELECT EXISTS (SELECT 1 FROM calls) AND NOT EXISTS (SELECT 1 FROM call_rollups)")
+    )).scalar()
+
+
+async def call_stats(
+    db: AsyncSession,
+    assistant_id: str | None,
+    phone_id: str | None,
+    granularity: str,
+    start: datetime.datetime | None,
+    end: datetime.datetime | None,
+) -> dict:
+    clauses = ["granularity = :granularity"]
+    params: dict = {"granularity": granularity}
+
+    if assistant_id:
+        clauses.append("assistant_id = :assistant_id")
+        params["assistant_id"] = assistant_id
+    if phone_id:
+        clauses.append("phone_number_id = :phone_id")
+        params["phone_id"] = phone_id
+    if start:
+        clauses.append("bucket_start >= :start")
+        params["start"] = start
+    if end:
+        clauses.append("bucket_start < :end")
+        params["end"] = end
+
+    rows = (await db.execute(
+        text(f"""
+            SELECT bucket_start, SUM(calls) AS calls, SUM(minutes) AS minutes, SUM(cost) AS cost
+            FROM call_rollups
+            WHERE {" AND ".join(clauses)}
+            GROUP BY bucket_start
+            HAVING SUM(calls) > 0
+            ORDER BY bucket_start
+        """).columns(bucket_start=DateTime(timezone=True)),
+        params,
+    )).mappings().all()
+
+    return {
+        "granularity": granularity,
+        "series": [
+            {
+                "bucket": row["bucket_start"].isoformat(),
+                "calls": int(row["calls"]),
+                "minutes": round(float(row["minutes"]), 2),
+                "spent": round(float(row["cost"]), 4),
+                "avgCost": round(float(row["cost"]) / int(row["calls"]), 4),
+            }
+            for row in rows
+        ],
+    }
@@ -0,0 +1,306 @@
+import asyncio
+import base64
+import datetime
+import logging
+import os
+
+import httpx
+from sqlalchemy import JSON, DateTime, bindparam, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import SessionLocal
+from app.http_client import timeout_for
+from app.projection import CALL_SUMMARY_FIELDS, covered_by, project
+from app.upstream import upstream_request
+from app.services.call_stats import rebuild_rollups, refresh_rollups, rollup_keys, rollups_missing
+from app.services.vapi import VAPI_CALL_URL, headers
+
+logger = logging.getLogger(__name__)
+
+CALL_SYNC_INTERVAL_S = float(os.environ.get("CALL_SYNC_INTERVAL_S", "60"))
+CALL_SYNC_PAGE_SIZE = int(os.environ.get("CALL_SYNC_PAGE_SIZE", "100"))
+
+CALLS_CURSOR = "calls"
+
+_sync_task: asyncio.Task | None = None
+_sync_lock = asyncio.Lock()
+
+
+def _parse_ts(value: str | None) -> datetime.datetime | None:
+    if not value:
+        return None
+    return datetime.datetime.fromisoformat(value)
+
+
+def _call_cost(call: dict) -> float | None:
+    if isinstance(call.get("cost"), (int, float)):
+        return call["cost"]
+    total = (call.get("costBreakdown") or {}).get("total")
+    return total if isinstance(total, (int, float)) else None
+
+
+def _call_row(call: dict) -> dict:
+    created_at = _parse_ts(call.get("createdAt"))
+    return {
+        "id": call["id"],
+        "assistant_id": call.get("assistantId"),
+        "phone_number_id": call.get("phoneNumberId"),
+        "status": call.get("status"),
+        "started_at": _parse_ts(call.get("startedAt")) or created_at,
+        "ended_at": _parse_ts(call.get("endedAt")),
+        "created_at": created_at,
+        "updated_at": _parse_ts(call.get("updatedAt")) or created_at,
+        "cost": _call_cost(call),
+        "data": call,
+        "summary": project(call, CALL_SUMMARY_FIELDS),
+    }
+
+
+async def upsert_calls(db: AsyncSession, calls: list[dict]) -> None:
+    """
+    Inserts or refreshes calls in the local mirror. Older snapshots never overwrite newer ones.
+    Rollups for every bucket the calls were in before or are in now are refreshed.
+    """
+    rows = []
+    for call in calls:
+        # One malformed call must not fail the batch it arrived in.
+        try:
+            rows.append(_call_row(call))
+        except (KeyError, TypeError, ValueError) as e:
+            logger.warning(f"Skipping call {call.get('id')}: {e}")
+    if not rows:
+        return
+
+    previous = (await db.execute(
+        text("""
+            SELECT started_at, assistant_id, phone_number_id
+            FROM calls
+            WHERE id IN :ids
+        """).bindparams(bindparam("ids", expanding=True)).columns(started_at=DateTime(timezone=True)),
+        {"ids": [row["id"] for row in rows]},
+    )).mappings().all()
+
+    await db.execute(
+        text("""
+            INSERT INTO calls (id, assistant_id, phone_number_id, status, started_at, ended_at,
+                               created_at, updated_at, cost, data, summary)
+            VALUES (:id, :assistant_id, :phone_number_id, :status, :started_at, :ended_at,
+                    :created_at, :updated_at, :cost, :data, :summary)
+            ON CONFLICT (id) DO UPDATE
+            SET assistant_id = EXCLUDED.assistant_id,
+                phone_number_id = EXCLUDED.phone_number_id,
+                status = EXCLUDED.status,
+                started_at = EXCLUDED.started_at,
+                ended_at = EXCLUDED.ended_at,
+                updated_at = EXCLUDED.updated_at,
+                cost = EXCLUDED.cost,
+                data = EXCLUDED.data,
+                summary = EXCLUDED.summary
+            WHERE calls.updated_at <= EXCLUDED.updated_at
+        """).bindparams(bindparam("data", type_=JSON), bindparam("summary", type_=JSON)),
+        rows,
+    )
+
+    await refresh_rollups(db, rollup_keys(rows) | rollup_keys(previous))
+
+
+async def _get_cursor(db: AsyncSession, name: str) -> datetime.datetime | None:
+    return (await db.execute(
+        text("SELECT cursor FROM sync_cursors WHERE name = :name").columns(cursor=DateTime(timezone=True)),
+        {"name": name},
+    )).scalar()
+
+
+async def _set_cursor(db: AsyncSession, name: str, cursor: datetime.datetime) -> None:
+    await db.execute(
+        text("""
+            INSERT INTO sync_cursors (name, cursor)
+            VALUES (:name, :cursor)
+            ON CONFLICT (name) DO UPDATE SET cursor = EXCLUDED.cursor
+        """),
+        {"name": name, "cursor": cursor},
+    )
+
+
+async def sync_calls(db: AsyncSession) -> int:
+    """
+    Pulls every call updated since the stored cursor from Vapi into the calls table.
+    Vapi lists newest-created first, so pages walk backwards with createdAtLe and the
+    cursor only moves once the whole window has been stored. The boundary is inclusive so
+    calls sharing the oldest createdAt of a page aren't skipped; the ones already stored
+    are recognised by id.
+    Returns the number of calls fetched.
+    """
+    async with _sync_lock:
+        cursor = await _get_cursor(db, CALLS_CURSOR)
+        newest = cursor
+        fetched = 0
+        boundary: str | None = None
+        boundary_ids: set[str] = set()
+        # Set when a whole page shares one createdAt, to step past it with createdAtLt.
+        strict = False
+
+        while True:
+            params = {"limit": CALL_SYNC_PAGE_SIZE}
+            if cursor:
+                params["updatedAtGt"] = cursor.isoformat()
+            if boundary:
+                params["createdAtLt" if strict else "createdAtLe"] = boundary
+
+            resp = await upstream_request("GET", VAPI_CALL_URL, headers=headers, params=params, timeout=timeout_for("call"))
+            resp.raise_for_status()
+            page = resp.json()
+            fresh = [call for call in page if call["id"] not in boundary_ids]
+
+            await upsert_calls(db, fresh)
+            await db.commit()
+            fetched += len(fresh)
+
+            for call in fresh:
+                updated_at = _parse_ts(call.get("updatedAt"))
+                if updated_at and (newest is None or updated_at > newest):
+                    newest = updated_at
+
+            if len(page) < CALL_SYNC_PAGE_SIZE:
+                break
+
+            if not fresh and not strict:
+                logger.warning(
+                    f"A whole page of calls was created at {boundary}; stepping past it, "
+                    f"raise CALL_SYNC_PAGE_SIZE if calls go missing"
+                )
+                strict = True
+                continue
+            strict = False
+
+            oldest = min(call["createdAt"] for call in page)
+            at_oldest = {call["id"] for call in page if call["createdAt"] == oldest}
+            boundary_ids = at_oldest | boundary_ids if oldest == boundary else at_oldest
+            boundary = oldest
+
+        if newest and newest != cursor:
+            await _set_cursor(db, CALLS_CURSOR, newest)
+            await db.commit()
+
+        return fetched
+
+
+async def _sync_loop() -> None:
+    while True:
+        db = SessionLocal()
+        try:
+            if await rollups_missing(db):
+                await rebuild_rollups(db)
+                await db.commit()
+
+            fetched = await sync_calls(db)
+            if fetched:
+                logger.info(f"Synced {fetched} calls from Vapi")
+        except (httpx.HTTPError, ValueError) as e:
+            await db.rollback()
+            logger.info(f"Exception syncing calls: {e}")
+        except Exception as e:
+            await db.rollback()
+            logger.exception(f"Unexpected error syncing calls: {e}")
+        finally:
+            await db.close()
+
+        await asyncio.sleep(CALL_SYNC_INTERVAL_S)
+
+
+async def start_call_sync() -> None:
+    global _sync_task
+    if _sync_task is None and CALL_SYNC_INTERVAL_S > 0:
+        _sync_task = asyncio.create_task(_sync_loop())
+
+
+async def stop_call_sync() -> None:
+    global _sync_task
+    if _sync_task is not None:
+        _sync_task.cancel()
+        await asyncio.gather(_sync_task, return_exceptions=True)
+        _sync_task = None
+
+
+def encode_page_cursor(started_at: datetime.datetime, call_id: str) -> str:
+    return base64.urlsafe_b64encode(f"{started_at.isoformat()}|{call_id}".encode()).decode()
+
+
+def decode_page_cursor(cursor: str) -> tuple[datetime.datetime, str]:
+    started_at, call_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|", 1)
+    return datetime.datetime.fromisoformat(started_at), call_id
+
+
+async def list_stored_calls(
+    db: AsyncSession,
+    assistant_id: str | None,
+    phone_id: str | None,
+    started_after: datetime.datetime | None,
+    started_before: datetime.datetime | None,
+    limit: int,
+    cursor: str | None,
+    fields: tuple[str, ...] = CALL_SUMMARY_FIELDS,
+) -> dict:
+    """
+    Lists mirrored calls newest first, using (started_at, id) keyset pagination, each
+    call projected to `fields` (see app.projection.parse_fields).
+    The full data column is only read when the stored summary doesn't cover the fields.
+    Returns {"results": [...], "nextCursor": str | None}.
+    """
+    clauses = []
+    params: dict = {"limit": limit + 1}
+
+    if assistant_id:
+        clauses.append("assistant_id = :assistant_id")
+        params["assistant_id"] = assistant_id
+    if phone_id:
+        clauses.append("phone_number_id = :phone_id")
+        params["phone_id"] = phone_id
+    if started_after:
+        clauses.append("started_at >= :started_after")
+        params["started_after"] = started_after
+    if started_before:
+        clauses.append("started_at < :started_before")
+        params["started_before"] = started_before
+    if cursor:
+        params["cursor_started_at"], params["cursor_id"] = decode_page_cursor(cursor)
+        clauses.append("(started_at, id) < (:cursor_started_at, :cursor_id)")
+
+    where = " AND ".join(clauses) if clauses else "TRUE"
+
+    from_summary = covered_by(fields, CALL_SUMMARY_FIELDS)
+    # Rows written before the summary column existed fall back to data.
+    columns = "summary, CASE WHEN summary IS NULL THEN data END AS data" if from_summary else "data"
+
+    rows = (await db.execute(
+        text(f"""
+            SELECT id, started_at, {columns}
+            FROM calls
+            WHERE {where}
+            ORDER BY started_at DESC, id DESC
+            LIMIT :limit
+        """).columns(started_at=DateTime(timezone=True), summary=JSON, data=JSON),
+        params,
+    )).mappings().all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_page_cursor(rows[-1]["started_at"], rows[-1]["id"])
+
+    results = [
+        project(row["summary"] if from_summary and row["summary"] is not None else row["data"], fields)
+        for row in rows
+    ]
+    return {"results": results, "nextCursor": next_cursor}
+
+
+async def get_call_owner(db: AsyncSession, call_id: str) -> tuple[str | None, str | None] | None:
+    """
+    Returns (assistant_id, phone_number_id) of a mirrored call, or None if it isn't stored yet.
+    """
+    row = (await db.execute(
+        text("SELECT assistant_id, phone_number_id FROM calls WHERE id = :id"),
+        {"id": call_id},
+    )).first()
+    return (row[0], row[1]) if row else None
@@ -0,0 +1,160 @@
+import asyncio
+import hashlib
+import logging
+from typing import List
+
+from sqlalchemy import JSON, bindparam, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.services.vapi import create_vapi_query_tool, delete_vapi_tool
+
+logger = logging.getLogger(__name__)
+
+KB_PROVIDER = "google"
+KB_MODEL = "gemini-2.0-flash"
+
+# Agents built together (bulk provisioning) usually share file sets; one lock per key
+# keeps this process from creating the same tool several times over.
+_key_locks: dict[str, tuple[asyncio.Lock, list[int]]] = {}
+
+
+def tool_key(file_ids: List[str], provider: str = KB_PROVIDER, model: str = KB_MODEL) -> str:
+    normalized = "\n".join([provider, model, *sorted(set(file_ids))])
+    return hashlib.sha256(normalized.encode()).hexdigest()
+
+
+async def acquire_tool(
+    db: AsyncSession,
+    file_ids: List[str],
+    tool_description: str,
+    kb_name: str,
+    kb_description: str,
+    provider: str = KB_PROVIDER,
+    model: str = KB_MODEL,
+) -> dict:
+    """
+    Returns {"key", "toolId", "reused"} for a query tool over exactly these files, creating
+    it in Vapi only when no agent built from the same files has one yet. Takes a reference
+    that the agent keeps until delete_assistant releases it.
+    """
+    key = tool_key(file_ids, provider, model)
+    lock, users = _key_locks.setdefault(key, (asyncio.Lock(), [0]))
+    users[0] += 1
+    try:
+        async with lock:
+            return await _acquire_tool(db, key, file_ids, tool_description, kb_name, kb_description, provider, model)
+    finally:
+        users[0] -= 1
+        if not users[0]:
+            _key_locks.pop(key, None)
+
+
+async def _acquire_tool(
+    db: AsyncSession,
+    key: str,
+    file_ids: List[str],
+    tool_description: str,
+    kb_name: str,
+    kb_description: str,
+    provider: str,
+    model: str,
+) -> dict:
+    tool_id = (await db.execute(
+        text("""
+            UPDATE kb_tools
+            SET ref_count = ref_count + 1, last_used_at = now()
+            WHERE key = :key
+            RETURNING tool_id
+        """),
+        {"key": key},
+    )).scalar()
+    await db.commit()
+    if tool_id:
+        return {"key": key, "toolId": tool_id, "reused": True}
+
+    created = await create_vapi_query_tool(
+        tool_description=tool_description,
+        kb_name=kb_name,
+        kb_description=kb_description,
+        file_ids=sorted(set(file_ids)),
+        provider=provider,
+        model=model,
+    )
+
+    # Another job may have registered the same files while ours was being created.
+    tool_id = (await db.execute(
+        text("""
+            INSERT INTO kb_tools (key, tool_id, provider, model, file_ids, ref_count)
+            VALUES (:key, :tool_id, :provider, :model, :file_ids, 1)
+            ON CONFLICT (key) DO UPDATE
+            SET ref_count = kb_tools.ref_count + 1, last_used_at = now()
+            RETURNING tool_id
+        """).bindparams(bindparam("file_ids", type_=JSON)),
+        {"key": key, "tool_id": created, "provider": provider, "model": model, "file_ids": sorted(set(file_ids))},
+    )).scalar_one()
+    await db.commit()
+
+    if tool_id != created:
+        try:
+            await delete_vapi_tool(created)
+        except Exception as e:
+            logger.info(f"Exception deleting duplicate tool {created}: {e}")
+    return {"key": key, "toolId": tool_id, "reused": tool_id != created}
+
+
+async def link_agent_tool(db: AsyncSession, agent_id: str, key: str) -> None:
+    """Records which tool an agent holds a reference to. Doesn't commit."""
+    await db.execute(
+        text("""
+            INSERT INTO agent_tools (agent_id, tool_key)
+            VALUES (:agent_id, :key)
+            ON CONFLICT (agent_id) DO NOTHING
+        """),
+        {"agent_id": agent_id, "key": key},
+    )
+
+
+async def release_agent_tool(db: AsyncSession, agent_id: str) -> str | None:
+    """
+    Drops the agent's reference to its tool. When it was the last one the registry row
+    goes too, in the same transaction, and the tool is deleted from Vapi.
+    Returns the deleted tool id, if any.
+    """
+    key = (await db.execute(
+        text("DELETE FROM agent_tools WHERE agent_id = :agent_id RETURNING tool_key"),
+        {"agent_id": agent_id},
+    )).scalar()
+    if key is None:
+        return None
+    return await release_tool(db, key)
+
+
+async def release_tool(db: AsyncSession, key: str) -> str | None:
+    """
+    Drops one reference taken by acquire_tool, deleting the tool once none are left.
+    Commits, along with anything already pending on db. Returns the deleted tool id, if any.
+    """
+    # The decrement locks the row, so a concurrent acquire_tool either reuses the tool
+    # before this point or finds no row afterwards and creates a new one.
+    row = (await db.execute(
+        text("""
+            UPDATE kb_tools
+            SET ref_count = ref_count - 1
+            WHERE key = :key
+            RETURNING ref_count, tool_id
+        """),
+        {"key": key},
+    )).first()
+    if row is None or row.ref_count > 0:
+        await db.commit()
+        return None
+
+    await db.execute(text("DELETE FROM kb_tools WHERE key = :key AND ref_count <= 0"), {"key": key})
+    await db.commit()
+
+    try:
+        await delete_vapi_tool(row.tool_id)
+    except Exception as e:
+        logger.info(f"Exception deleting unused tool {row.tool_id}: {e}")
+        return None
+    return row.tool_id
@@ -0,0 +1,94 @@
+import datetime
+import os
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+OCR_CACHE_MAX_BYTES = int(os.environ.get("OCR_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+OCR_CACHE_MAX_AGE_DAYS = int(os.environ.get("OCR_CACHE_MAX_AGE_DAYS", "30"))
+
+
+def _age_cutoff() -> datetime.datetime:
+    return datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=OCR_CACHE_MAX_AGE_DAYS)
+
+
+async def get_cached_ocr(db: AsyncSession, digest: str) -> dict | None:
+    """
+    Returns {"text", "vapi_file_id"} for a fresh entry and bumps its last use, or None on a miss.
+    """
+    row = (await db.execute(
+        text("""
+            UPDATE ocr_cache
+            SET last_used_at = now()
+            WHERE content_hash = :content_hash AND created_at >= :cutoff
+            RETURNING text, vapi_file_id
+        """),
+        {"content_hash": digest, "cutoff": _age_cutoff()},
+    )).mappings().first()
+    await db.commit()
+
+    return dict(row) if row else None
+
+
+async def store_ocr(db: AsyncSession, digest: str, ocr_text: str, vapi_file_id: str) -> None:
+    await db.execute(
+        text("""
+            INSERT INTO ocr_cache (content_hash, text, vapi_file_id, text_bytes)
+            VALUES (:content_hash, :text, :vapi_file_id, :text_bytes)
+            ON CONFLICT (content_hash) DO UPDATE
+            SET text = EXCLUDED.text,
+                vapi_file_id = EXCLUDED.vapi_file_id,
+                text_bytes = EXCLUDED.text_bytes,
+                created_at = now(),
+                last_used_at = now()
+        """),
+        {
+            "content_hash": digest,
+            "text": ocr_text,
+            "vapi_file_id": vapi_file_id,
+            "text_bytes": len(ocr_text.encode("utf-8")),
+        },
+    )
+    await evict_ocr_cache(db)
+    await db.commit()
+
+
+async def evict_ocr_cache(db: AsyncSession) -> None:
+    """
+    Drops entries past OCR_CACHE_MAX_AGE_DAYS, then least recently used entries
+    until the cached text fits in OCR_CACHE_MAX_BYTES. Each delete only runs when
+    the cheap totals below say it has something to do.
+    """
+    cutoff = _age_cutoff()
+    totals = (await db.execute(
+        text("""
+            SELECT COALESCE(SUM(text_bytes), 0) AS total_bytes,
+                   COALESCE(MIN(created_at) < :cutoff, false) AS has_expired
+            FROM ocr_cache
+        """),
+        {"cutoff": cutoff},
+    )).mappings().one()
+
+    if totals["has_expired"]:
+        await db.execute(
+            text("DELETE FROM ocr_cache WHERE created_at < :cutoff"),
+            {"cutoff": cutoff},
+        )
+
+    if totals["total_bytes"] <= OCR_CACHE_MAX_BYTES:
+        return
+
+    await db.execute(
+        text("""
+            DELETE FROM ocr_cache
+            WHERE content_hash IN (
+                SELECT content_hash FROM (
+                    SELECT content_hash,
+                           SUM(text_bytes) OVER (ORDER BY last_used_at DESC, content_hash) AS running_bytes
+                    FROM ocr_cache
+                ) ranked
+                WHERE running_bytes > :max_bytes
+            )
+        """),
+        {"max_bytes": OCR_CACHE_MAX_BYTES},
+    )
@@ -0,0 +1,56 @@
+import os
+
+from fastapi import HTTPException
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.cache import SWRCache
+
+OWNERSHIP_CACHE_TTL_S = float(os.environ.get("OWNERSHIP_CACHE_TTL_S", "60"))
+OWNERSHIP_CACHE_MAX_ENTRIES = int(os.environ.get("OWNERSHIP_CACHE_MAX_ENTRIES", "10000"))
+
+# No stale window: ownership must never be served past its TTL.
+ownership_cache = SWRCache("ownership", OWNERSHIP_CACHE_TTL_S, 0, OWNERSHIP_CACHE_MAX_ENTRIES)
+
+
+async def _load_owned(db: AsyncSession, user_id: str) -> dict:
+    agents = (await db.execute(
+        text("SELECT agent_id FROM user_agent WHERE user_id = :user_id"),
+        {"user_id": user_id},
+    )).scalars().all()
+    phones = (await db.execute(
+        text("SELECT phone_id FROM user_phone WHERE user_id = :user_id"),
+        {"user_id": user_id},
+    )).scalars().all()
+    return {"agents": list(agents), "phones": list(phones)}
+
+
+async def owned_resources(db: AsyncSession, user_id: str) -> dict:
+    """
+    Returns {"agents": [...], "phones": [...]} owned by the user, cached for OWNERSHIP_CACHE_TTL_S.
+    """
+    async def load() -> dict:
+        return await _load_owned(db, user_id)
+
+    return await ownership_cache.get_or_load(str(user_id), load)
+
+
+async def invalidate_ownership(user_id: str) -> None:
+    await ownership_cache.invalidate(str(user_id))
+
+
+async def require_agent(db: AsyncSession, user_id: str, agent_id: str) -> None:
+    if agent_id not in (await owned_resources(db, user_id))["agents"]:
+        raise HTTPException(status_code=404, detail="Agent not found")
+
+
+async def require_call_scope(db: AsyncSession, user_id: str, assistant_id: str | None, phone_id: str | None) -> None:
+    """
+    Allows a call (or a call query) when its assistant or its phone number belongs to the user.
+    """
+    owned = await owned_resources(db, user_id)
+    if assistant_id and assistant_id in owned["agents"]:
+        return
+    if phone_id and phone_id in owned["phones"]:
+        return
+    raise HTTPException(status_code=404, detail="Not found")
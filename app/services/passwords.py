@@ -0,0 +1,77 @@
+import asyncio
+import functools
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException
+
+from app.metrics import password_hash_seconds
+
+# Defaults match passlib's argon2 defaults, so existing hashes don't need a rehash.
+ARGON2_TIME_COST = int(os.environ.get("ARGON2_TIME_COST", "3"))
+ARGON2_MEMORY_COST = int(os.environ.get("ARGON2_MEMORY_COST", "65536"))  # KiB
+ARGON2_PARALLELISM = int(os.environ.get("ARGON2_PARALLELISM", "4"))
+
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_MAX_PENDING = int(os.environ.get("PASSWORD_HASH_MAX_PENDING", "32"))
+
+
+@functools.cache
+def _pwd_context():
+    # passlib and argon2 are only needed once someone logs in, so they stay out of startup.
+    from passlib.context import CryptContext
+
+    return CryptContext(
+        schemes=["argon2"],
+        deprecated="auto",
+        argon2__rounds=ARGON2_TIME_COST,
+        argon2__memory_cost=ARGON2_MEMORY_COST,
+        argon2__parallelism=ARGON2_PARALLELISM,
+    )
+
+
+# argon2-cffi releases the GIL while hashing, so these threads run in parallel with the event loop.
+_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="argon2")
+_in_flight = 0
+
+
+async def _run(fn, *args):
+    """
+    Runs a hashing call on the password pool. Requests beyond the running workers plus
+    PASSWORD_HASH_MAX_PENDING queued ones are refused with 503 instead of piling up.
+    """
+    global _in_flight
+    if _in_flight >= PASSWORD_HASH_WORKERS + PASSWORD_HASH_MAX_PENDING:
+        raise HTTPException(
+            status_code=503,
+            detail="Too many login attempts in progress, retry shortly",
+            headers={"Retry-After": "1"},
+        )
+
+    _in_flight += 1
+    start = time.perf_counter()
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_executor, fn, *args)
+    finally:
+        _in_flight -= 1
+        password_hash_seconds.observe((fn.__name__,), time.perf_counter() - start)
+
+
+async def get_password_hash(password: str) -> str:
+    return await _run(_pwd_context().hash, password)
+
+
+async def verify_password(plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+    """
+    Returns (valid, new_hash). new_hash is set when the stored hash used older cost parameters.
+    """
+    return await _run(_pwd_context().verify_and_update, plain_password, hashed_password)
+
+
+def hashing_stats() -> dict:
+    return {
+        "workers": PASSWORD_HASH_WORKERS,
+        "maxPending": PASSWORD_HASH_MAX_PENDING,
+        "inFlight": _in_flight,
+    }
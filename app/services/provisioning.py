@@ -0,0 +1,614 @@
+import asyncio
+import datetime
+import logging
+import os
+import time
+import uuid
+from dataclasses import asdict
+from typing import List
+
+from fastapi import HTTPException
+from sqlalchemy import JSON, DateTime, bindparam, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.concurrency import gather_bounded
+from app.database import SessionLocal
+from app.services.ocr_cache import get_cached_ocr, store_ocr
+from app.services.kb_tools import acquire_tool, link_agent_tool, release_tool
+from app.services.ownership import invalidate_ownership
+from app.services.uploads import UploadedDocument, discard_uploads, sweep_uploads
+from app.services.vapi import (
+    assistant_cache,
+    create_vapi_assistant,
+    delete_vapi_assistant,
+    headers,
+    run_ocr,
+    upload_text_to_vapi,
+)
+
+logger = logging.getLogger(__name__)
+
+PROVISIONING_WORKERS = int(os.environ.get("PROVISIONING_WORKERS", "2"))
+PROVISIONING_STAGE_ATTEMPTS = int(os.environ.get("PROVISIONING_STAGE_ATTEMPTS", "3"))
+PROVISIONING_RETRY_BACKOFF_S = float(os.environ.get("PROVISIONING_RETRY_BACKOFF_S", "2"))
+
+CREATE_AGENT_FILE_CONCURRENCY = int(os.environ.get("CREATE_AGENT_FILE_CONCURRENCY", "4"))
+
+# Each process refreshes updated_at on the jobs it holds (queued or running) this often.
+# Queued or running jobs nobody has refreshed for PROVISIONING_STALE_S were lost to a
+# crash or deploy, and are claimed and re-run by whichever process sees them first.
+PROVISIONING_HEARTBEAT_S = float(os.environ.get("PROVISIONING_HEARTBEAT_S", "30"))
+PROVISIONING_STALE_S = float(os.environ.get("PROVISIONING_STALE_S", "120"))
+
+STAGES = ("files", "tool", "assistant", "register")
+
+TOOL_DESCRIPTION = """Use this tool to retrieve factual information from official business documents HOAs uploaded by the user.
+Only use this tool when the caller asks specific questions about written rules, policies, restrictions, procedures, or requirements (For example: size of leaving units in a leasing, pool usage, etc). If the information is not explicitly stated in the documents, say that you do not have that information and do not guess."""
+
+KB_DESCRIPTION = """Contains comprehensive information about HOAs rules, regulations, prohibitions and other concerns about the property and leasing."""
+
+
+_queue: asyncio.Queue | None = None
+_workers: List[asyncio.Task] = []
+_recovery_task: asyncio.Task | None = None
+# Jobs this process has queued or is running; kept fresh by the heartbeat.
+_held: set[str] = set()
+
+_JOB_JSON_PARAMS = (
+    bindparam("request", type_=JSON),
+    bindparam("stages", type_=JSON),
+    bindparam("checkpoint", type_=JSON),
+    bindparam("result", type_=JSON),
+)
+
+
+def _now() -> str:
+    return datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+
+def _elapsed_ms(since: float) -> float:
+    return round((time.perf_counter() - since) * 1000, 1)
+
+
+def _error_text(exc: BaseException) -> str:
+    return str(exc.detail) if isinstance(exc, HTTPException) else str(exc)
+
+
+def _is_retryable(exc: BaseException) -> bool:
+    if isinstance(exc, HTTPException):
+        return exc.status_code >= 500 or exc.status_code == 429
+    return True
+
+
+async def insert_job(db: AsyncSession, job: dict) -> None:
+    await db.execute(
+        text("""
+            INSERT INTO provisioning_jobs (id, user_id, status, request, stages, checkpoint, result, error)
+            VALUES (:id, :user_id, :status, :request, :stages, :checkpoint, :result, :error)
+        """).bindparams(*_JOB_JSON_PARAMS),
+        job,
+    )
+    await db.commit()
+
+
+async def save_job(db: AsyncSession, job: dict) -> None:
+    await db.execute(
+        text("""
+            UPDATE provisioning_jobs
+            SET status = :status,
+                stages = :stages,
+                checkpoint = :checkpoint,
+                result = :result,
+                error = :error,
+                updated_at = now()
+            WHERE id = :id
+        """).bindparams(*_JOB_JSON_PARAMS[1:]),
+        {key: job[key] for key in ("id", "status", "stages", "checkpoint", "result", "error")},
+    )
+    await db.commit()
+
+
+async def _load_job(db: AsyncSession, job_id: str) -> dict | None:
+    row = (await db.execute(
+        text("""
+            SELECT id, user_id, status, request, stages, checkpoint, result, error, created_at, updated_at
+            FROM provisioning_jobs
+            WHERE id = :id
+        """).columns(request=JSON, stages=JSON, checkpoint=JSON, result=JSON),
+        {"id": job_id},
+    )).mappings().first()
+
+    return dict(row) if row else None
+
+
+async def get_job(db: AsyncSession, job_id: str, user_id: str | None = None) -> dict | None:
+    """
+    Returns the public view of a job: overall status, per-stage progress and the result once done.
+    With user_id, jobs belonging to other users are reported as missing.
+    """
+    job = await _load_job(db, job_id)
+    if not job or (user_id is not None and job["user_id"] != str(user_id)):
+        return None
+
+    return {
+        "id": job["id"],
+        "status": job["status"],
+        "stages": job["stages"],
+        "result": job["result"],
+        "error": job["error"],
+        "createdAt": job["created_at"],
+        "updatedAt": job["updated_at"],
+    }
+
+
+def new_job(
+    user_id: str,
+    agent_name: str,
+    first_message: str,
+    system_prompt: str,
+    documents: List[UploadedDocument],
+) -> dict:
+    return {
+        "id": str(uuid.uuid4()),
+        "user_id": user_id,
+        "status": "queued",
+        "request": {
+            "agentName": agent_name,
+            "firstMessage": first_message,
+            "systemPrompt": system_prompt,
+            "filenames": [doc.filename for doc in documents],
+            # Spooled to UPLOAD_DIR by the controller; removed once the files stage succeeds.
+            "documents": [asdict(doc) for doc in documents],
+        },
+        "stages": {
+            stage: {"status": "pending", "attempts": 0, "error": None, "startedAt": None, "finishedAt": None}
+            for stage in STAGES
+        },
+        "checkpoint": {"files": [None] * len(documents)},
+        "result": None,
+        "error": None,
+    }
+
+
+async def submit_job(
+    db: AsyncSession,
+    user_id: str,
+    agent_name: str,
+    first_message: str,
+    system_prompt: str,
+    documents: List[UploadedDocument],
+) -> dict:
+    job = new_job(user_id, agent_name, first_message, system_prompt, documents)
+    try:
+        await insert_job(db, job)
+    except Exception:
+        await discard_uploads(documents)
+        raise
+    await _enqueue(job["id"])
+
+    return await get_job(db, job["id"])
+
+
+async def retry_job(db: AsyncSession, job_id: str, user_id: str | None = None) -> dict | None:
+    """
+    Re-queues a failed job. Stages that already succeeded are skipped on the next run.
+    The job is claimed with a single UPDATE, so concurrent retries queue it once.
+    """
+    job = await _load_job(db, job_id)
+    if not job or (user_id is not None and job["user_id"] != str(user_id)):
+        return None
+
+    if job["status"] != "failed":
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}, only failed jobs can be retried.")
+
+    if job["stages"]["files"]["status"] != "succeeded" and _job_documents(job) is None:
+        raise HTTPException(status_code=409, detail="Uploaded files are no longer available; create the agent again.")
+
+    claimed = (await db.execute(
+        text("""
+            UPDATE provisioning_jobs
+            SET status = 'queued', error = NULL, updated_at = now()
+            WHERE id = :id AND user_id = :user_id AND status = 'failed'
+            RETURNING id
+        """),
+        {"id": job_id, "user_id": job["user_id"]},
+    )).scalar()
+    await db.commit()
+    if claimed is None:
+        raise HTTPException(status_code=409, detail="Job is already being retried.")
+
+    hold_job(job_id)
+    job = await _load_job(db, job_id)
+    _reset_job(job)
+    await save_job(db, job)
+
+    await _enqueue(job_id)
+
+    return await get_job(db, job_id)
+
+
+def _reset_job(job: dict) -> None:
+    job["status"] = "queued"
+    job["error"] = None
+    for stage, state in job["stages"].items():
+        if state["status"] != "succeeded":
+            _reset_stage(job, stage)
+
+
+def _job_documents(job: dict) -> List[UploadedDocument] | None:
+    """
+    The job's spooled uploads, or None once any of them is gone (swept, or spooled on
+    another instance).
+    """
+    documents = [UploadedDocument(**doc) for doc in job["request"].get("documents", [])]
+    if len(documents) != len(job["checkpoint"]["files"]):
+        return None
+    if not all(os.path.exists(doc.path) for doc in documents):
+        return None
+    return documents
+
+
+async def ingest_document(doc: UploadedDocument) -> dict:
+    """
+    OCRs and uploads one document to Vapi, timing each stage in milliseconds.
+    Documents already seen (by content hash) reuse the cached text and Vapi file id.
+    Uses its own sessions, since documents are ingested concurrently.
+    """
+    started = time.perf_counter()
+
+    digest = doc.sha256
+    async with SessionLocal() as db:
+        cached = await get_cached_ocr(db, digest)
+    if cached:
+        return {
+            "filename": doc.filename,
+            "fileId": cached["vapi_file_id"],
+            "cached": True,
+            "ocrMs": 0.0,
+            "uploadMs": 0.0,
+            "totalMs": _elapsed_ms(started),
+        }
+
+    ocr_started = time.perf_counter()
+    ocr_text = await run_ocr(
+        path=doc.path,
+        filename=doc.filename,
+        content_type=doc.content_type
+    )
+    ocr_ms = _elapsed_ms(ocr_started)
+
+    upload_started = time.perf_counter()
+    vapi_file_id = await upload_text_to_vapi(
+        text=ocr_text,
+        base_filename=doc.filename,
+        headers=headers
+    )
+    upload_ms = _elapsed_ms(upload_started)
+
+    async with SessionLocal() as db:
+        try:
+            await store_ocr(db, digest, ocr_text, vapi_file_id)
+        except Exception as e:
+            await db.rollback()
+            logger.info(f"Exception caching OCR for {doc.filename}: {e}")
+
+    return {
+        "filename": doc.filename,
+        "fileId": vapi_file_id,
+        "cached": False,
+        "ocrMs": ocr_ms,
+        "uploadMs": upload_ms,
+        "totalMs": _elapsed_ms(started),
+    }
+
+
+async def _stage_files(db: AsyncSession, job: dict) -> None:
+    ingested = job["checkpoint"]["files"]
+    pending = [i for i, entry in enumerate(ingested) if entry is None]
+    if not pending:
+        return
+
+    documents = _job_documents(job)
+    if documents is None:
+        raise HTTPException(status_code=409, detail="Uploaded files are no longer available; create the agent again.")
+
+    state = job["stages"]["files"]
+    save_lock = asyncio.Lock()
+
+    async def ingest(index: int) -> None:
+        ingested[index] = await ingest_document(documents[index])
+        state["progress"] = {"done": sum(entry is not None for entry in ingested), "total": len(ingested)}
+        # An AsyncSession can't run statements concurrently.
+        async with save_lock:
+            await save_job(db, job)
+
+    outcomes = await gather_bounded(pending, ingest, CREATE_AGENT_FILE_CONCURRENCY)
+
+    for outcome in outcomes:
+        if isinstance(outcome, BaseException):
+            raise outcome
+
+    # The checkpoint has the Vapi file ids now; retries never need the uploads again.
+    # Bulk batches share their uploads between jobs and clean them up themselves.
+    if not job["request"].get("sharedUploads"):
+        await discard_uploads(documents)
+
+
+async def _stage_tool(db: AsyncSession, job: dict) -> None:
+    checkpoint = job["checkpoint"]
+    tool = await acquire_tool(
+        db,
+        file_ids=[entry["fileId"] for entry in checkpoint["files"]],
+        tool_description=TOOL_DESCRIPTION,
+        kb_name="business_documents",
+        kb_description=KB_DESCRIPTION,
+    )
+    checkpoint["toolId"] = tool["toolId"]
+    checkpoint["toolKey"] = tool["key"]
+    checkpoint["toolReused"] = tool["reused"]
+
+
+async def _stage_assistant(db: AsyncSession, job: dict) -> None:
+    request = job["request"]
+    checkpoint = job["checkpoint"]
+
+    payload = {
+        "name": request["agentName"],
+        "firstMessage": request["firstMessage"],
+        "model": {
+            "provider": "openai",
+            "model": "gpt-4o-mini",
+            "knowledgeBase": {
+                "provider": "google",
+                "fileIds": [entry["fileId"] for entry in checkpoint["files"]]
+            },
+            "messages": [
+                {
+                    "role": "system",
+                    "content": request["systemPrompt"]
+                }
+            ],
+            "toolIds": [
+                checkpoint["toolId"]
+            ]
+        },
+        "voice": {
+            "provider": "11labs",
+            "voiceId": "cgSgspJ2msm6clMCkdW9",
+            "model": "eleven_turbo_v2_5",
+            "stability": 0.5,
+            "similarityBoost": 0.75
+        }
+    }
+
+    checkpoint["agent"] = await create_vapi_assistant(payload)
+    await assistant_cache.invalidate(checkpoint["agent"]["id"])
+
+
+async def _stage_register(db: AsyncSession, job: dict) -> None:
+    await db.execute(
+        text("""
+            INSERT INTO user_agent (user_id, agent_id)
+            VALUES (:user_id, :agent_id)
+            ON CONFLICT (user_id, agent_id) DO NOTHING
+        """),
+        {"user_id": job["user_id"], "agent_id": job["checkpoint"]["agent"]["id"]}
+    )
+    # Jobs checkpointed before the tool registry have no key.
+    if job["checkpoint"].get("toolKey"):
+        await link_agent_tool(db, job["checkpoint"]["agent"]["id"], job["checkpoint"]["toolKey"])
+    await db.commit()
+    await invalidate_ownership(job["user_id"])
+
+
+STAGE_HANDLERS = {
+    "files": _stage_files,
+    "tool": _stage_tool,
+    "assistant": _stage_assistant,
+    "register": _stage_register,
+}
+
+
+async def _run_stage(db: AsyncSession, job: dict, stage: str) -> None:
+    state = job["stages"][stage]
+    state["status"] = "running"
+    state["startedAt"] = _now()
+
+    while True:
+        state["attempts"] += 1
+        await save_job(db, job)
+
+        try:
+            await STAGE_HANDLERS[stage](db, job)
+        except Exception as e:
+            await db.rollback()
+            state["error"] = _error_text(e)
+            logger.info(f"Job {job['id']} stage {stage} attempt {state['attempts']} failed: {state['error']}")
+
+            if state["attempts"] >= PROVISIONING_STAGE_ATTEMPTS or not _is_retryable(e):
+                state["status"] = "failed"
+                state["finishedAt"] = _now()
+                raise
+
+            await save_job(db, job)
+            await asyncio.sleep(PROVISIONING_RETRY_BACKOFF_S * 2 ** (state["attempts"] - 1))
+        else:
+            state["status"] = "succeeded"
+            state["error"] = None
+            state["finishedAt"] = _now()
+            await save_job(db, job)
+            return
+
+
+def _reset_stage(job: dict, stage: str) -> None:
+    job["stages"][stage].update({"status": "pending", "attempts": 0, "error": None, "startedAt": None, "finishedAt": None})
+
+
+async def _release_unregistered(db: AsyncSession, job: dict) -> None:
+    """
+    Undoes the Vapi side of a job that failed before registering its agent: the assistant,
+    which nobody can reach without the user_agent row, and the job's reference to the shared
+    query tool, which would otherwise keep the tool alive for good. A retry redoes both stages.
+    """
+    checkpoint = job["checkpoint"]
+    if job["stages"]["register"]["status"] == "succeeded":
+        return
+
+    if checkpoint.get("agent"):
+        try:
+            await delete_vapi_assistant(checkpoint["agent"]["id"])
+        except Exception as e:
+            # Keep the tool reference: the assistant still uses the tool.
+            logger.info(f"Exception deleting unregistered assistant of job {job['id']}: {e}")
+            return
+        del checkpoint["agent"]
+        _reset_stage(job, "assistant")
+
+    if checkpoint.get("toolKey"):
+        try:
+            await release_tool(db, checkpoint["toolKey"])
+        except Exception as e:
+            await db.rollback()
+            logger.info(f"Exception releasing tool of job {job['id']}: {e}")
+            return
+        for key in ("toolId", "toolKey", "toolReused"):
+            checkpoint.pop(key, None)
+        _reset_stage(job, "tool")
+
+
+async def run_job(job_id: str) -> None:
+    db = SessionLocal()
+    job = None
+    try:
+        job = await _load_job(db, job_id)
+        if not job:
+            return
+
+        job["status"] = "running"
+        await save_job(db, job)
+
+        for stage in STAGES:
+            if job["stages"][stage]["status"] != "succeeded":
+                await _run_stage(db, job, stage)
+
+        checkpoint = job["checkpoint"]
+        job["status"] = "succeeded"
+        job["result"] = {**checkpoint["agent"], "ingest": checkpoint["files"]}
+    except Exception as e:
+        logger.info(f"Job {job_id} failed: {e}")
+        if job:
+            job["status"] = "failed"
+            job["error"] = _error_text(e)
+            await _release_unregistered(db, job)
+    finally:
+        if job:
+            try:
+                await save_job(db, job)
+            except Exception as e:
+                logger.info(f"Exception saving job {job_id}: {e}")
+        await db.close()
+
+
+def hold_job(job_id: str) -> None:
+    """Marks a job as owned by this process until release_job, so recovery leaves it alone."""
+    _held.add(job_id)
+
+
+def release_job(job_id: str) -> None:
+    _held.discard(job_id)
+
+
+async def _enqueue(job_id: str) -> None:
+    if _queue is None:
+        raise RuntimeError("Provisioning workers are not running; they are started in the app lifespan")
+    hold_job(job_id)
+    await _queue.put(job_id)
+
+
+async def _worker() -> None:
+    while True:
+        job_id = await _queue.get()
+        try:
+            await run_job(job_id)
+        finally:
+            release_job(job_id)
+            _queue.task_done()
+
+
+async def _heartbeat(db: AsyncSession) -> None:
+    if not _held:
+        return
+    await db.execute(
+        text("""
+            UPDATE provisioning_jobs
+            SET updated_at = now()
+            WHERE id IN :ids AND status IN ('queued', 'running')
+        """).bindparams(bindparam("ids", expanding=True)),
+        {"ids": list(_held)},
+    )
+    await db.commit()
+
+
+async def recover_jobs(db: AsyncSession) -> int:
+    """
+    Claims queued or running jobs whose owner stopped refreshing them and queues them
+    again from their last checkpointed stage. The claim is a single UPDATE, so when
+    several processes recover at once each job goes to exactly one of them.
+    Returns the number of jobs re-queued.
+    """
+    cutoff = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(seconds=PROVISIONING_STALE_S)
+    job_ids = (await db.execute(
+        text("""
+            UPDATE provisioning_jobs
+            SET status = 'queued', updated_at = now()
+            WHERE status IN ('queued', 'running') AND updated_at < :cutoff
+            RETURNING id
+        """).bindparams(bindparam("cutoff", type_=DateTime(timezone=True))),
+        {"cutoff": cutoff},
+    )).scalars().all()
+    await db.commit()
+
+    for job_id in job_ids:
+        hold_job(job_id)
+        job = await _load_job(db, job_id)
+        _reset_job(job)
+        await save_job(db, job)
+        logger.info(f"Recovered provisioning job {job_id}")
+        await _enqueue(job_id)
+    return len(job_ids)
+
+
+async def _recovery_loop() -> None:
+    while True:
+        db = SessionLocal()
+        try:
+            await _heartbeat(db)
+            await recover_jobs(db)
+        except Exception as e:
+            await db.rollback()
+            logger.info(f"Exception recovering provisioning jobs: {e}")
+        finally:
+            await db.close()
+
+        await asyncio.sleep(PROVISIONING_HEARTBEAT_S)
+
+
+async def start_workers() -> None:
+    global _queue, _recovery_task
+    if _queue is None:
+        await sweep_uploads()
+        _queue = asyncio.Queue()
+        _workers.extend(asyncio.create_task(_worker()) for _ in range(PROVISIONING_WORKERS))
+        _recovery_task = asyncio.create_task(_recovery_loop())
+
+
+async def stop_workers() -> None:
+    global _queue, _recovery_task
+    tasks = [*_workers, *([_recovery_task] if _recovery_task else [])]
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    _workers.clear()
+    _held.clear()
+    _recovery_task = None
+    _queue = None
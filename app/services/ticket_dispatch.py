@@ -0,0 +1,282 @@
+import asyncio
+import datetime
+import itertools
+import logging
+import os
+import time
+from collections import deque
+from typing import Awaitable, Callable
+
+from sqlalchemy import DateTime, bindparam, text
+
+from app.database import SessionLocal
+from app.upstream import upstream_request
+
+logger = logging.getLogger(__name__)
+
+SEVERITIES = ("P1", "P2", "LOW")
+
+TICKET_WORKERS = {
+    severity: int(os.environ.get(f"TICKET_WORKERS_{severity}", default))
+    for severity, default in (("P1", "4"), ("P2", "2"), ("LOW", "1"))
+}
+
+TICKET_QUEUE_LIMITS = {
+    severity: int(os.environ.get(f"TICKET_QUEUE_LIMIT_{severity}", default))
+    for severity, default in (("P1", "1000"), ("P2", "5000"), ("LOW", "10000"))
+}
+
+TICKET_NOTIFY_URL = os.environ.get("TICKET_NOTIFY_URL")
+
+TICKET_MAX_ATTEMPTS = int(os.environ.get("TICKET_MAX_ATTEMPTS", "5"))
+# Open tickets (new, overflowed or released after a failed notification) and claims older
+# than TICKET_CLAIM_TIMEOUT_S (the claiming worker died) are queued again this often.
+TICKET_SWEEP_INTERVAL_S = float(os.environ.get("TICKET_SWEEP_INTERVAL_S", "30"))
+TICKET_CLAIM_TIMEOUT_S = float(os.environ.get("TICKET_CLAIM_TIMEOUT_S", "300"))
+# A ticket whose notification failed is not claimed again before this much time has passed.
+TICKET_RETRY_BACKOFF_S = float(os.environ.get("TICKET_RETRY_BACKOFF_S", "30"))
+
+# Claimable: open and past its retry backoff, or claimed by a worker that never finished.
+_CLAIMABLE = """(
+    (status = 'open' AND (claimed_at IS NULL OR claimed_at < :retry_after))
+    OR (status = 'dispatching' AND claimed_at < :stale)
+)"""
+
+
+_CLAIM_BINDS = (
+    bindparam("retry_after", type_=DateTime(timezone=True)),
+    bindparam("stale", type_=DateTime(timezone=True)),
+)
+
+
+def _claim_params() -> dict:
+    now = datetime.datetime.now(datetime.timezone.utc)
+    return {
+        "retry_after": now - datetime.timedelta(seconds=TICKET_RETRY_BACKOFF_S),
+        "stale": now - datetime.timedelta(seconds=TICKET_CLAIM_TIMEOUT_S),
+    }
+
+LATENCY_SAMPLES = 1000
+
+
+def _percentile(samples: list[float], pct: float) -> float | None:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+
+class TicketDispatcher:
+    """
+    Priority scheduler for tickets. Each severity has its own bounded queue, ordered by the
+    ticket timestamp, and its own worker pool, so P1 tickets never wait behind a LOW backlog.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[dict], Awaitable[None]],
+        workers: dict[str, int] = TICKET_WORKERS,
+        limits: dict[str, int] = TICKET_QUEUE_LIMITS,
+    ):
+        self.handler = handler
+        self.workers = workers
+        self.limits = limits
+        self._queues: dict[str, asyncio.PriorityQueue] = {}
+        self._tasks: list[asyncio.Task] = []
+        self._seq = itertools.count()
+        # Keys queued or being handled here, so sweeps don't queue a ticket twice.
+        self._keys: set[str] = set()
+        self._latencies = {severity: deque(maxlen=LATENCY_SAMPLES) for severity in SEVERITIES}
+        self.counters = {
+            severity: {"submitted": 0, "rejected": 0, "dispatched": 0, "failed": 0}
+            for severity in SEVERITIES
+        }
+
+    def has_capacity(self, severity: str) -> bool:
+        queue = self._queues.get(severity)
+        return queue is not None and not queue.full()
+
+    def submit(self, ticket: dict) -> bool:
+        """
+        Queues a ticket without blocking. Returns False when its severity queue is full.
+        """
+        severity = ticket["severity"]
+        if ticket["idempotency_key"] in self._keys:
+            return True
+        queue = self._queues.get(severity)
+        if queue is None or queue.full():
+            self.counters[severity]["rejected"] += 1
+            return False
+
+        # Tickets without a timestamp sort by arrival; the sequence number breaks ties.
+        order = ticket["timestamp"].timestamp() if ticket.get("timestamp") else time.time()
+        queue.put_nowait((order, next(self._seq), time.monotonic(), ticket))
+        self._keys.add(ticket["idempotency_key"])
+        self.counters[severity]["submitted"] += 1
+        return True
+
+    async def start(self) -> None:
+        if self._tasks:
+            return
+        for severity in SEVERITIES:
+            self._queues[severity] = asyncio.PriorityQueue(maxsize=self.limits[severity])
+            self._tasks.extend(
+                asyncio.create_task(self._worker(severity)) for _ in range(self.workers[severity])
+            )
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+        self._queues.clear()
+        self._keys.clear()
+
+    async def _worker(self, severity: str) -> None:
+        queue = self._queues[severity]
+        while True:
+            _, _, enqueued_at, ticket = await queue.get()
+            self._latencies[severity].append(time.monotonic() - enqueued_at)
+            try:
+                await self.handler(ticket)
+                self.counters[severity]["dispatched"] += 1
+            except Exception as e:
+                self.counters[severity]["failed"] += 1
+                logger.info(f"Exception dispatching {severity} ticket {ticket.get('idempotency_key')}: {e}")
+            finally:
+                self._keys.discard(ticket["idempotency_key"])
+                queue.task_done()
+
+    def stats(self) -> dict:
+        stats = {}
+        for severity in SEVERITIES:
+            queue = self._queues.get(severity)
+            samples = list(self._latencies[severity])
+            p50 = _percentile(samples, 50)
+            p99 = _percentile(samples, 99)
+            stats[severity] = {
+                **self.counters[severity],
+                "depth": queue.qsize() if queue else 0,
+                "timeToDispatchP50Ms": round(p50 * 1000, 2) if p50 is not None else None,
+                "timeToDispatchP99Ms": round(p99 * 1000, 2) if p99 is not None else None,
+            }
+        return stats
+
+
+async def _claim(idempotency_key: str) -> bool:
+    """
+    Takes the ticket for this worker. The conditional UPDATE lets exactly one worker (or
+    process) win; a claim whose worker died is taken over once it is TICKET_CLAIM_TIMEOUT_S old.
+    """
+    async with SessionLocal() as db:
+        claimed = (await db.execute(
+            text(f"""
+                UPDATE tickets
+                SET status = 'dispatching', claimed_at = now(), attempts = attempts + 1
+                WHERE idempotency_key = :key AND {_CLAIMABLE}
+                RETURNING id
+            """).bindparams(*_CLAIM_BINDS),
+            {"key": idempotency_key, **_claim_params()},
+        )).scalar()
+        await db.commit()
+    return claimed is not None
+
+
+async def _finish(idempotency_key: str, dispatched: bool) -> None:
+    """
+    Marks a claimed ticket dispatched, or releases it: back to open, or failed after
+    TICKET_MAX_ATTEMPTS. Released tickets keep claimed_at, which times the retry backoff.
+    """
+    if dispatched:
+        update = "status = 'dispatched', claimed_at = NULL"
+    else:
+        update = "status = CASE WHEN attempts >= :max_attempts THEN 'failed' ELSE 'open' END"
+    async with SessionLocal() as db:
+        await db.execute(
+            text(f"""
+                UPDATE tickets
+                SET {update}
+                WHERE idempotency_key = :key AND status = 'dispatching'
+            """),
+            {"key": idempotency_key, "max_attempts": TICKET_MAX_ATTEMPTS},
+        )
+        await db.commit()
+
+
+async def notify_ticket(ticket: dict) -> None:
+    """
+    Claims the ticket, sends it to TICKET_NOTIFY_URL when configured (logs it otherwise) and
+    marks it dispatched. A failed notification releases the claim, so a sweep retries it after
+    TICKET_RETRY_BACKOFF_S. Tickets another worker has claimed are skipped.
+    """
+    if not await _claim(ticket["idempotency_key"]):
+        return
+
+    try:
+        if TICKET_NOTIFY_URL:
+            payload = {**ticket, "timestamp": ticket["timestamp"].isoformat() if ticket.get("timestamp") else None}
+            resp = await upstream_request("POST", TICKET_NOTIFY_URL, json=payload, timeout=10)
+            resp.raise_for_status()
+        else:
+            logger.info(f"{ticket['severity']} ticket for assistant {ticket['assistant_id']}: {ticket['issue_summary']}")
+    except BaseException:
+        await asyncio.shield(_finish(ticket["idempotency_key"], dispatched=False))
+        raise
+
+    await _finish(ticket["idempotency_key"], dispatched=True)
+
+
+ticket_dispatcher = TicketDispatcher(notify_ticket)
+
+
+def dispatch_tickets(tickets: list[dict]) -> None:
+    """
+    Hands freshly stored tickets to the dispatcher. Tickets that don't fit stay 'open'
+    in the database and are picked up by the next sweep.
+    """
+    for ticket in tickets:
+        if not ticket_dispatcher.submit(ticket):
+            logger.warning(f"{ticket['severity']} dispatch queue is full, ticket {ticket['idempotency_key']} left open")
+
+
+async def _load_open_tickets() -> list[dict]:
+    async with SessionLocal() as db:
+        rows = (await db.execute(
+            text(f"""
+                SELECT idempotency_key, assistant_id, user_id, call_id, caller_name,
+                       unit_number, issue_summary, severity, timestamp
+                FROM tickets
+                WHERE {_CLAIMABLE} AND idempotency_key IS NOT NULL
+                ORDER BY timestamp NULLS LAST, created_at
+            """).bindparams(*_CLAIM_BINDS).columns(timestamp=DateTime(timezone=True)),
+            _claim_params(),
+        )).mappings().all()
+        return [dict(row) for row in rows]
+
+
+_sweep_task: asyncio.Task | None = None
+
+
+async def _sweep_loop() -> None:
+    while True:
+        try:
+            dispatch_tickets(await _load_open_tickets())
+        except Exception as e:
+            logger.info(f"Exception loading open tickets: {e}")
+        await asyncio.sleep(TICKET_SWEEP_INTERVAL_S)
+
+
+async def start_ticket_dispatch() -> None:
+    global _sweep_task
+    await ticket_dispatcher.start()
+    if _sweep_task is None:
+        _sweep_task = asyncio.create_task(_sweep_loop())
+
+
+async def stop_ticket_dispatch() -> None:
+    global _sweep_task
+    if _sweep_task is not None:
+        _sweep_task.cancel()
+        await asyncio.gather(_sweep_task, return_exceptions=True)
+        _sweep_task = None
+    await ticket_dispatcher.stop()
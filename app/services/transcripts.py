@@ -0,0 +1,153 @@
+import functools
+import hashlib
+import os
+
+from sqlalchemy import JSON, bindparam, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+TRANSCRIPT_ZSTD_LEVEL = int(os.environ.get("TRANSCRIPT_ZSTD_LEVEL", "9"))
+
+
+@functools.cache
+def _zstd():
+    import zstandard
+
+    return zstandard.ZstdCompressor(level=TRANSCRIPT_ZSTD_LEVEL), zstandard.ZstdDecompressor()
+
+
+def filter_messages(msgs: list[dict]) -> list[dict]:
+    if not msgs:
+        return msgs
+    
+    if msgs and (msgs[0].get("role") == "system"):
+        msgs = msgs[1:]
+    
+    blocked = {"tool_calls", "tool_call_result"}
+    msgs = [m for m in msgs if (m.get("role") not in blocked)]
+
+    return msgs
+
+
+def filter_call(data: dict) -> dict:
+    if isinstance(data.get("messages"), list):
+        data["messages"] = filter_messages(data["messages"])
+
+    if isinstance(data.get("artifact", {}).get("messages"), list):
+        data["artifact"]["messages"] = filter_messages(data["artifact"]["messages"])
+
+    return data
+
+
+def make_etag(body: bytes) -> str:
+    return f'"{hashlib.sha256(body).hexdigest()}"'
+
+
+def weak_etag(etag: str) -> str:
+    """
+    The ETag header for a stored etag. Weak, since CompressionMiddleware serves the same
+    body as zstd, gzip or identity under it; etag_matches compares weakly either way.
+    """
+    return f"W/{etag}"
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in candidates or etag in candidates
+
+
+async def get_stored_transcript(db: AsyncSession, call_id: str) -> dict | None:
+    """
+    Returns {"etag", "body"} for a stored ended call, with body as decompressed JSON bytes.
+    """
+    row = (await db.execute(
+        text("SELECT etag, body FROM call_transcripts WHERE call_id = :call_id"),
+        {"call_id": call_id},
+    )).mappings().first()
+
+    if not row:
+        return None
+
+    return {"etag": row["etag"], "body": _zstd()[1].decompress(row["body"])}
+
+
+async def get_stored_etag(db: AsyncSession, call_id: str) -> str | None:
+    return (await db.execute(
+        text("SELECT etag FROM call_transcripts WHERE call_id = :call_id"),
+        {"call_id": call_id},
+    )).scalar()
+
+
+async def store_transcript(db: AsyncSession, call_id: str, body: bytes, etag: str) -> None:
+    """
+    Stores an ended call permanently; a finished transcript never changes, so the first write wins.
+    """
+    await db.execute(
+        text("""
+            INSERT INTO call_transcripts (call_id, etag, body, raw_bytes)
+            VALUES (:call_id, :etag, :body, :raw_bytes)
+            ON CONFLICT (call_id) DO NOTHING
+        """),
+        {
+            "call_id": call_id,
+            "etag": etag,
+            "body": _zstd()[0].compress(body),
+            "raw_bytes": len(body),
+        },
+    )
+    await db.commit()
+
+
+def call_messages(data: dict) -> list[dict]:
+    if isinstance(data.get("messages"), list):
+        return data["messages"]
+    messages = (data.get("artifact") or {}).get("messages")
+    return messages if isinstance(messages, list) else []
+
+
+def without_messages(data: dict) -> dict:
+    data.pop("messages", None)
+    if isinstance(data.get("artifact"), dict):
+        data["artifact"].pop("messages", None)
+    return data
+
+
+async def store_messages(db: AsyncSession, call_id: str, messages: list[dict]) -> None:
+    if not messages:
+        return
+
+    await db.execute(
+        text("""
+            INSERT INTO call_messages (call_id, seq, message)
+            VALUES (:call_id, :seq, :message)
+            ON CONFLICT (call_id, seq) DO NOTHING
+        """).bindparams(bindparam("message", type_=JSON)),
+        [{"call_id": call_id, "seq": seq, "message": message} for seq, message in enumerate(messages)],
+    )
+    await db.commit()
+
+
+async def has_stored_messages(db: AsyncSession, call_id: str) -> bool:
+    return (await db.execute(
+        text("SELECT EXISTS (SELECT 1 FROM call_messages WHERE call_id = :call_id)"),
+        {"call_id": call_id},
+    )).scalar()
+
+
+async def page_messages(db: AsyncSession, call_id: str, after_seq: int, limit: int) -> list[dict]:
+    """
+    Returns up to `limit` stored messages with seq > after_seq as {"seq", "message"} rows.
+    """
+    rows = (await db.execute(
+        text("""
+            SELECT seq, message
+            FROM call_messages
+            WHERE call_id = :call_id AND seq > :after_seq
+            ORDER BY seq
+            LIMIT :limit
+        """).columns(message=JSON),
+        {"call_id": call_id, "after_seq": after_seq, "limit": limit},
+    )).mappings().all()
+
+    return [dict(row) for row in rows]
@@ -0,0 +1,110 @@
+import hashlib
+import logging
+import os
+import re
+import shutil
+import time
+import uuid
+from dataclasses import dataclass
+from typing import List
+
+from fastapi import HTTPException, UploadFile
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_DIR = os.environ.get("UPLOAD_DIR", "uploads")
+UPLOAD_CHUNK_BYTES = int(os.environ.get("UPLOAD_CHUNK_BYTES", str(1024 * 1024)))
+UPLOAD_MAX_FILE_BYTES = int(os.environ.get("UPLOAD_MAX_FILE_BYTES", str(25 * 1024 * 1024)))
+UPLOAD_MAX_REQUEST_BYTES = int(os.environ.get("UPLOAD_MAX_REQUEST_BYTES", str(100 * 1024 * 1024)))
+# Spooled files of failed jobs are kept for a retry, then swept.
+UPLOAD_MAX_AGE_S = float(os.environ.get("UPLOAD_MAX_AGE_S", str(24 * 3600)))
+
+os.makedirs(UPLOAD_DIR, exist_ok=True)
+
+
+@dataclass
+class UploadedDocument:
+    filename: str
+    content_type: str
+    path: str
+    size: int
+    sha256: str
+
+
+def _safe_name(filename: str) -> str:
+    return re.sub(r"[^A-Za-z0-9._-]", "_", os.path.basename(filename))[:100] or "upload"
+
+
+def _write_chunk(out, digest, chunk: bytes) -> None:
+    digest.update(chunk)
+    out.write(chunk)
+
+
+async def spool_uploads(files: List[UploadFile]) -> List[UploadedDocument]:
+    """
+    Copies uploads into their own directory under UPLOAD_DIR one chunk at a time, hashing
+    as it goes, so memory per request stays at about one chunk whatever the file sizes.
+    Raises 413 past UPLOAD_MAX_FILE_BYTES for a file or UPLOAD_MAX_REQUEST_BYTES in total.
+    """
+    batch_dir = os.path.join(UPLOAD_DIR, uuid.uuid4().hex)
+    await run_in_threadpool(os.makedirs, batch_dir)
+
+    documents = []
+    total = 0
+    try:
+        for index, upload in enumerate(files):
+            filename = upload.filename or "upload.pdf"
+            path = os.path.join(batch_dir, f"{index}-{_safe_name(filename)}")
+            digest = hashlib.sha256()
+            size = 0
+
+            with open(path, "wb") as out:
+                while chunk := await upload.read(UPLOAD_CHUNK_BYTES):
+                    size += len(chunk)
+                    total += len(chunk)
+                    if size > UPLOAD_MAX_FILE_BYTES:
+                        raise HTTPException(
+                            status_code=413,
+                            detail=f"{filename} is larger than {UPLOAD_MAX_FILE_BYTES} bytes",
+                        )
+                    if total > UPLOAD_MAX_REQUEST_BYTES:
+                        raise HTTPException(
+                            status_code=413,
+                            detail=f"Uploads are larger than {UPLOAD_MAX_REQUEST_BYTES} bytes in total",
+                        )
+                    await run_in_threadpool(_write_chunk, out, digest, chunk)
+
+            documents.append(UploadedDocument(
+                filename=filename,
+                content_type=upload.content_type or "application/pdf",
+                path=path,
+                size=size,
+                sha256=digest.hexdigest(),
+            ))
+    except BaseException:
+        await run_in_threadpool(shutil.rmtree, batch_dir, True)
+        raise
+
+    return documents
+
+
+async def discard_uploads(documents: List[UploadedDocument]) -> None:
+    for batch_dir in {os.path.dirname(doc.path) for doc in documents}:
+        await run_in_threadpool(shutil.rmtree, batch_dir, True)
+
+
+def _sweep(max_age_s: float) -> int:
+    cutoff = time.time() - max_age_s
+    removed = 0
+    for entry in os.scandir(UPLOAD_DIR):
+        if entry.is_dir() and entry.stat().st_mtime < cutoff:
+            shutil.rmtree(entry.path, ignore_errors=True)
+            removed += 1
+    return removed
+
+
+async def sweep_uploads(max_age_s: float = UPLOAD_MAX_AGE_S) -> None:
+    removed = await run_in_threadpool(_sweep, max_age_s)
+    if removed:
+        logger.info(f"Removed {removed} stale upload directories")
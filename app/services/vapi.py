@@ -0,0 +1,271 @@
+import datetime
+import logging
+import os
+from typing import List, Optional
+
+import httpx
+from dotenv import load_dotenv
+from fastapi import HTTPException
+
+from app.cache import SWRCache
+from app.http_client import timeout_for
+from app.upstream import upstream_request
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+# Both can point at a local stand-in, e.g. bench/fake_upstream.py.
+VAPI_BASE_URL = os.environ.get("VAPI_BASE_URL", "https://api.vapi.ai").rstrip("/")
+
+OCR_URL = os.environ.get("OCR_URL", "https://ocr.asprise.com/api/v1/receipt")
+
+VAPI_ASSISTANT_URL = f"{VAPI_BASE_URL}/assistant"
+
+VAPI_CALL_URL = f"{VAPI_BASE_URL}/call"
+
+VAPI_PHONE_URL = f"{VAPI_BASE_URL}/phone-number"
+
+VAPI_FILE_URL = f"{VAPI_BASE_URL}/file"
+
+VAPI_API_TOKEN = os.environ.get("VAPI_API_TOKEN")
+TOOL_ID = os.environ.get("TOOL_ID")
+
+headers = {"Authorization": f"Bearer {VAPI_API_TOKEN}"}
+
+VAPI_METADATA_CACHE_TTL_S = float(os.environ.get("VAPI_METADATA_CACHE_TTL_S", "300"))
+VAPI_METADATA_CACHE_STALE_S = float(os.environ.get("VAPI_METADATA_CACHE_STALE_S", "3600"))
+VAPI_METADATA_CACHE_MAX_ENTRIES = int(os.environ.get("VAPI_METADATA_CACHE_MAX_ENTRIES", "1000"))
+
+assistant_cache = SWRCache(
+    "vapi:assistant",
+    ttl_s=VAPI_METADATA_CACHE_TTL_S,
+    stale_s=VAPI_METADATA_CACHE_STALE_S,
+    max_entries=VAPI_METADATA_CACHE_MAX_ENTRIES,
+)
+
+phone_cache = SWRCache(
+    "vapi:phone-number",
+    ttl_s=VAPI_METADATA_CACHE_TTL_S,
+    stale_s=VAPI_METADATA_CACHE_STALE_S,
+    max_entries=VAPI_METADATA_CACHE_MAX_ENTRIES,
+)
+
+async def create_vapi_query_tool(
+    tool_description: str,
+    kb_name: str,
+    kb_description: str,
+    file_ids: List[str],
+    provider: str = "google",
+    model: str = "gemini-2.0-flash",
+    blocking: bool = False,
+    timeout_s: float | None = None,
+) -> str:
+    """
+    Creates a Vapi Query Tool using one Knowledge Base with multiple fileIds.
+    Returns: tool_id
+    """
+
+    if not file_ids:
+        raise HTTPException(status_code=400, detail="file_ids must not be empty")
+    
+    logger.info("Creating query tool...")
+
+    payload = {
+        "type": "query",
+        "function": {
+            "name": "query_tool",
+            "description": tool_description,
+            "parameters": {
+                "type": "object",
+                "properties": {},
+                "required": []
+            }
+        },
+        "server": {
+            "url": None,
+            "credentialId": None,
+            "timeoutSeconds": 20
+        },
+        "messages": [
+            {
+                "type": "request-start",
+                "blocking": False
+            }
+        ],
+        "knowledgeBases": [
+            {
+                "name": kb_name,
+                "description": kb_description,
+                "provider": provider,
+                "model": model,
+                "fileIds": file_ids
+            }
+        ]
+    }
+
+    headers = {
+        "Authorization": f"Bearer {VAPI_API_TOKEN}"
+    }
+
+    url = f"{VAPI_BASE_URL}/tool"
+
+    try:
+        resp = await upstream_request(
+            "POST",
+            url,
+            headers=headers,
+            json=payload,
+            timeout=timeout_s if timeout_s is not None else timeout_for("tool")
+        )
+        logger.info("Tool created...")
+        resp.raise_for_status()
+        data = resp.json()
+    except httpx.HTTPStatusError as e:
+        detail: Optional[str]
+        try:
+            detail = resp.text
+        except Exception:
+            detail = str(e)
+        raise HTTPException(
+            status_code=resp.status_code,
+            detail=f"Vapi error creating tool: {detail}"
+        )
+    except httpx.RequestError as e:
+        raise HTTPException(
+            status_code=502,
+            detail=f"Network error calling Vapi: {str(e)}"
+        )
+    except ValueError:
+        raise HTTPException(
+            status_code=502,
+            detail="Vapi response was not valid JSON"
+        )
+
+    return data.get("id")
+
+def extract_text_from_asprise(ocr_json: dict) -> str:
+    if not isinstance(ocr_json, dict):
+        return ""
+
+    if ocr_json.get("success") is not True:
+        return ""
+
+    receipts = ocr_json.get("receipts")
+    if not isinstance(receipts, list) or not receipts:
+        return ""
+
+    pages_text: list[str] = []
+
+    for receipt in receipts:
+        if not isinstance(receipt, dict):
+            continue
+
+        for key in ("ocr_text", "text", "raw_text"):
+            val = receipt.get(key)
+            if isinstance(val, str) and val.strip():
+                pages_text.append(val.strip())
+                break
+
+    return "\n\n".join(pages_text)
+
+
+async def run_ocr(path: str, filename: str, content_type: str) -> str:
+    """
+    OCRs a file on disk. httpx streams the open file into the multipart body in small
+    chunks, so it is never read into memory whole.
+    """
+    try:
+        with open(path, "rb") as file:
+            ocr_resp = await upstream_request(
+                "POST",
+                OCR_URL,
+                data={
+                    "api_key": "TEST",
+                    "recognizer": "auto",
+                    "ref_no": f"ocr_{filename}_{int(datetime.datetime.utcnow().timestamp())}"
+                },
+                files={
+                    "file": (filename, file, content_type or "application/octet-stream")
+                },
+                timeout=timeout_for("ocr")
+            )
+        ocr_resp.raise_for_status()
+        ocr_json = ocr_resp.json()
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=502, detail=f"OCR request failed: {str(e)}")
+    except ValueError:
+        raise HTTPException(status_code=502, detail="OCR response was not valid JSON")
+
+    text = extract_text_from_asprise(ocr_json)
+    if not text.strip():
+        raise HTTPException(
+            status_code=422,
+            detail="OCR returned empty text (file may be unreadable or unsupported)."
+        )
+    return text
+
+
+async def upload_text_to_vapi(text: str, base_filename: str, headers: dict) -> str:
+    txt_name = f"{base_filename.rsplit('.', 1)[0]}.txt" if base_filename else "kb.txt"
+    files = {
+        "file": (txt_name, text.encode("utf-8"), "text/plain; charset=utf-8")
+    }
+    try:
+        up = await upstream_request("POST", VAPI_FILE_URL, headers=headers, files=files, timeout=timeout_for("file"))
+        up.raise_for_status()
+        return up.json()["id"]
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=502, detail=f"Vapi file upload failed: {str(e)}")
+    except KeyError:
+        raise HTTPException(status_code=502, detail="Vapi file upload response missing 'id'")
+
+
+async def create_vapi_assistant(payload: dict) -> dict:
+    try:
+        resp = await upstream_request(
+            "POST",
+            VAPI_ASSISTANT_URL,
+            headers=headers,
+            json=payload,
+            timeout=timeout_for("assistant_create")
+        )
+        resp.raise_for_status()
+        return resp.json()
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(
+            status_code=e.response.status_code,
+            detail=f"Vapi error creating assistant: {e.response.text}"
+        )
+    except httpx.RequestError as e:
+        raise HTTPException(status_code=502, detail=f"Network error calling Vapi: {str(e)}")
+    except ValueError:
+        raise HTTPException(status_code=502, detail="Vapi response was not valid JSON")
+
+
+async def delete_vapi_assistant(assistant_id: str) -> None:
+    try:
+        resp = await upstream_request("DELETE", f"{VAPI_ASSISTANT_URL}/{assistant_id}", headers=headers, timeout=timeout_for("assistant"))
+        if resp.status_code != 404:
+            resp.raise_for_status()
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(
+            status_code=e.response.status_code,
+            detail=f"Vapi error deleting assistant: {e.response.text}"
+        )
+    except httpx.RequestError as e:
+        raise HTTPException(status_code=502, detail=f"Network error calling Vapi: {str(e)}")
+
+
+async def delete_vapi_tool(tool_id: str) -> None:
+    try:
+        resp = await upstream_request("DELETE", f"{VAPI_BASE_URL}/tool/{tool_id}", headers=headers, timeout=timeout_for("tool"))
+        if resp.status_code != 404:
+            resp.raise_for_status()
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(
+            status_code=e.response.status_code,
+            detail=f"Vapi error deleting tool: {e.response.text}"
+        )
+    except httpx.RequestError as e:
+        raise HTTPException(status_code=502, detail=f"Network error calling Vapi: {str(e)}")
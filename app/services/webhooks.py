@@ -0,0 +1,193 @@
+import datetime
+import json
+import os
+from collections import OrderedDict
+
+from fastapi import HTTPException
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.database import SessionLocal
+from app.models import Ticket, WebhookEvent
+from app.schemas.ticket_request import TicketPayload
+from app.services.call_store import upsert_calls
+from app.services.ticket_dispatch import dispatch_tickets
+from app.write_buffer import WriteBuffer
+
+WEBHOOK_BATCH_SIZE = int(os.environ.get("WEBHOOK_BATCH_SIZE", "500"))
+WEBHOOK_FLUSH_INTERVAL_S = float(os.environ.get("WEBHOOK_FLUSH_INTERVAL_S", "0.05"))
+WEBHOOK_MAX_PENDING = int(os.environ.get("WEBHOOK_MAX_PENDING", "20000"))
+WEBHOOK_RECENT_KEYS = int(os.environ.get("WEBHOOK_RECENT_KEYS", "50000"))
+
+TICKET_TOOL_NAME = os.environ.get("TICKET_TOOL_NAME", "create_ticket")
+
+# End-of-call report fields that complete the call snapshot Vapi attaches to the report.
+END_OF_CALL_FIELDS = (
+    "startedAt", "endedAt", "endedReason", "cost", "costBreakdown", "analysis",
+    "artifact", "transcript", "summary", "recordingUrl",
+)
+
+CALL_TIMESTAMP_FIELDS = ("createdAt", "startedAt", "endedAt", "updatedAt")
+
+# Keys this process has written recently; the webhook_events primary key is the durable guard.
+# Keys are only added once their batch is committed, so a redelivery of an event that was
+# still buffered, or whose batch was dropped, is accepted again.
+_recent_keys: OrderedDict[str, None] = OrderedDict()
+
+
+def _seen(key: str) -> bool:
+    if key in _recent_keys:
+        _recent_keys.move_to_end(key)
+        return True
+    return False
+
+
+def _remember(key: str) -> None:
+    _recent_keys[key] = None
+    while len(_recent_keys) > WEBHOOK_RECENT_KEYS:
+        _recent_keys.popitem(last=False)
+
+
+def _parse_ts(value: str | None) -> datetime.datetime | None:
+    try:
+        return datetime.datetime.fromisoformat(value) if value else None
+    except ValueError:
+        return None
+
+
+def ended_call(message: dict) -> dict | None:
+    call = dict(message.get("call") or {})
+    if not call.get("id"):
+        return None
+
+    for key in END_OF_CALL_FIELDS:
+        if message.get(key) is not None:
+            call[key] = message[key]
+
+    for key in CALL_TIMESTAMP_FIELDS:
+        value = call.get(key)
+        if value and (not isinstance(value, str) or _parse_ts(value) is None):
+            raise ValueError(f"'{key}' must be an ISO 8601 timestamp")
+
+    call["status"] = "ended"
+    call["updatedAt"] = max(filter(None, (call.get("updatedAt"), call.get("endedAt"), call.get("createdAt"))), default=None)
+    return call
+
+
+def end_of_call_event(message: dict, idempotency_key: str | None) -> dict | None:
+    """
+    Builds an end-of-call event, or None without a call id or createdAt. Raises ValueError on
+    timestamps that don't parse, so a bad report is refused here rather than failing its batch.
+    """
+    call = ended_call(message)
+    if call is None or not isinstance(call["id"], str) or not call.get("createdAt"):
+        return None
+
+    return {
+        "idempotency_key": idempotency_key or f"end-of-call-report:{call['id']}",
+        "type": "end-of-call-report",
+        "call_id": call["id"],
+        "payload": message,
+        "call": call,
+        "ticket": None,
+    }
+
+
+def ticket_event(message: dict, tool_call: dict) -> dict:
+    """
+    Builds a ticket event from a ticket tool call. Raises ValueError (pydantic.ValidationError
+    included) on bad arguments.
+    """
+    if not tool_call.get("id"):
+        raise ValueError("Tool call without id")
+
+    arguments = (tool_call.get("function") or {}).get("arguments") or {}
+    if isinstance(arguments, str):
+        arguments = json.loads(arguments or "{}")
+    if not isinstance(arguments, dict):
+        raise ValueError("Tool call arguments must be a JSON object")
+
+    call = message.get("call") or {}
+    assistant_id = call.get("assistantId") or (message.get("assistant") or {}).get("id")
+    ticket = TicketPayload(**{"assistant_id": assistant_id, **arguments})
+
+    key = f"ticket:{tool_call['id']}"
+    return {
+        "idempotency_key": key,
+        "type": "ticket",
+        "call_id": call.get("id"),
+        "payload": tool_call,
+        "call": None,
+        "ticket": {
+            "idempotency_key": key,
+            "assistant_id": ticket.assistant_id,
+            "user_id": ticket.user_id,
+            "call_id": call.get("id"),
+            "caller_name": ticket.caller_name,
+            "unit_number": ticket.unit_number,
+            "issue_summary": ticket.issue_summary,
+            "severity": ticket.severity,
+            "timestamp": _parse_ts(ticket.timestamp),
+        },
+    }
+
+
+async def flush_events(events: list[dict]) -> list[dict]:
+    """
+    Writes one batch in a single transaction: a multi-row insert into webhook_events that skips
+    already-seen keys, then tickets and call upserts for the events that were actually new.
+    Returns the tickets that were stored, for dispatch.
+    """
+    # Redeliveries can land in the same batch; one call twice in an upsert would fail it.
+    unique: dict[str, dict] = {}
+    for event in events:
+        unique.setdefault(event["idempotency_key"], event)
+    events = list(unique.values())
+
+    async with SessionLocal() as db:
+        inserted = set((await db.execute(
+            pg_insert(WebhookEvent.__table__)
+            .values([{key: event[key] for key in ("idempotency_key", "type", "call_id", "payload")} for event in events])
+            .on_conflict_do_nothing(index_elements=["idempotency_key"])
+            .returning(WebhookEvent.__table__.c.idempotency_key)
+        )).scalars())
+
+        fresh = [event for event in events if event["idempotency_key"] in inserted]
+
+        tickets = [event["ticket"] for event in fresh if event["ticket"]]
+        if tickets:
+            await db.execute(
+                pg_insert(Ticket.__table__)
+                .values(tickets)
+                .on_conflict_do_nothing(index_elements=["idempotency_key"])
+            )
+
+        await upsert_calls(db, [event["call"] for event in fresh if event["call"]])
+
+        await db.commit()
+
+    for event in events:
+        _remember(event["idempotency_key"])
+    return tickets
+
+
+event_buffer = WriteBuffer(
+    "webhook_events",
+    flush_events,
+    max_batch=WEBHOOK_BATCH_SIZE,
+    max_delay_s=WEBHOOK_FLUSH_INTERVAL_S,
+    max_pending=WEBHOOK_MAX_PENDING,
+    on_flushed=dispatch_tickets,
+)
+
+
+def enqueue_event(event: dict) -> bool:
+    """
+    Buffers an event unless its idempotency key was written recently.
+    Returns False for duplicates; raises 503 when the buffer is full so Vapi retries later.
+    """
+    if _seen(event["idempotency_key"]):
+        return False
+
+    if not event_buffer.add(event):
+        raise HTTPException(status_code=503, detail="Webhook buffer is full, retry later")
+    return True
@@ -0,0 +1,198 @@
+import asyncio
+import contextvars
+import logging
+import os
+import time
+
+import httpx
+from tenacity import (
+    AsyncRetrying,
+    retry_if_exception_type,
+    retry_if_result,
+    stop_after_attempt,
+    wait_random_exponential,
+)
+
+from app.concurrency import RateLimiter
+from app.http_client import get_http_client
+
+logger = logging.getLogger(__name__)
+
+# GETs are retried on network errors and these statuses; other methods are never retried.
+UPSTREAM_RETRY_ATTEMPTS = int(os.getenv("UPSTREAM_RETRY_ATTEMPTS", "3"))
+UPSTREAM_RETRY_BASE_S = float(os.getenv("UPSTREAM_RETRY_BASE_S", "0.2"))
+UPSTREAM_RETRY_MAX_S = float(os.getenv("UPSTREAM_RETRY_MAX_S", "2"))
+RETRY_STATUSES = {429, 502, 503, 504}
+
+# Consecutive failures (network errors or 5xx) before a host's circuit opens.
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RESET_S = float(os.getenv("CIRCUIT_RESET_S", "30"))
+
+# host[:port] -> limiter, for callers that must stay under an upstream's request rate
+# (bulk provisioning). Set it in a context and every request made there, retries
+# included, waits for a token first.
+upstream_rate_limits: contextvars.ContextVar[dict[str, RateLimiter] | None] = contextvars.ContextVar(
+    "upstream_rate_limits", default=None
+)
+
+
+class CircuitOpenError(httpx.RequestError):
+    """Raised without touching the network while a host's circuit is open."""
+
+    def __init__(self, host: str, retry_after_s: float, request: httpx.Request):
+        super().__init__(f"Circuit open for {host}", request=request)
+        self.host = host
+        self.retry_after_s = retry_after_s
+
+
+class CircuitBreaker:
+    """
+    Closed until `threshold` consecutive failures, then open for `reset_s`. After that a
+    single probe request is let through (half-open): success closes the circuit, failure
+    opens it again.
+    """
+
+    def __init__(self, host: str, threshold: int = CIRCUIT_FAILURE_THRESHOLD, reset_s: float = CIRCUIT_RESET_S):
+        self.host = host
+        self.threshold = threshold
+        self.reset_s = reset_s
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.rejected = 0
+        self.opened = 0
+
+    def before_request(self, request: httpx.Request) -> None:
+        if self.state == "closed":
+            return
+        remaining = self.opened_at + self.reset_s - time.monotonic()
+        if remaining <= 0:
+            # Also re-probes if an earlier probe never reported back (e.g. it was cancelled).
+            self.state = "half_open"
+            self.opened_at = time.monotonic()
+            return
+        self.rejected += 1
+        raise CircuitOpenError(self.host, max(remaining, 1.0), request)
+
+    def record_success(self) -> None:
+        if self.state != "closed":
+            logger.info(f"Circuit for {self.host} closed")
+        self.state = "closed"
+        self.failures = 0
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.threshold:
+            if self.state != "open":
+                self.opened += 1
+                logger.warning(f"Circuit for {self.host} opened after {self.failures} failures")
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "opened": self.opened,
+            "rejected": self.rejected,
+        }
+
+
+_breakers: dict[str, CircuitBreaker] = {}
+_in_flight: dict[tuple, asyncio.Task] = {}
+_counters = {"retries": 0, "coalesced": 0}
+
+
+def breaker_for(host: str) -> CircuitBreaker:
+    breaker = _breakers.get(host)
+    if breaker is None:
+        breaker = _breakers[host] = CircuitBreaker(host)
+    return breaker
+
+
+async def _send(method: str, url: str, **kwargs) -> httpx.Response:
+    client = get_http_client()
+    request = client.build_request(method, url, **kwargs)
+
+    limits = upstream_rate_limits.get()
+    limiter = limits.get(request.url.netloc.decode()) if limits else None
+    if limiter is not None:
+        await limiter.acquire()
+
+    breaker = breaker_for(request.url.host)
+    breaker.before_request(request)
+    try:
+        response = await client.send(request)
+    except httpx.TransportError:
+        breaker.record_failure()
+        raise
+    if response.status_code >= 500:
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+    return response
+
+
+def _before_retry(retry_state) -> None:
+    _counters["retries"] += 1
+
+
+async def _get_with_retries(url: str, **kwargs) -> httpx.Response:
+    retrying = AsyncRetrying(
+        stop=stop_after_attempt(UPSTREAM_RETRY_ATTEMPTS),
+        wait=wait_random_exponential(multiplier=UPSTREAM_RETRY_BASE_S, max=UPSTREAM_RETRY_MAX_S),
+        retry=(
+            retry_if_exception_type(httpx.TransportError)
+            | retry_if_result(lambda response: response.status_code in RETRY_STATUSES)
+        ),
+        before_sleep=_before_retry,
+        # Out of attempts: hand back the last response (or raise the last error) as-is.
+        retry_error_callback=lambda retry_state: retry_state.outcome.result(),
+    )
+    return await retrying(_send, "GET", url, **kwargs)
+
+
+def _forget(key: tuple, task: asyncio.Task) -> None:
+    _in_flight.pop(key, None)
+    # Marks the error as retrieved in case every waiter was cancelled.
+    if not task.cancelled():
+        task.exception()
+
+
+def _coalesce_key(url: str, kwargs: dict) -> tuple:
+    params = kwargs.get("params") or {}
+    headers = kwargs.get("headers") or {}
+    return (
+        url,
+        tuple(sorted((str(k), str(v)) for k, v in params.items())),
+        tuple(sorted((str(k).lower(), str(v)) for k, v in headers.items())),
+    )
+
+
+async def upstream_request(method: str, url: str, **kwargs) -> httpx.Response:
+    """
+    Sends a request through the per-host circuit breaker. GETs are also retried with
+    jittered backoff, and identical GETs already in flight share one upstream call.
+    Returns the response whatever its status, like httpx does.
+    """
+    if method.upper() != "GET":
+        return await _send(method, url, **kwargs)
+
+    key = _coalesce_key(url, kwargs)
+    task = _in_flight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(_get_with_retries(url, **kwargs))
+        _in_flight[key] = task
+        task.add_done_callback(lambda done: _forget(key, done))
+    else:
+        _counters["coalesced"] += 1
+    # shield: one caller going away must not cancel the fetch the others are waiting on.
+    return await asyncio.shield(task)
+
+
+def upstream_stats() -> dict:
+    return {
+        **_counters,
+        "inFlight": len(_in_flight),
+        "circuits": {host: breaker.stats() for host, breaker in _breakers.items()},
+    }
@@ -0,0 +1,112 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBuffer:
+    """
+    Collects items in memory and hands them to `flush` in batches, as soon as max_batch
+    items are waiting or max_delay_s after the first one arrived, whichever comes first.
+    `flush` is a coroutine function doing one multi-row write; `on_flushed`, if given,
+    receives its return value.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        flush: Callable[[list[Any]], Awaitable[Any]],
+        max_batch: int = 500,
+        max_delay_s: float = 0.05,
+        max_pending: int = 10000,
+        flush_attempts: int = 3,
+        on_flushed: Callable[[Any], None] | None = None,
+    ):
+        self.name = name
+        self.flush = flush
+        self.max_batch = max_batch
+        self.max_delay_s = max_delay_s
+        self.max_pending = max_pending
+        self.flush_attempts = flush_attempts
+        self.on_flushed = on_flushed
+        self._pending: list[Any] = []
+        self._wakeup = asyncio.Event()
+        self._full = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._stopping = False
+        self.counters = {"accepted": 0, "rejected": 0, "flushed": 0, "batches": 0, "flush_errors": 0, "dropped": 0}
+
+    def add(self, item: Any) -> bool:
+        """
+        Queues an item without blocking. Returns False when max_pending items are already waiting.
+        """
+        if len(self._pending) >= self.max_pending:
+            self.counters["rejected"] += 1
+            return False
+
+        self._pending.append(item)
+        self.counters["accepted"] += 1
+        self._wakeup.set()
+        if len(self._pending) >= self.max_batch:
+            self._full.set()
+        return True
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """
+        Lets the flush in progress finish instead of cancelling it, then writes whatever is
+        still pending, items added while stopping included.
+        """
+        if self._task is not None:
+            self._stopping = True
+            self._wakeup.set()
+            self._full.set()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self._drain()
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+
+            if len(self._pending) < self.max_batch:
+                try:
+                    await asyncio.wait_for(self._full.wait(), self.max_delay_s)
+                except asyncio.TimeoutError:
+                    pass
+            self._full.clear()
+
+            await self._drain()
+
+    async def _drain(self) -> None:
+        while self._pending:
+            batch = self._pending[:self.max_batch]
+            del self._pending[:self.max_batch]
+            await self._flush_batch(batch)
+
+    async def _flush_batch(self, batch: list[Any]) -> None:
+        for attempt in range(1, self.flush_attempts + 1):
+            try:
+                result = await self.flush(batch)
+                self.counters["flushed"] += len(batch)
+                self.counters["batches"] += 1
+                if self.on_flushed is not None:
+                    self.on_flushed(result)
+                return
+            except Exception as e:
+                self.counters["flush_errors"] += 1
+                logger.info(f"Exception flushing {self.name} batch of {len(batch)} (attempt {attempt}): {e}")
+                if attempt < self.flush_attempts:
+                    await asyncio.sleep(0.1 * 2 ** attempt)
+
+        self.counters["dropped"] += len(batch)
+        logger.error(f"Dropped {self.name} batch of {len(batch)} after {self.flush_attempts} attempts")
+
+    def stats(self) -> dict:
+        return {**self.counters, "pending": len(self._pending)}
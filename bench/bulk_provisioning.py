@@ -0,0 +1,117 @@
+"""
+Onboards the same portfolio twice, once through sequential /api/create-agent posts and
+once through /api/create-agents, against the app wired to bench/fake_upstream.py:
+
+    python -m bench.bulk_provisioning --email bench@example.com --password secret \\
+        [--agents 50] [--shared-documents 3] [--own-documents 1] [--fake-url http://127.0.0.1:9001]
+
+Reports wall time for each path and the Vapi/OCR requests each one made (from the
+fake's /_fake/stats). Document contents are random per run, so the OCR cache starts cold
+for both paths.
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+import httpx
+
+from bench.load import authenticate
+
+
+def portfolio(agents: int, shared: int, own: int) -> tuple[list[dict], dict[str, bytes]]:
+    shared_names = [f"shared-{i}.txt" for i in range(shared)]
+    files = {name: os.urandom(2048) for name in shared_names}
+    manifest = []
+    for i in range(agents):
+        names = [f"community-{i}-{j}.txt" for j in range(own)]
+        files.update({name: os.urandom(2048) for name in names})
+        manifest.append({
+            "name": f"Community {i}",
+            "first_message": f"Hi, this is Community {i}. How can I help?",
+            "use_case": "property_manager",
+            "documents": shared_names + names,
+        })
+    return manifest, files
+
+
+async def fake_stats(fake: httpx.AsyncClient) -> dict[str, int]:
+    return (await fake.get("/_fake/stats")).raise_for_status().json()
+
+
+def stats_delta(before: dict[str, int], after: dict[str, int]) -> dict[str, int]:
+    return {key: after[key] - before.get(key, 0) for key in sorted(after) if after[key] != before.get(key, 0)}
+
+
+async def wait_for_job(client: httpx.AsyncClient, job_id: str) -> dict:
+    while True:
+        job = (await client.get(f"/api/jobs/{job_id}")).raise_for_status().json()
+        if job["status"] in ("succeeded", "failed"):
+            return job
+        await asyncio.sleep(0.2)
+
+
+async def sequential(client: httpx.AsyncClient, manifest: list[dict], files: dict[str, bytes]) -> int:
+    succeeded = 0
+    for agent in manifest:
+        resp = await client.post(
+            "/api/create-agent",
+            data={
+                "agent_name": agent["name"],
+                "first_message": agent["first_message"],
+                "system_prompt": (await client.get(
+                    "/api/system_prompt", params={"use_case": agent["use_case"], "agent_name": agent["name"]}
+                )).json(),
+            },
+            files=[("files", (name, files[name], "text/plain")) for name in agent["documents"]],
+        )
+        resp.raise_for_status()
+        succeeded += (await wait_for_job(client, resp.json()["id"]))["status"] == "succeeded"
+    return succeeded
+
+
+async def bulk(client: httpx.AsyncClient, manifest: list[dict], files: dict[str, bytes]) -> int:
+    succeeded = 0
+    async with client.stream(
+        "POST",
+        "/api/create-agents",
+        data={"manifest": json.dumps({"agents": manifest})},
+        files=[("files", (name, data, "text/plain")) for name, data in files.items()],
+    ) as resp:
+        resp.raise_for_status()
+        async for line in resp.aiter_lines():
+            result = json.loads(line)
+            if result["type"] == "agent":
+                succeeded += result["status"] == "succeeded"
+    return succeeded
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--fake-url", default="http://127.0.0.1:9001")
+    parser.add_argument("--email", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--agents", type=int, default=50)
+    parser.add_argument("--shared-documents", type=int, default=3)
+    parser.add_argument("--own-documents", type=int, default=1)
+    args = parser.parse_args()
+
+    async with httpx.AsyncClient(base_url=args.url, timeout=600) as client, \
+            httpx.AsyncClient(base_url=args.fake_url) as fake:
+        client.headers["Authorization"] = f"Bearer {await authenticate(client, args.email, args.password)}"
+
+        for name, run in (("sequential", sequential), ("bulk", bulk)):
+            manifest, files = portfolio(args.agents, args.shared_documents, args.own_documents)
+            before = await fake_stats(fake)
+            started = time.perf_counter()
+            succeeded = await run(client, manifest, files)
+            elapsed = time.perf_counter() - started
+            print(f"{name:<11} agents={args.agents} succeeded={succeeded} elapsed={elapsed:.1f}s "
+                  f"per_agent={elapsed / args.agents * 1000:.0f}ms")
+            print(f"{'':<11} upstream requests {stats_delta(before, await fake_stats(fake))}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,251 @@
+"""
+Local stand-in for the Vapi and Asprise endpoints the app calls, with injectable latency
+and errors, so benchmarks don't depend on (or bill) the real services.
+
+    python -m bench.fake_upstream [--port 9001] [--ocr-port 9002] [--latency-ms 50] \\
+        [--jitter-ms 20] [--error-rate 0.0] [--error-status 503] \\
+        [--route-latency-ms ocr=800 --route-latency-ms tool=300] [--calls 2000]
+
+Point the app at it with
+
+    VAPI_BASE_URL=http://127.0.0.1:9001 OCR_URL=http://127.0.0.1:9002/api/v1/receipt TEL_TEST_ID=phone-0
+
+Assistants created through POST /assistant get ids asst-0, asst-1, ... and the generated
+calls belong to the first --assistants of them and to phone-0, so a fresh user who
+provisions one agent owns calls to read. GET /_fake/stats counts requests per route.
+Latency and errors can be changed while running:
+
+    curl -X POST localhost:9001/_fake/config -H 'content-type: application/json' \\
+        -d '{"error_rate": 0.5}'
+"""
+import argparse
+import asyncio
+import datetime
+import itertools
+import random
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, HTTPException, Request
+
+ROUTES = ("assistant", "call", "phone-number", "file", "tool", "ocr")
+
+config = {
+    "latency_ms": 50.0,
+    "jitter_ms": 20.0,
+    "error_rate": 0.0,
+    "error_status": 503,
+    "route_latency_ms": {},
+}
+
+_assistant_ids = itertools.count()
+assistants: dict[str, dict] = {}
+calls: list[dict] = []
+calls_by_id: dict[str, dict] = {}
+# Requests served per route, e.g. to count the Vapi objects a benchmark created.
+request_counts: dict[str, int] = {}
+
+
+def _iso(ts: datetime.datetime) -> str:
+    return ts.isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+
+def generate_calls(count: int, assistant_count: int, message_count: int, seed: int) -> None:
+    rng = random.Random(seed)
+    now = datetime.datetime.now(datetime.timezone.utc)
+    for i in range(count):
+        started = now - datetime.timedelta(minutes=count - i, seconds=rng.randint(0, 59))
+        ended = started + datetime.timedelta(seconds=rng.randint(20, 600))
+        messages = [{"role": "system", "message": "You are a property management assistant."}]
+        for turn in range(message_count):
+            role = "bot" if turn % 2 == 0 else "user"
+            messages.append({
+                "role": role,
+                "message": f"{role} turn {turn} " + "lorem ipsum " * rng.randint(3, 30),
+                "secondsFromStart": turn * 4.5,
+            })
+            if turn % 10 == 9:
+                messages.append({"role": "tool_calls", "toolCalls": [{"id": f"tc-{i}-{turn}"}]})
+        call = {
+            "id": f"call-{i}",
+            "assistantId": f"asst-{i % assistant_count}",
+            "phoneNumberId": "phone-0",
+            "type": "inboundPhoneCall",
+            "status": "ended",
+            "endedReason": rng.choice(["customer-ended-call", "assistant-ended-call", "silence-timed-out"]),
+            "createdAt": _iso(started),
+            "updatedAt": _iso(ended),
+            "startedAt": _iso(started),
+            "endedAt": _iso(ended),
+            "cost": round(rng.uniform(0.02, 1.5), 4),
+            "customer": {"number": f"+1555{rng.randint(1000000, 9999999)}"},
+            "messages": messages,
+        }
+        calls.append(call)
+        calls_by_id[call["id"]] = call
+    calls.sort(key=lambda call: call["createdAt"], reverse=True)
+
+
+async def inject(route: str, method: str = "GET") -> None:
+    request_counts[f"{method} {route}"] = request_counts.get(f"{method} {route}", 0) + 1
+    latency = config["route_latency_ms"].get(route, config["latency_ms"])
+    delay = max(0.0, latency + random.uniform(-config["jitter_ms"], config["jitter_ms"]))
+    await asyncio.sleep(delay / 1000)
+    if random.random() < config["error_rate"]:
+        raise HTTPException(status_code=config["error_status"], detail="injected error")
+
+
+vapi = FastAPI()
+ocr = FastAPI()
+
+
+@vapi.post("/_fake/config")
+async def update_config(request: Request):
+    config.update(await request.json())
+    return config
+
+
+@vapi.get("/_fake/stats")
+async def stats():
+    return request_counts
+
+
+@vapi.get("/assistant/{assistant_id}")
+async def get_assistant(assistant_id: str):
+    await inject("assistant")
+    return assistants.get(assistant_id) or {"id": assistant_id, "name": f"Assistant {assistant_id}"}
+
+
+@vapi.post("/assistant")
+async def create_assistant(request: Request):
+    await inject("assistant", "POST")
+    assistant = {**await request.json(), "id": f"asst-{next(_assistant_ids)}"}
+    assistants[assistant["id"]] = assistant
+    return assistant
+
+
+@vapi.delete("/assistant/{assistant_id}")
+async def delete_assistant(assistant_id: str):
+    await inject("assistant", "DELETE")
+    return assistants.pop(assistant_id, None) or {"id": assistant_id}
+
+
+@vapi.get("/phone-number/{phone_id}")
+async def get_phone_number(phone_id: str):
+    await inject("phone-number")
+    return {"id": phone_id, "number": "+15550000000", "provider": "vapi"}
+
+
+@vapi.get("/call")
+async def list_calls(
+    limit: int = 100,
+    updatedAtGt: str | None = None,
+    createdAtLt: str | None = None,
+    createdAtLe: str | None = None,
+):
+    await inject("call")
+    # ISO timestamps in one format compare correctly as strings.
+    updated_gt = _iso(datetime.datetime.fromisoformat(updatedAtGt)) if updatedAtGt else None
+    page = []
+    for call in calls:
+        if createdAtLt and call["createdAt"] >= createdAtLt:
+            continue
+        if createdAtLe and call["createdAt"] > createdAtLe:
+            continue
+        if updated_gt and call["updatedAt"] <= updated_gt:
+            continue
+        page.append(call)
+        if len(page) >= limit:
+            break
+    return page
+
+
+@vapi.get("/call/{call_id}")
+async def get_call(call_id: str):
+    await inject("call")
+    call = calls_by_id.get(call_id)
+    if call is None:
+        raise HTTPException(status_code=404, detail="call not found")
+    return call
+
+
+@vapi.post("/call")
+async def create_call(request: Request):
+    await inject("call", "POST")
+    body = await request.json()
+    return {"id": str(uuid.uuid4()), "status": "queued", **body}
+
+
+@vapi.post("/file")
+async def upload_file(request: Request):
+    await inject("file", "POST")
+    await request.body()
+    return {"id": f"file-{uuid.uuid4().hex[:12]}", "status": "done"}
+
+
+@vapi.post("/tool")
+async def create_tool(request: Request):
+    await inject("tool", "POST")
+    return {**await request.json(), "id": f"tool-{uuid.uuid4().hex[:12]}"}
+
+
+@vapi.delete("/tool/{tool_id}")
+async def delete_tool(tool_id: str):
+    await inject("tool", "DELETE")
+    return {"id": tool_id}
+
+
+@ocr.post("/api/v1/receipt")
+async def receipt(request: Request):
+    await inject("ocr", "POST")
+    body = await request.body()
+    text = f"Building rules and FAQ. Uploaded document of {len(body)} bytes."
+    return {"success": True, "receipts": [{"ocr_text": text}]}
+
+
+def parse_route_latency(values: list[str]) -> dict[str, float]:
+    latencies = {}
+    for value in values:
+        route, _, ms = value.partition("=")
+        if route not in ROUTES:
+            raise SystemExit(f"unknown route {route!r}, expected one of {', '.join(ROUTES)}")
+        latencies[route] = float(ms)
+    return latencies
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9001)
+    parser.add_argument("--ocr-port", type=int, default=9002)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--jitter-ms", type=float, default=20)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--route-latency-ms", action="append", default=[], metavar="ROUTE=MS")
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--assistants", type=int, default=1)
+    parser.add_argument("--messages", type=int, default=40)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    config.update(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        route_latency_ms=parse_route_latency(args.route_latency_ms),
+    )
+    random.seed(args.seed)
+    generate_calls(args.calls, max(1, args.assistants), args.messages, args.seed)
+
+    servers = [
+        uvicorn.Server(uvicorn.Config(vapi, host=args.host, port=args.port, log_level="warning")),
+        uvicorn.Server(uvicorn.Config(ocr, host=args.host, port=args.ocr_port, log_level="warning")),
+    ]
+    print(f"fake vapi on http://{args.host}:{args.port}, ocr on http://{args.host}:{args.ocr_port}/api/v1/receipt")
+    await asyncio.gather(*(server.serve() for server in servers))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
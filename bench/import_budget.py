@@ -0,0 +1,111 @@
+"""
+Cold-start import budget for the app, meant for CI:
+
+    python -m bench.import_budget --baseline origin/main [--tolerance 0.1] [--runs 5] [--top 10]
+    python -m bench.import_budget --budget 1.2 [--forbid langchain ...]
+
+Imports app.main in fresh interpreters under -X importtime and fails (exit 1) when the
+median import time is over the budget, or when a forbidden package got imported (the
+prompt path used to pull in langchain). Prints the heaviest top-level packages so a
+regression points at its cause. No database is needed; the engine doesn't connect on import.
+
+Absolute times depend on the machine, so in CI prefer --baseline: the given git ref is
+checked out in a temporary worktree and measured on the same machine, and the budget is
+its median plus --tolerance.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from collections import defaultdict
+
+DEFAULT_FORBIDDEN = ("langchain", "langchain_core", "langgraph", "langsmith")
+
+
+def import_profile(cwd: str | None = None) -> dict[str, tuple[int, int]]:
+    """Returns module -> (self, cumulative) import time in microseconds for one cold import."""
+    env = {**os.environ, "DATABASE_URL": os.environ.get("DATABASE_URL", "postgresql://bench@localhost/bench")}
+    if cwd:
+        env["PYTHONPATH"] = cwd
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=cwd,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode:
+        raise SystemExit(f"importing app.main failed:\n{proc.stderr[-2000:]}")
+
+    profile = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        profile[name.strip()] = (int(self_us), int(cumulative_us))
+    return profile
+
+
+def median_import_s(profiles: list[dict[str, tuple[int, int]]]) -> float:
+    return statistics.median(profile["app.main"][1] / 1e6 for profile in profiles)
+
+
+def baseline_import_s(ref: str, runs: int) -> float:
+    """Median import time of app.main at a git ref, measured from a temporary worktree."""
+    with tempfile.TemporaryDirectory() as tmp:
+        worktree = os.path.join(tmp, "baseline")
+        subprocess.run(["git", "worktree", "add", "--detach", "--quiet", worktree, ref], check=True)
+        try:
+            return median_import_s([import_profile(worktree) for _ in range(runs)])
+        finally:
+            subprocess.run(["git", "worktree", "remove", "--force", worktree], check=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--budget", type=float, help="seconds, median over runs")
+    parser.add_argument("--baseline", metavar="REF", help="git ref whose median, plus --tolerance, is the budget")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="allowed slowdown over --baseline, as a fraction")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--forbid", nargs="*", default=list(DEFAULT_FORBIDDEN))
+    args = parser.parse_args()
+    if (args.budget is None) == (args.baseline is None):
+        parser.error("give exactly one of --budget or --baseline")
+
+    budget = args.budget
+    if args.baseline:
+        baseline = baseline_import_s(args.baseline, args.runs)
+        budget = baseline * (1 + args.tolerance)
+        print(f"baseline {args.baseline}  median={baseline:.3f}s  tolerance={args.tolerance:.0%}")
+
+    profiles = [import_profile() for _ in range(args.runs)]
+    totals = [profile["app.main"][1] / 1e6 for profile in profiles]
+    median = median_import_s(profiles)
+
+    # Self time summed per top-level package, from the median run.
+    profile = sorted(profiles, key=lambda p: p["app.main"][1])[len(profiles) // 2]
+    packages: dict[str, int] = defaultdict(int)
+    for name, (self_us, _) in profile.items():
+        packages[name.split(".")[0]] += self_us
+
+    print(f"import app.main  median={median:.3f}s  min={min(totals):.3f}s  max={max(totals):.3f}s  "
+          f"budget={budget:.3f}s  modules={len(profile)}")
+    for package, self_us in sorted(packages.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {package:<28} {self_us / 1000:8.1f}ms")
+
+    failed = False
+    forbidden = sorted({name for name in profile if name.split(".")[0] in args.forbid})
+    if forbidden:
+        print(f"FAIL forbidden modules imported: {', '.join(forbidden[:10])}")
+        failed = True
+    if median > budget:
+        print(f"FAIL median import time {median:.3f}s is over the {budget:.3f}s budget")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
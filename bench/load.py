@@ -0,0 +1,177 @@
+"""
+Drives the API at a fixed concurrency with a weighted mix of read routes and reports
+throughput and p50/p95/p99 per route. Meant to run against the app wired to
+bench/fake_upstream.py so numbers are reproducible:
+
+    python -m bench.fake_upstream &
+    VAPI_BASE_URL=http://127.0.0.1:9001 OCR_URL=http://127.0.0.1:9002/api/v1/receipt \\
+        TEL_TEST_ID=phone-0 CALL_SYNC_INTERVAL_S=5 uvicorn app.main:app --port 8000 &
+    python -m bench.load --email bench@example.com --password secret \\
+        [--concurrency 32] [--duration 30] [--mix agents=1,calls=4,call=4] [--json out.json]
+
+The user is signed up if needed and gets one agent provisioned through /api/create-agent,
+so it owns the fake's calls. Compare runs with --json output.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import httpx
+
+DEFAULT_MIX = "agents=1,phones=1,calls=4,calls_stats=2,call=4,call_summary=2,call_messages=2"
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))] if ordered else float("nan")
+
+
+async def authenticate(client: httpx.AsyncClient, email: str, password: str) -> str:
+    resp = await client.post("/auth/login", data={"email": email, "password": password})
+    if resp.status_code in (401, 404):
+        signup = await client.post("/auth/signup", data={"email": email, "password": password, "tel": "+15550000000"})
+        signup.raise_for_status()
+        resp = await client.post("/auth/login", data={"email": email, "password": password})
+    resp.raise_for_status()
+    return resp.json()["access_token"]
+
+
+async def ensure_agent(client: httpx.AsyncClient, timeout_s: float = 120) -> str:
+    agents = (await client.get("/api/agents")).raise_for_status().json()
+    if agents:
+        return agents[0]["id"]
+
+    resp = await client.post(
+        "/api/create-agent",
+        data={"agent_name": "bench", "first_message": "Hi", "system_prompt": "You are a test agent."},
+        files=[("files", ("faq.txt", b"Quiet hours start at 10pm.\n" * 200, "text/plain"))],
+    )
+    resp.raise_for_status()
+    job_id = resp.json()["id"]
+
+    deadline = time.monotonic() + timeout_s
+    while time.monotonic() < deadline:
+        job = (await client.get(f"/api/jobs/{job_id}")).raise_for_status().json()
+        if job["status"] == "succeeded":
+            return job["result"]["id"]
+        if job["status"] == "failed":
+            raise SystemExit(f"provisioning failed: {job['error']}")
+        await asyncio.sleep(0.5)
+    raise SystemExit("provisioning did not finish in time")
+
+
+async def wait_for_calls(client: httpx.AsyncClient, agent_id: str, timeout_s: float = 120) -> list[str]:
+    # Calls reach the app through the periodic Vapi sync.
+    deadline = time.monotonic() + timeout_s
+    while time.monotonic() < deadline:
+        page = (await client.get("/api/calls", params={"assistant_id": agent_id, "limit": 200})).raise_for_status().json()
+        if page["results"]:
+            return [call["id"] for call in page["results"]]
+        await asyncio.sleep(1)
+    raise SystemExit("no calls synced; is the app pointed at the fake upstream with a short CALL_SYNC_INTERVAL_S?")
+
+
+def build_routes(agent_id: str, call_ids: list[str]) -> dict:
+    return {
+        "agents": lambda: ("/api/agents", {}),
+        "phones": lambda: ("/api/phones", {}),
+        "calls": lambda: ("/api/calls", {"assistant_id": agent_id, "limit": 50}),
+        "calls_stats": lambda: ("/api/calls/stats", {"assistant_id": agent_id}),
+        "call": lambda: ("/api/call", {"id": random.choice(call_ids)}),
+        "call_summary": lambda: ("/api/call", {"id": random.choice(call_ids), "messages": "false"}),
+        "call_messages": lambda: ("/api/call/messages", {"id": random.choice(call_ids), "limit": 100}),
+    }
+
+
+def parse_mix(mix: str, routes: dict) -> list[tuple[str, int]]:
+    weights = []
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        if name not in routes:
+            raise SystemExit(f"unknown route {name!r}, expected one of {', '.join(routes)}")
+        weights.append((name, int(weight or 1)))
+    return weights
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--email", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=30, help="seconds of measured load")
+    parser.add_argument("--warmup", type=float, default=3, help="seconds of unmeasured load first")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="route=weight,...")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, timeout=60, limits=limits) as client:
+        token = await authenticate(client, args.email, args.password)
+        client.headers["Authorization"] = f"Bearer {token}"
+        agent_id = await ensure_agent(client)
+        call_ids = await wait_for_calls(client, agent_id)
+
+        routes = build_routes(agent_id, call_ids)
+        weights = parse_mix(args.mix, routes)
+        names = [name for name, _ in weights]
+        cum_weights = [weight for _, weight in weights]
+
+        latencies: dict[str, list[float]] = {name: [] for name in names}
+        statuses: dict[str, dict[int, int]] = {name: {} for name in names}
+        measuring = False
+        stop_at = time.monotonic() + args.warmup + args.duration
+
+        async def worker() -> None:
+            while time.monotonic() < stop_at:
+                name = random.choices(names, weights=cum_weights)[0]
+                path, params = routes[name]()
+                start = time.perf_counter()
+                try:
+                    status = (await client.get(path, params=params)).status_code
+                except httpx.HTTPError:
+                    status = 0
+                if measuring:
+                    latencies[name].append(time.perf_counter() - start)
+                    statuses[name][status] = statuses[name].get(status, 0) + 1
+
+        workers = [asyncio.create_task(worker()) for _ in range(args.concurrency)]
+        await asyncio.sleep(args.warmup)
+        measuring = True
+        started = time.perf_counter()
+        await asyncio.gather(*workers)
+        elapsed = time.perf_counter() - started
+
+    results = {
+        "concurrency": args.concurrency,
+        "duration_s": round(elapsed, 2),
+        "routes": {},
+    }
+    total = sum(len(samples) for samples in latencies.values())
+    print(f"concurrency={args.concurrency} elapsed={elapsed:.1f}s requests={total} throughput={total / elapsed:.1f} req/s")
+    print(f"{'route':<14}{'requests':>9}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}  statuses")
+    for name in names:
+        samples = latencies[name]
+        row = {
+            "requests": len(samples),
+            "throughput": round(len(samples) / elapsed, 1),
+            "p50_ms": round(percentile(samples, 50) * 1000, 1),
+            "p95_ms": round(percentile(samples, 95) * 1000, 1),
+            "p99_ms": round(percentile(samples, 99) * 1000, 1),
+            "statuses": statuses[name],
+        }
+        results["routes"][name] = row
+        print(f"{name:<14}{row['requests']:>9}{row['throughput']:>9}{row['p50_ms']:>9}{row['p95_ms']:>9}"
+              f"{row['p99_ms']:>9}  {row['statuses']}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,66 @@
+"""
+Login throughput at fixed concurrency against a running server.
+
+    python -m bench.login_bench --url http://localhost:8000 --email a@b.c --password secret \\
+        [--concurrency 16] [--requests 400]
+
+Reports throughput and p50/p99 latency of /auth/login, plus how many attempts were shed
+with 503 by the password pool. A /docs probe runs alongside to show the event loop stays free.
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))] if ordered else float("nan")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--email", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=400)
+    args = parser.parse_args()
+
+    latencies: list[float] = []
+    probes: list[float] = []
+    statuses: dict[int, int] = {}
+    remaining = iter(range(args.requests))
+    done = asyncio.Event()
+
+    async with httpx.AsyncClient(base_url=args.url, timeout=30) as client:
+        async def login_worker() -> None:
+            for _ in remaining:
+                start = time.perf_counter()
+                resp = await client.post("/auth/login", data={"email": args.email, "password": args.password})
+                latencies.append(time.perf_counter() - start)
+                statuses[resp.status_code] = statuses.get(resp.status_code, 0) + 1
+
+        async def probe() -> None:
+            while not done.is_set():
+                start = time.perf_counter()
+                await client.get("/openapi.json")
+                probes.append(time.perf_counter() - start)
+                await asyncio.sleep(0.05)
+
+        started = time.perf_counter()
+        probe_task = asyncio.create_task(probe())
+        await asyncio.gather(*(login_worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await probe_task
+
+    print(f"requests={args.requests} concurrency={args.concurrency} elapsed={elapsed:.2f}s "
+          f"throughput={args.requests / elapsed:.1f} req/s statuses={statuses}")
+    print(f"login p50={percentile(latencies, 50) * 1000:.1f}ms p99={percentile(latencies, 99) * 1000:.1f}ms")
+    print(f"probe p50={percentile(probes, 50) * 1000:.1f}ms p99={percentile(probes, 99) * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,69 @@
+"""
+Measures P1 time-to-dispatch while the LOW backlog grows.
+
+    python -m bench.ticket_dispatch [--handler-ms 5] [--p1 50] [--low 0,1000,5000,20000]
+
+Each round floods the dispatcher with LOW tickets, then trickles P1 tickets in and reports
+their queue wait. With per-severity pools the P1 numbers should stay flat across rounds.
+"""
+import argparse
+import asyncio
+import datetime
+import os
+
+os.environ.setdefault("DATABASE_URL", "postgresql+psycopg://bench@localhost/bench")
+
+from app.services.ticket_dispatch import TicketDispatcher, TICKET_WORKERS  # noqa: E402
+
+
+def make_ticket(severity: str, n: int) -> dict:
+    return {
+        "idempotency_key": f"bench:{severity}:{n}",
+        "assistant_id": "bench",
+        "severity": severity,
+        "issue_summary": "bench",
+        "timestamp": datetime.datetime.now(datetime.timezone.utc),
+    }
+
+
+async def run_round(low_count: int, p1_count: int, handler_ms: float) -> dict:
+    async def handler(ticket: dict) -> None:
+        await asyncio.sleep(handler_ms / 1000)
+
+    dispatcher = TicketDispatcher(handler, limits={"P1": 10_000, "P2": 10_000, "LOW": max(low_count, 1)})
+    await dispatcher.start()
+
+    for n in range(low_count):
+        dispatcher.submit(make_ticket("LOW", n))
+
+    for n in range(p1_count):
+        dispatcher.submit(make_ticket("P1", n))
+        await asyncio.sleep(handler_ms / 1000)
+
+    while dispatcher.stats()["P1"]["dispatched"] < p1_count:
+        await asyncio.sleep(0.01)
+
+    stats = dispatcher.stats()
+    await dispatcher.stop()
+    return stats
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--handler-ms", type=float, default=5)
+    parser.add_argument("--p1", type=int, default=50)
+    parser.add_argument("--low", default="0,1000,5000,20000")
+    args = parser.parse_args()
+
+    print(f"workers={TICKET_WORKERS} handler={args.handler_ms}ms p1_per_round={args.p1}")
+    print(f"{'LOW backlog':>12} {'LOW depth':>10} {'P1 p50 ms':>10} {'P1 p99 ms':>10}")
+    for low_count in (int(n) for n in args.low.split(",")):
+        stats = await run_round(low_count, args.p1, args.handler_ms)
+        print(
+            f"{low_count:>12} {stats['LOW']['depth']:>10} "
+            f"{stats['P1']['timeToDispatchP50Ms']:>10} {stats['P1']['timeToDispatchP99Ms']:>10}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
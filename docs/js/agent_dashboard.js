@@ -2,8 +2,8 @@ const agentId = localStorage.getItem("assistant_id");
 const customerNumber = encodeURIComponent(localStorage.getItem("user_tel"));
 
 async function testAssistant() {
-    const systemRes = await fetch(
-      `${window.OPSMIND_API_URL}/api/test-call?customer_number=${customerNumber}&assistant_id=${agentId}`,
+    const systemRes = await window.apiFetch(
+      `/api/test-call?customer_number=${customerNumber}&assistant_id=${agentId}`,
       {
         method: "POST",
         headers: {
@@ -18,8 +18,8 @@ async function testAssistant() {
 }
 
 async function deleteAssistant() {
-    const systemRes = await fetch(
-      `${window.OPSMIND_API_URL}/api/delete-assistant?id=${agentId}`,
+    const systemRes = await window.apiFetch(
+      `/api/delete-assistant?id=${agentId}`,
       {
         method: "DELETE",
         headers: {
@@ -43,19 +43,32 @@ document.addEventListener("DOMContentLoaded", () => {
   loadCharts();
 });
 
-async function loadCalls() {
+let nextCallsCursor = null;
+
+async function loadMoreCalls() {
+  if (nextCallsCursor) await loadCalls(nextCallsCursor);
+}
+
+async function loadCalls(cursor = null) {
   const agentId = localStorage.getItem("assistant_id");
   const tbody = document.getElementById("callsTbody");
+  const loadMore = document.getElementById("loadMoreCalls");
 
   if (!agentId) {
     tbody.innerHTML = `<tr><td colspan="10" class="table-empty">Missing agentId</td></tr>`;
     return;
   }
 
-  tbody.innerHTML = `<tr><td colspan="10" class="table-empty">Loading calls…</td></tr>`;
+  if (!cursor) {
+    tbody.innerHTML = `<tr><td colspan="10" class="table-empty">Loading calls…</td></tr>`;
+  }
+  loadMore.hidden = true;
 
   try {
-    const res = await fetch(`${window.OPSMIND_API_URL}/api/calls?assistant_id=${encodeURIComponent(agentId)}`);
+    const params = new URLSearchParams({ assistant_id: agentId });
+    if (cursor) params.set("cursor", cursor);
+
+    const res = await window.apiFetch(`/api/calls?${params}`);
     const data = await res.json();
 
     const calls = Array.isArray(data) ? data : (data.results || data.calls || []);
@@ -65,12 +78,15 @@ async function loadCalls() {
       return;
     }
 
-    if (!calls.length) {
+    nextCallsCursor = data.nextCursor || null;
+    loadMore.hidden = !nextCallsCursor;
+
+    if (!calls.length && !cursor) {
       tbody.innerHTML = `<tr><td colspan="10" class="table-empty">No calls found</td></tr>`;
       return;
     }
 
-    tbody.innerHTML = "";
+    if (!cursor) tbody.innerHTML = "";
 
     calls.forEach(call => {
       const callId = call.id ?? "-";
@@ -197,18 +213,15 @@ function escapeHtml(str) {
     .replaceAll("'", "&#039;");
 }
 
-loadCharts();
-
 async function loadCharts() {
   const agentId = localStorage.getItem("assistant_id");
   if (!agentId) return;
 
   try {
-    const res = await fetch(`${window.OPSMIND_API_URL}/api/calls?assistant_id=${encodeURIComponent(agentId)}`);
+    const res = await window.apiFetch(`/api/calls/stats?assistant_id=${encodeURIComponent(agentId)}&granularity=day`);
     const data = await res.json();
-    const calls = Array.isArray(data) ? data : (data.results || data.calls || []);
 
-    const series = buildDailySeries(calls);
+    const series = buildDailySeries(data.series || []);
 
     renderLineChart("chartMinutes", series.labels, series.minutes, "Minutes", "minutes");
     renderLineChart("chartCalls", series.labels, series.calls, "Calls", "calls");
@@ -220,81 +233,16 @@ async function loadCharts() {
   }
 }
 
-function buildDailySeries(calls) {
-  const map = new Map(); // YYYY-MM-DD -> { minutes, calls, spent }
-
-  for (const c of calls) {
-    const day = isoDay(c.startedAt || c.createdAt);
-    if (!day) continue;
-
-    const acc = map.get(day) || { minutes: 0, calls: 0, spent: 0 };
-
-    acc.calls += 1;
-
-    const durationSec = calcDurationSec(c.startedAt, c.endedAt, c.duration);
-    acc.minutes += durationSec / 60;
-
-    acc.spent += pickCost(c);
-
-    map.set(day, acc);
-  }
-
-  const labels = Array.from(map.keys()).sort();
+function buildDailySeries(buckets) {
   return {
-    labels,
-    minutes: labels.map(d => round2(map.get(d).minutes)),
-    calls: labels.map(d => map.get(d).calls),
-    spent: labels.map(d => round4(map.get(d).spent)),
-    avgCost: labels.map(d => {
-      const a = map.get(d);
-      return a.calls ? round4(a.spent / a.calls) : 0;
-    })
+    labels: buckets.map(b => b.bucket.slice(0, 10)),
+    minutes: buckets.map(b => b.minutes),
+    calls: buckets.map(b => b.calls),
+    spent: buckets.map(b => b.spent),
+    avgCost: buckets.map(b => b.avgCost)
   };
 }
 
-function isoDay(iso) {
-  if (!iso) return null;
-  const d = new Date(iso);
-  if (Number.isNaN(d.getTime())) return null;
-
-  const y = d.getUTCFullYear();
-  const m = String(d.getUTCMonth() + 1).padStart(2, "0");
-  const day = String(d.getUTCDate()).padStart(2, "0");
-  return `${y}-${m}-${day}`;
-}
-
-function calcDurationSec(startedAt, endedAt, durationMsOrSec) {
-  if (startedAt && endedAt) {
-    const s = new Date(startedAt).getTime();
-    const e = new Date(endedAt).getTime();
-    if (!Number.isNaN(s) && !Number.isNaN(e) && e >= s) return (e - s) / 1000;
-  }
-
-  if (typeof durationMsOrSec === "number") {
-    if (durationMsOrSec > 10000) return durationMsOrSec / 1000;
-    return durationMsOrSec;
-  }
-
-  return 0;
-}
-
-function pickCost(call) {
-  if (typeof call.cost === "number") return call.cost;
-
-  if (call.costBreakdown && typeof call.costBreakdown.total === "number") {
-    return call.costBreakdown.total;
-  }
-
-  if (Array.isArray(call.costs)) {
-    return call.costs.reduce((sum, x) => sum + (typeof x.cost === "number" ? x.cost : 0), 0);
-  }
-
-  return 0;
-}
-
-function round2(n) { return Math.round(n * 100) / 100; }
-function round4(n) { return Math.round(n * 10000) / 10000; }
-
 const charts = {};
 
 function renderLineChart(canvasId, labels, values, yLabel, formatKind) {
@@ -1,7 +1,7 @@
     const userId = localStorage.getItem("user_id");
 
-    if (!userId) {
-      window.location.href = "login.html";
+    if (!userId || !localStorage.getItem("access_token")) {
+      window.location.href = window.LOGIN_PAGE;
     }
 
     function goToCreate() {
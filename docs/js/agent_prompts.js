@@ -8,20 +8,19 @@ document.addEventListener('DOMContentLoaded', async () => {
     return;
   }
 
-  document.getElementById('user_id').value = userId;
   document.getElementById('use_case').value = useCase;
   document.getElementById('agent_name').value = agentName;
 
   try {
-    const systemRes = await fetch(
-      `${window.OPSMIND_API_URL}/api/system_prompt?use_case=${useCase}&agent_name=${agentName}`
+    const systemRes = await window.apiFetch(
+      `/api/system_prompt?use_case=${encodeURIComponent(useCase)}&agent_name=${encodeURIComponent(agentName)}`
     );
     const systemData = await systemRes.json();
 
     document.getElementById('system_prompt').value = systemData;
 
-    const firstMsgRes = await fetch(
-      `${window.OPSMIND_API_URL}/api/first_message?use_case=${useCase}&agent_name=${agentName}`
+    const firstMsgRes = await window.apiFetch(
+      `/api/first_message?use_case=${encodeURIComponent(useCase)}&agent_name=${encodeURIComponent(agentName)}`
     );
     const firstMsgData = await firstMsgRes.json();
     document.getElementById('first_message').value = firstMsgData;
@@ -39,7 +38,7 @@ document.getElementById("createAgentForm").addEventListener("submit", async (e)
   const formData = new FormData(form);
 
   try {
-    const res = await fetch(`${window.OPSMIND_API_URL}/api/create-agent`, {
+    const res = await window.apiFetch(`/api/create-agent`, {
       method: "POST",
       body: formData
     });
@@ -51,10 +50,34 @@ document.getElementById("createAgentForm").addEventListener("submit", async (e)
       return;
     }
 
+    const job = await waitForJob(data.id);
+
+    if (job.status !== "succeeded") {
+      alert("Error: " + (job.error || "Could not create agent"));
+      return;
+    }
+
     window.location.href = "/phone-system/home.html";
 
   } catch (err) {
     console.error(err);
     alert("Server connection error.");
   }
-});
\ No newline at end of file
+});
+
+async function waitForJob(jobId) {
+  while (true) {
+    const res = await window.apiFetch(`/api/jobs/${encodeURIComponent(jobId)}`);
+    const job = await res.json();
+
+    if (!res.ok) {
+      return { status: "failed", error: job.detail };
+    }
+
+    if (job.status === "succeeded" || job.status === "failed") {
+      return job;
+    }
+
+    await new Promise(resolve => setTimeout(resolve, 2000));
+  }
+}
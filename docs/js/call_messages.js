@@ -22,7 +22,7 @@ async function refreshCall() {
   statsGrid.innerHTML = "";
 
   try {
-    const res = await fetch(`${window.OPSMIND_API_URL}/api/call?id=${encodeURIComponent(callId)}`);
+    const res = await window.apiFetch(`/api/call?id=${encodeURIComponent(callId)}&messages=false`);
     const call = await res.json();
 
     if (!res.ok) {
@@ -33,7 +33,7 @@ async function refreshCall() {
 
     renderSummary(call);
     renderLinks(call);
-    renderMessages(call);
+    await renderMessages(callId, call);
 
   } catch (err) {
     console.error(err);
@@ -128,62 +128,82 @@ function renderLinks(call) {
   }
 }
 
-function renderMessages(call) {
+async function renderMessages(callId, call) {
   const list = document.getElementById("messagesList");
   const hint = document.getElementById("messagesHint");
 
-  const msgs = Array.isArray(call.messages) ? call.messages
-            : (Array.isArray(call.artifact?.messages) ? call.artifact.messages : []);
+  let cursor = -1;
+  let total = 0;
 
-  if (!msgs.length) {
-    const transcript = call.transcript || call.artifact?.transcript || "";
-    const summary = call.summary || call.analysis?.summary || "";
+  while (true) {
+    const res = await window.apiFetch(
+      `/api/call/messages?id=${encodeURIComponent(callId)}&cursor=${cursor}&limit=100`
+    );
+    const page = await res.json();
 
-    hint.textContent = "No structured messages found";
+    if (!res.ok) {
+      hint.textContent = "Error loading messages";
+      return;
+    }
 
-    list.innerHTML = `
-      <div class="message-item">
-        <div class="message-meta">
-          <span class="badge system">transcript</span>
-        </div>
-        <div class="message-text">${escapeHtml(transcript || "No transcript available")}</div>
-      </div>
-      ${summary ? `
-      <div class="message-item">
-        <div class="message-meta">
-          <span class="badge system">summary</span>
-        </div>
-        <div class="message-text">${escapeHtml(summary)}</div>
-      </div>` : ""}
-    `;
-    return;
+    page.messages.forEach(m => list.appendChild(renderMessage(m)));
+    total += page.messages.length;
+    hint.textContent = `${total} messages`;
+
+    if (page.nextCursor == null) break;
+    cursor = page.nextCursor;
   }
 
-  hint.textContent = `${msgs.length} messages`;
+  if (!total) renderTranscript(call);
+}
 
-  list.innerHTML = "";
-  msgs.forEach(m => {
-    const role = (m.role || "system").toLowerCase();
-    const badgeClass =
-      role.includes("system") ? "system" :
-      (role.includes("bot") || role.includes("assistant")) ? "bot" :
-      "user";
+function renderTranscript(call) {
+  const list = document.getElementById("messagesList");
+  const hint = document.getElementById("messagesHint");
 
-    const seconds = (m.secondsFromStart != null) ? `${m.secondsFromStart}s` : "";
+  const transcript = call.transcript || call.artifact?.transcript || "";
+  const summary = call.summary || call.analysis?.summary || "";
 
-    const text = m.message || m.content || "";
+  hint.textContent = "No structured messages found";
 
-    const item = document.createElement("div");
-    item.className = "message-item";
-    item.innerHTML = `
+  list.innerHTML = `
+    <div class="message-item">
       <div class="message-meta">
-        <span class="badge ${badgeClass}">${escapeHtml(role)}</span>
-        <span>${escapeHtml(seconds)}</span>
+        <span class="badge system">transcript</span>
       </div>
-      <div class="message-text">${escapeHtml(text)}</div>
-    `;
-    list.appendChild(item);
-  });
+      <div class="message-text">${escapeHtml(transcript || "No transcript available")}</div>
+    </div>
+    ${summary ? `
+    <div class="message-item">
+      <div class="message-meta">
+        <span class="badge system">summary</span>
+      </div>
+      <div class="message-text">${escapeHtml(summary)}</div>
+    </div>` : ""}
+  `;
+}
+
+function renderMessage(m) {
+  const role = (m.role || "system").toLowerCase();
+  const badgeClass =
+    role.includes("system") ? "system" :
+    (role.includes("bot") || role.includes("assistant")) ? "bot" :
+    "user";
+
+  const seconds = (m.secondsFromStart != null) ? `${m.secondsFromStart}s` : "";
+
+  const text = m.message || m.content || "";
+
+  const item = document.createElement("div");
+  item.className = "message-item";
+  item.innerHTML = `
+    <div class="message-meta">
+      <span class="badge ${badgeClass}">${escapeHtml(role)}</span>
+      <span>${escapeHtml(seconds)}</span>
+    </div>
+    <div class="message-text">${escapeHtml(text)}</div>
+  `;
+  return item;
 }
 
 function formatDateTime(iso) {
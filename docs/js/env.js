@@ -1 +1,28 @@
-window.OPSMIND_API_URL = 'https://phone-system-597965137322.europe-west1.run.app';
\ No newline at end of file
+window.OPSMIND_API_URL = 'https://phone-system-597965137322.europe-west1.run.app';
+
+window.authHeaders = (headers = {}) => {
+  const token = localStorage.getItem('access_token');
+  return token ? { ...headers, Authorization: `Bearer ${token}` } : headers;
+};
+
+// The sign-in form lives on index.html.
+window.LOGIN_PAGE = 'index.html';
+
+window.logout = () => {
+  ['access_token', 'user_id', 'user_email', 'user_tel'].forEach((key) => localStorage.removeItem(key));
+  window.location.replace(window.LOGIN_PAGE);
+};
+
+// fetch for API paths: adds the session token, and sends the user back to sign in when
+// the token has expired or been rejected instead of leaving the page in an error state.
+window.apiFetch = async (path, options = {}) => {
+  const res = await fetch(`${window.OPSMIND_API_URL}${path}`, {
+    ...options,
+    headers: window.authHeaders(options.headers || {}),
+  });
+  if (res.status === 401) {
+    window.logout();
+    throw new Error('Session expired, please sign in again.');
+  }
+  return res;
+};
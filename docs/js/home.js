@@ -1,7 +1,7 @@
 const userId = localStorage.getItem("user_id");
 
-if (!userId) {
-  window.location.href = "login.html";
+if (!userId || !localStorage.getItem("access_token")) {
+  window.location.href = window.LOGIN_PAGE;
 }
 
 function toggleCreate() {
@@ -36,9 +36,7 @@ async function loadPhones() {
   }
 
   try {
-    const res = await fetch(
-      `${window.OPSMIND_API_URL}/api/phones?user_id=${userId}`
-    );
+    const res = await window.apiFetch(`/api/phones`);
 
     const phones = await res.json();
     const container = document.getElementById("phoneList");
@@ -53,6 +51,17 @@ async function loadPhones() {
     phones.forEach(phone => {
       const btn = document.createElement("button");
       btn.className = "item-btn";
+
+      if (phone.error) {
+        btn.disabled = true;
+        btn.innerHTML = `
+          <p class="item-title">Phone unavailable</p>
+          <p class="item-meta">Could not load phone (${phone.status})</p>
+        `;
+        container.appendChild(btn);
+        return;
+      }
+
       btn.innerHTML = `
         <p class="item-title">${phone.name} - ${phone.number}</p>
         <p class="item-meta">Click to view insights</p>
@@ -81,9 +90,7 @@ async function loadAgents() {
   }
 
   try {
-    const res = await fetch(
-      `${window.OPSMIND_API_URL}/api/agents?user_id=${userId}`
-    );
+    const res = await window.apiFetch(`/api/agents`);
 
     const agents = await res.json();
     const container = document.getElementById("agentsList");
@@ -98,6 +105,17 @@ async function loadAgents() {
     agents.forEach(agent => {
       const btn = document.createElement("button");
       btn.className = "item-btn";
+
+      if (agent.error) {
+        btn.disabled = true;
+        btn.innerHTML = `
+          <p class="item-title">Agent unavailable</p>
+          <p class="item-meta">Could not load agent (${agent.status})</p>
+        `;
+        container.appendChild(btn);
+        return;
+      }
+
       btn.innerHTML = `
         <p class="item-title">${agent.name}</p>
         <p class="item-meta">Click to view stats</p>
@@ -27,6 +27,7 @@ document.getElementById('authForm').onsubmit = async (e) => {
                 localStorage.setItem('user_id', data.user.id);
                 localStorage.setItem('user_email', data.user.email);
                 localStorage.setItem('user_tel', data.user.telephone);
+                localStorage.setItem('access_token', data.access_token);
                 window.location.href = '/phone-system/home.html';
             } else {
                 alert("Account created. You can now log in.");